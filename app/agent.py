@@ -1,6 +1,13 @@
-import os, json, asyncio, httpx
+import os, json, time, asyncio, httpx
 from dotenv import load_dotenv
 from .prompts import SYSTEM_PROMPT
+from .aoai_gateway import INTERACTIVE, aiter_chat_chunks, gateway
+from .http_clients import get_client
+from .prompt_budget import compact_tool_result, count_tokens, fit, message_tokens
+from .semantic_cache import cache_scope, cacheable_question, faq_cache
+from .telemetry import TurnTrace
+from .tool_memo import MUTATING_TOOLS, ToolMemo
+from .tool_selector import select_tools
 
 USE_FUNCTION_TOOLS = os.getenv("USE_FUNCTION_TOOLS", "false").lower() in ("1", "true", "yes")
 if USE_FUNCTION_TOOLS:
@@ -16,8 +23,12 @@ DEPLOY = os.getenv("AZURE_OPENAI_DEPLOYMENT")
 # Allow overriding API version from env; default to a stable tools-capable chat version
 API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
 
+# Tool calls from one assistant turn run concurrently, up to this many at once
+TOOL_CONCURRENCY = int(os.getenv("AGENT_TOOL_CONCURRENCY", "5"))
+TOOL_TIMEOUT_SEC = float(os.getenv("AGENT_TOOL_TIMEOUT_SEC", "20"))
 
-async def _aoai_chat(messages, tools=None, tool_choice="auto"):
+
+def _aoai_request(messages, tools, tool_choice):
     url = f"{AOAI_ENDPOINT}/openai/deployments/{DEPLOY}/chat/completions?api-version={API_VERSION}"
     headers = {"Content-Type": "application/json", "api-key": AOAI_KEY}
     payload = {"messages": messages, "temperature": 0.2}
@@ -25,23 +36,132 @@ async def _aoai_chat(messages, tools=None, tool_choice="auto"):
     if tools and not disable_tools:
         payload["tools"] = tools
         payload["tool_choice"] = tool_choice
+    return url, headers, payload
+
 
-    async with httpx.AsyncClient(timeout=60) as client:
+async def _aoai_chat(messages, tools=None, tool_choice="auto", priority=INTERACTIVE, trace=None):
+    url, headers, payload = _aoai_request(messages, tools, tool_choice)
+    client = get_client("aoai")
+    started = time.perf_counter()
+    try:
+        resp = await gateway.post(client, url, headers, payload, priority=priority)
+        resp.raise_for_status()
+    except httpx.HTTPStatusError as e:
         try:
-            resp = await client.post(url, headers=headers, json=payload)
-            resp.raise_for_status()
-        except httpx.HTTPStatusError as e:
-            try:
-                detail = e.response.json()
-            except Exception:
-                detail = e.response.text
-            raise RuntimeError(f"Azure OpenAI error {e.response.status_code}: {detail}") from e
-        data = resp.json()
-        choice = data["choices"][0]
-        return choice
+            detail = e.response.json()
+        except Exception:
+            detail = e.response.text
+        raise RuntimeError(f"Azure OpenAI error {e.response.status_code}: {detail}") from e
+    data = resp.json()
+    if trace:
+        trace.completion(data.get("usage"), time.perf_counter() - started)
+    choice = data["choices"][0]
+    return choice
+
+
+async def _aoai_chat_stream(messages, tools=None, tool_choice="auto", priority=INTERACTIVE, trace=None):
+    """Streamed completion: yields ``("token", text)`` as content arrives, then
+    ``("message", msg)`` with the assembled assistant message, where
+    ``tool_calls`` are rebuilt from their per-index argument fragments."""
+    url, headers, payload = _aoai_request(messages, tools, tool_choice)
+    payload["stream"] = True
+    content, calls, usage = [], {}, None
+    started = time.perf_counter()
+    async with gateway.stream(get_client("aoai"), url, headers, payload, priority=priority) as resp:
+        if resp.status_code >= 400:
+            detail = (await resp.aread()).decode("utf-8", "replace")
+            raise RuntimeError(f"Azure OpenAI error {resp.status_code}: {detail}")
+        async for chunk in aiter_chat_chunks(resp):
+            usage = chunk.get("usage") or usage
+            for ch in chunk.get("choices") or []:
+                delta = ch.get("delta") or {}
+                if delta.get("content"):
+                    content.append(delta["content"])
+                    yield "token", delta["content"]
+                for tcd in delta.get("tool_calls") or []:
+                    tc = calls.setdefault(tcd.get("index", 0), {"id": "", "type": "function", "function": {"name": "", "arguments": ""}})
+                    if tcd.get("id"):
+                        tc["id"] = tcd["id"]
+                    fn = tcd.get("function") or {}
+                    tc["function"]["name"] += fn.get("name") or ""
+                    tc["function"]["arguments"] += fn.get("arguments") or ""
+    msg = {"role": "assistant", "content": "".join(content)}
+    if calls:
+        msg["tool_calls"] = [calls[i] for i in sorted(calls)]
+    if trace:
+        estimated = usage is None
+        if estimated:
+            # No usage block in streamed responses: estimate from the request and reply
+            usage = {
+                "prompt_tokens": sum(message_tokens(m) for m in messages) + count_tokens(json.dumps(tools or [])),
+                "completion_tokens": message_tokens(msg),
+            }
+        trace.completion(usage, time.perf_counter() - started, estimated=estimated)
+    yield "message", msg
+
+
+async def _run_tool(tc, sem, memo, on_done=None):
+    name = tc["function"]["name"]
+    started = time.perf_counter()
+    async with sem:
+        try:
+            args = json.loads(tc["function"]["arguments"] or "{}")
+            result = await asyncio.wait_for(memo.call(name, args, tool_router), TOOL_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            result = {"error": f"{name} timed out after {TOOL_TIMEOUT_SEC:g}s"}
+        except Exception as e:
+            # Report the failure to the model instead of failing the whole turn
+            result = {"error": f"{name} failed: {e}"}
+    if on_done:
+        on_done(tc, result, time.perf_counter() - started)
+    return {
+        "role": "tool",
+        "tool_call_id": tc["id"],
+        "name": name,
+        "content": compact_tool_result(result),
+    }
+
+
+async def _run_tool_calls(tool_calls, memo, on_done=None):
+    """Execute one turn's tool calls; results keep the order of ``tool_calls``."""
+    sem = asyncio.Semaphore(max(1, TOOL_CONCURRENCY))
+    results, batch = [], []
+    for tc in tool_calls:
+        # Tools that change stored state (the ones the memo invalidates on) run
+        # alone, in the order the model asked for them
+        if tc["function"]["name"] in MUTATING_TOOLS:
+            results += await asyncio.gather(*(_run_tool(t, sem, memo, on_done) for t in batch))
+            batch = []
+            results.append(await _run_tool(tc, sem, memo, on_done))
+        else:
+            batch.append(tc)
+    results += await asyncio.gather(*(_run_tool(t, sem, memo, on_done) for t in batch))
+    return results
+
 
+async def _tool_events(task, finished):
+    """Events from ``finished`` until ``task`` is done and they are drained.
 
-async def chat_with_agent(history):
+    Waits on the queue and the task together, so a task that fails before
+    reporting every call ends the loop instead of leaving it waiting."""
+    while True:
+        while not finished.empty():
+            yield finished.get_nowait()
+        if task.done():
+            return
+        getter = asyncio.ensure_future(finished.get())
+        try:
+            await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            getter.cancel()
+            raise
+        if getter.done():
+            yield getter.result()
+        else:
+            getter.cancel()  # the task finished first; what it queued is drained above
+
+
+def _initial_messages(history):
     # Ensure system prompt is present
     messages = []
     system_added = any(m.get("role") == "system" for m in history)
@@ -58,37 +178,119 @@ async def chat_with_agent(history):
                 messages.append(m)
     if not system_added:
         messages.extend(history)
+    return messages
 
-    # First turn
-    choice = await _aoai_chat(messages, tools=TOOLS_SPEC, tool_choice="auto")
-    msg = choice["message"]
-
-    # Tool loop (max 6)
-    for _ in range(6):
-        tool_calls = msg.get("tool_calls") or []
-        if not tool_calls:
-            break
-        # First, append the assistant message that requested tools
-        messages.append({
-            "role": "assistant",
-            "content": msg.get("content", ""),
-            "tool_calls": tool_calls,
-        })
-        # Then execute tools and append tool results that reference the ids
-        for tc in tool_calls:
-            name = tc["function"]["name"]
-            args = json.loads(tc["function"]["arguments"] or "{}")
-            result = await tool_router(name, args)
+
+async def chat_with_agent(history, role=None, memo=None):
+    """``memo``: a ``ToolMemo`` kept for the conversation, so repeated read-only
+    tool calls across turns are answered without a round trip."""
+    # General questions answered from the guide before come from the FAQ cache
+    question = cacheable_question(history)
+    scope = cache_scope(history, role)
+    cached = await faq_cache.lookup(question, scope) if question else None
+    if cached:
+        TurnTrace("faq_cache", role).finish()
+        return cached
+
+    memo = memo or ToolMemo()
+    messages = _initial_messages(history)
+    tools = select_tools(TOOLS_SPEC, messages, role)
+    trace = TurnTrace("chat", role, len(tools or []))
+    error = None
+    try:
+        # First turn; fit() trims what is sent, ``messages`` keeps the full turn
+        choice = await _aoai_chat(fit(messages), tools=tools, tool_choice="auto", trace=trace)
+        msg = choice["message"]
+
+        # Tool loop (max 6)
+        for _ in range(6):
+            tool_calls = msg.get("tool_calls") or []
+            if not tool_calls:
+                break
+            # First, append the assistant message that requested tools
             messages.append({
-                "role": "tool",
-                "tool_call_id": tc["id"],
-                "name": name,
-                "content": json.dumps(result, ensure_ascii=False),
+                "role": "assistant",
+                "content": msg.get("content", ""),
+                "tool_calls": tool_calls,
             })
-        # Follow-up to get final answer
-        choice = await _aoai_chat(messages, tools=TOOLS_SPEC, tool_choice="auto")
-        msg = choice["message"]
+            # Then execute tools and append tool results that reference the ids
+            messages.extend(await _run_tool_calls(tool_calls, memo, trace.tool_done))
+            # Follow-up to get final answer
+            choice = await _aoai_chat(fit(messages), tools=tools, tool_choice="auto", trace=trace)
+            msg = choice["message"]
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        trace.finish(error)
 
+    if question and msg.get("content") and not trace.tools:
+        await faq_cache.store(question, msg["content"], scope)
     # Return final assistant content (fallback if empty)
     content = msg.get("content") or "응답이 비었습니다. 설정을 확인하세요."
     return content
+
+
+async def stream_chat_with_agent(history, role=None, memo=None):
+    """Streaming variant of ``chat_with_agent`` for the UI.
+
+    Yields ``("token", text)`` for assistant text as it is generated,
+    ``("tool_start", {"id", "name"})`` / ``("tool_end", {"id", "name", "ok", "ms"})``
+    while tools run, and finally ``("done", content)`` with the full reply.
+    """
+    question = cacheable_question(history)
+    scope = cache_scope(history, role)
+    cached = await faq_cache.lookup(question, scope) if question else None
+    if cached:
+        TurnTrace("faq_cache", role).finish()
+        yield "token", cached
+        yield "done", cached
+        return
+
+    memo = memo or ToolMemo()
+    messages = _initial_messages(history)
+    tools = select_tools(TOOLS_SPEC, messages, role)
+    trace = TurnTrace("stream", role, len(tools or []))
+    error = None
+    msg = {}
+    try:
+        # First turn plus the tool loop (max 6 follow-ups), as in chat_with_agent
+        for i in range(7):
+            async for kind, data in _aoai_chat_stream(fit(messages), tools=tools, tool_choice="auto", trace=trace):
+                if kind == "token":
+                    yield "token", data
+                else:
+                    msg = data
+            tool_calls = msg.get("tool_calls") or []
+            if not tool_calls or i == 6:
+                break
+            messages.append({
+                "role": "assistant",
+                "content": msg.get("content", ""),
+                "tool_calls": tool_calls,
+            })
+            for tc in tool_calls:
+                yield "tool_start", {"id": tc["id"], "name": tc["function"]["name"]}
+            finished = asyncio.Queue()
+
+            def on_done(tc, result, elapsed):
+                trace.tool_done(tc, result, elapsed)
+                ok = not (isinstance(result, dict) and "error" in result)
+                finished.put_nowait({"id": tc["id"], "name": tc["function"]["name"], "ok": ok, "ms": round(elapsed * 1000)})
+
+            task = asyncio.ensure_future(_run_tool_calls(tool_calls, memo, on_done))
+            try:
+                async for event in _tool_events(task, finished):
+                    yield "tool_end", event
+                messages.extend(task.result())  # re-raises a failed tool run
+            finally:
+                task.cancel()  # no-op once done; stops the tools when the caller closes early
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        trace.finish(error)
+
+    if question and msg.get("content") and not trace.tools:
+        await faq_cache.store(question, msg["content"], scope)
+    yield "done", msg.get("content") or "응답이 비었습니다. 설정을 확인하세요."
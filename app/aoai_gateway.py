@@ -0,0 +1,225 @@
+"""Azure OpenAI gateway for the agent (asyncio twin of functions/aoai_gateway.py).
+
+AIMD concurrency limit (+1 slot per window of successes, halved on 429/503
+or a failed call), priority lanes so interactive chat turns are admitted
+before background generation, queue deadlines, and ``Retry-After``-aware
+retries for 429/503.
+One limiter per process, shared by every Streamlit session.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class GatewayTimeout(RuntimeError):
+    """The call could not be admitted before its deadline."""
+
+
+def retry_after_seconds(resp) -> Optional[float]:
+    ms = resp.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    ra = resp.headers.get("retry-after")
+    if ra:
+        try:
+            return float(ra)
+        except ValueError:
+            return None
+    return None
+
+
+class AIMDLimiter:
+    """Streamlit sessions submit their calls to the shared background loop of
+    ``async_runner``, so normally every waiter lives on that one loop. Callers
+    with their own loop (scripts, ``asyncio.run`` in tests) share the limiter
+    too, which is why the state is guarded by a lock and queued waiters are
+    woken on the loop they wait on."""
+
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 16, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.decrease = decrease
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._waiters: List[List[Any]] = []  # heap of [priority, seq, future, state]
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = [priority, next(self._seq), loop.create_future(), "waiting"]
+            heapq.heappush(self._waiters, waiter)
+        try:
+            await asyncio.wait_for(waiter[2], max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter[3] == "granted":  # the slot arrived as the deadline passed
+                    return
+                waiter[3] = "cancelled"
+            raise GatewayTimeout("AOAI queue deadline exceeded") from None
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter[3] == "granted"
+                waiter[3] = "cancelled"
+            if granted:
+                self.release(False)
+            raise
+
+    def release(self, throttled: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            while self._waiters and self.in_flight < int(self.limit):
+                waiter = heapq.heappop(self._waiters)
+                if waiter[3] != "waiting":
+                    continue
+                waiter[3] = "granted"
+                self.in_flight += 1
+                fut = waiter[2]
+                fut.get_loop().call_soon_threadsafe(_wake, fut)
+
+
+def _wake(fut: "asyncio.Future") -> None:
+    if not fut.done():
+        fut.set_result(None)
+
+
+class AOAIGateway:
+    def __init__(
+        self,
+        limiter: AIMDLimiter,
+        max_retries: int = 3,
+        deadline_sec: float = 30.0,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.deadline_sec = deadline_sec
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_env(cls) -> "AOAIGateway":
+        return cls(
+            AIMDLimiter(
+                initial=float(os.getenv("AOAI_INITIAL_CONCURRENCY", "4")),
+                minimum=float(os.getenv("AOAI_MIN_CONCURRENCY", "1")),
+                maximum=float(os.getenv("AOAI_MAX_CONCURRENCY", "16")),
+            ),
+            max_retries=int(os.getenv("AOAI_MAX_RETRIES", "3")),
+            deadline_sec=float(os.getenv("AOAI_DEADLINE_SEC", "30")),
+        )
+
+    def _backoff(self, resp, attempt: int) -> float:
+        delay = retry_after_seconds(resp)
+        if delay is None:
+            delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay + random.uniform(0, delay * 0.1)
+
+    async def post(
+        self,
+        client,
+        url: str,
+        headers: Dict[str, str],
+        body: Dict[str, Any],
+        priority: int = INTERACTIVE,
+        deadline_sec: Optional[float] = None,
+    ):
+        """POST through the limiter and return the final response; the caller
+        still calls ``raise_for_status()``."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (deadline_sec or self.deadline_sec)
+        attempt = 0
+        while True:
+            await self.limiter.acquire(priority, deadline)
+            throttled = False
+            try:
+                resp = await client.post(url, headers=headers, json=body)
+                throttled = resp.status_code in (429, 503)
+            except Exception:
+                throttled = True  # timeout / reset: back off like on a 429
+                raise
+            finally:
+                self.limiter.release(throttled)
+            if resp.status_code not in (429, 503) or attempt >= self.max_retries:
+                return resp
+            delay = self._backoff(resp, attempt)
+            if loop.time() + delay >= deadline:
+                return resp
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        client,
+        url: str,
+        headers: Dict[str, str],
+        body: Dict[str, Any],
+        priority: int = INTERACTIVE,
+        deadline_sec: Optional[float] = None,
+    ):
+        """Like ``post`` for ``stream: true`` bodies: retries happen on the
+        status line, and the slot is held until the caller finishes reading."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (deadline_sec or self.deadline_sec)
+        attempt = 0
+        while True:
+            await self.limiter.acquire(priority, deadline)
+            throttled = False
+            delay = None
+            try:
+                async with client.stream("POST", url, headers=headers, json=body) as resp:
+                    throttled = resp.status_code in (429, 503)
+                    if resp.status_code in (429, 503) and attempt < self.max_retries:
+                        delay = self._backoff(resp, attempt)
+                        if loop.time() + delay >= deadline:
+                            delay = None
+                    if delay is None:
+                        yield resp
+                        return
+            except Exception:
+                throttled = True  # connect or mid-stream read failure
+                raise
+            finally:
+                self.limiter.release(throttled)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+async def aiter_chat_chunks(resp) -> AsyncIterator[Dict[str, Any]]:
+    """Parsed chunks of a ``stream: true`` chat completion (SSE lines)."""
+    async for line in resp.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            yield json.loads(data)
+        except ValueError:
+            continue
+
+
+gateway = AOAIGateway.from_env()
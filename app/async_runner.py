@@ -0,0 +1,98 @@
+"""Long-lived event loop on a background thread for synchronous callers.
+
+Streamlit reruns the script on a plain thread per session. Calling
+``asyncio.run`` for every tool call builds and tears down an event loop each
+time, and with it the pooled httpx clients of ``http_clients`` (which are kept
+per loop). ``LoopRunner`` keeps one loop alive for the whole process, so every
+session and rerun shares the same connections, breaker state and limiter.
+
+- ``submit(coro)`` schedules a coroutine and returns a
+  ``concurrent.futures.Future`` (thread-safe, non-blocking).
+- ``run(coro, timeout)`` blocks until the result is ready.
+- ``run_many(coros)`` runs several coroutines concurrently and returns their
+  results in order; failures come back as exception objects.
+
+Never call ``run`` from a coroutine on the runner's own loop: it would wait
+for itself. ``run`` detects that and raises instead of deadlocking.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Iterable, List, Optional
+
+from .http_clients import aclose_clients
+
+
+class LoopRunner:
+    def __init__(self, name: str = "async-runner"):
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The runner's loop, started on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                ready = threading.Event()
+                loop = asyncio.new_event_loop()
+
+                def _serve():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=_serve, name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+            return self._loop
+
+    def submit(self, coro: Awaitable[Any]) -> "concurrent.futures.Future[Any]":
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("LoopRunner.run() called from its own loop; await the coroutine instead")
+        fut = self.submit(coro)
+        try:
+            return fut.result(timeout)
+        except concurrent.futures.TimeoutError:
+            fut.cancel()
+            raise
+
+    def run_many(self, coros: Iterable[Awaitable[Any]], timeout: Optional[float] = None) -> List[Any]:
+        async def _gather():
+            return await asyncio.gather(*coros, return_exceptions=True)
+
+        return self.run(_gather(), timeout)
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(aclose_clients(), loop).result(timeout=5)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+        if not loop.is_running():
+            loop.close()
+
+
+runner = LoopRunner()
+submit = runner.submit
+run = runner.run
+run_many = runner.run_many
+
+# Registered after http_clients' hook, so it runs first and closes the
+# clients on the loop that owns them
+atexit.register(runner.stop)
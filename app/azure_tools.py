@@ -1,14 +1,50 @@
 import os
 import json
-from typing import Any, Dict
+import time
+import random
+import asyncio
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
 
 import httpx
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
+
+from .http_clients import get_client
+from .tool_memo import IDEMPOTENT_TOOLS
 
 
 BASE = os.getenv("TOOLS_BASE_URL", "https://app-service-kingbk-fpe2dahdgpabgxbd.swedencentral-01.azurewebsites.net")
 FUNC_CODE = os.getenv("FUNCTIONS_CODE")  # optional function key for AuthLevel.FUNCTION
 
+# Sent as X-Priority so the Functions AOAI gateway admits user-facing calls
+# first; speculative work (card prefetch) sets "background" for its task, or a
+# ``Lane`` when the priority may be raised while the work runs.
+tool_priority: ContextVar[Union[str, "Lane"]] = ContextVar("tool_priority", default="interactive")
+
+# Callers that answer from a local stub instead of the backend record the
+# tool name here (``note_fallback``), so cached results can tell
+tool_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("tool_fallbacks", default=None)
+
+
+class Lane:
+    """Priority shared by a group of tool calls; setting ``value`` to
+    "interactive" applies to the calls not sent yet."""
+
+    def __init__(self, value: str = "background"):
+        self.value = value
+
+
+def is_background() -> bool:
+    p = tool_priority.get()
+    return getattr(p, "value", p) == "background"
+
+
+def note_fallback(name: str) -> None:
+    seen = tool_fallbacks.get()
+    if seen is not None:
+        seen.append(name)
+
 
 TOOLS_SPEC = [
     {"type": "function", "function": {"name": "search_youtube_videos", "parameters": {
@@ -85,8 +121,10 @@ TOOLS_SPEC = [
     {"type": "function", "function": {"name": "save_prefs", "parameters": {
         "type": "object", "properties": {
             "childId": {"type": "string"},
-            "recent_videos": {"type": "array", "items": {"type": "object"}},
-            "favorite_videos": {"type": "array", "items": {"type": "object"}}
+            "recent_upserts": {"type": "array", "items": {"type": "object"}},
+            "favorite_upserts": {"type": "array", "items": {"type": "object"}},
+            "favorite_removes": {"type": "array", "items": {"type": "string"}},
+            "ifMatch": {"type": "string"}
         },
         "required": ["childId"]
     }}},
@@ -97,22 +135,200 @@ TOOLS_SPEC = [
 ]
 
 
-async def tool_router(name: str, args: Dict[str, Any]):
-    base_paths = [f"{BASE}/tools/{name}", f"{BASE}/api/tools/{name}"]
-    last_err = None
-    async with httpx.AsyncClient(timeout=30) as client:
-        for url in base_paths:
-            try:
-                u = url
-                if FUNC_CODE:
-                    sep = '&' if '?' in u else '?'
-                    u = f"{u}{sep}{urlencode({'code': FUNC_CODE})}"
-                resp = await client.post(u, json=args)
+# Path prefixes a deployment may serve tools under, and the one that last
+# worked per host, so only the first call on an /api deployment pays a 404
+TOOL_PREFIXES = ("tools", "api/tools")
+_host_prefix: Dict[str, str] = {}
+
+# Transient failures are retried with full-jitter backoff
+TOOL_MAX_RETRIES = int(os.getenv("TOOL_MAX_RETRIES", "2"))
+TOOL_BACKOFF_SEC = float(os.getenv("TOOL_BACKOFF_SEC", "0.2"))
+TOOL_BACKOFF_MAX_SEC = float(os.getenv("TOOL_BACKOFF_MAX_SEC", "2"))
+_RETRY_STATUS = {429, 502, 503, 504}
+
+# Hedging: a second copy of a slow idempotent call starts once the first has
+# taken longer than the tool's recent p95 latency
+TOOL_HEDGE = os.getenv("TOOL_HEDGE", "false").lower() in ("1", "true", "yes")
+TOOL_HEDGE_MIN_SAMPLES = int(os.getenv("TOOL_HEDGE_MIN_SAMPLES", "20"))
+TOOL_HEDGE_MIN_MS = float(os.getenv("TOOL_HEDGE_MIN_MS", "50"))
+_latencies: Dict[str, Deque[float]] = {}
+router_stats: Dict[str, int] = {"retries": 0, "hedges": 0, "hedge_wins": 0, "prefix_misses": 0}
+
+
+class ToolError(RuntimeError):
+    """A tool call failed; ``status`` is the last HTTP status (None for
+    transport errors)."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def backend_failed(exc: BaseException) -> bool:
+    """Whether ``exc`` says the backend is unhealthy (5xx, timeout, transport
+    error), as opposed to a rejected request (4xx) that a breaker should ignore."""
+    if isinstance(exc, ToolError):
+        return exc.status is None or exc.status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, httpx.TransportError))
+
+
+def _with_code(url: str) -> str:
+    if not FUNC_CODE:
+        return url
+    sep = '&' if '?' in url else '?'
+    return f"{url}{sep}{urlencode({'code': FUNC_CODE})}"
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    try:
+        return float(resp.headers.get("retry-after", ""))
+    except ValueError:
+        return None
+
+
+def _record_latency(name: str, seconds: float) -> None:
+    _latencies.setdefault(name, deque(maxlen=100)).append(seconds)
+
+
+def hedge_delay(name: str) -> Optional[float]:
+    """p95 of the tool's recent latencies, or None until there are enough samples."""
+    samples = _latencies.get(name)
+    if not samples or len(samples) < TOOL_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return max(p95, TOOL_HEDGE_MIN_MS / 1000.0)
+
+
+async def _post_tool(client: httpx.AsyncClient, name: str, args: Dict[str, Any]) -> httpx.Response:
+    """One POST, trying the host's known prefix first and the others on 404."""
+    host = urlsplit(BASE).netloc
+    known = _host_prefix.get(host)
+    prefixes = [known] + [p for p in TOOL_PREFIXES if p != known] if known else list(TOOL_PREFIXES)
+    headers = {"X-Priority": "background"} if is_background() else None
+    resp = None
+    for prefix in prefixes:
+        resp = await client.post(_with_code(f"{BASE}/{prefix}/{name}"), json=args, headers=headers)
+        if resp.status_code != 404:
+            if prefix != known:
+                if known:
+                    router_stats["prefix_misses"] += 1
+                _host_prefix[host] = prefix
+            return resp
+    return resp
+
+
+async def _call_tool(name: str, args: Dict[str, Any]) -> Any:
+    client = get_client("tools")
+    # Non-idempotent tools are only retried when the request was never processed
+    idempotent = name in IDEMPOTENT_TOOLS
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        retry_in = last_status = None
+        try:
+            resp = await _post_tool(client, name, args)
+            if resp.status_code in _RETRY_STATUS and (idempotent or resp.status_code in (429, 503)):
+                retry_in = _retry_after(resp)
+                last_status = resp.status_code
+                last_err = f"{resp.status_code} {resp.text[:200]}"
+            else:
                 resp.raise_for_status()
+                _record_latency(name, time.perf_counter() - started)
                 return resp.json()
-            except httpx.HTTPStatusError as e:
-                last_err = f"{e.response.status_code} {getattr(e.response,'text', '')[:200]}"
-            except Exception as e:
-                last_err = str(e)
-                continue
-    raise RuntimeError(f"tool_router failed for {name}: {last_err}")
+        except httpx.HTTPStatusError as e:
+            raise ToolError(f"tool_router failed for {name}: {e.response.status_code} {e.response.text[:200]}", e.response.status_code) from e
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            last_err = str(e) or type(e).__name__
+        except httpx.TransportError as e:
+            if not idempotent:
+                raise ToolError(f"tool_router failed for {name}: {e}") from e
+            last_err = str(e) or type(e).__name__
+        if attempt >= TOOL_MAX_RETRIES:
+            raise ToolError(f"tool_router failed for {name}: {last_err}", last_status)
+        delay = random.uniform(0, min(TOOL_BACKOFF_MAX_SEC, TOOL_BACKOFF_SEC * (2 ** attempt)))
+        await asyncio.sleep(max(delay, retry_in or 0.0))
+        router_stats["retries"] += 1
+        attempt += 1
+
+
+async def tool_router(name: str, args: Dict[str, Any]):
+    delay = hedge_delay(name) if TOOL_HEDGE and name in IDEMPOTENT_TOOLS else None
+    if delay is None:
+        return await _call_tool(name, args)
+
+    primary = asyncio.ensure_future(_call_tool(name, args))
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+    router_stats["hedges"] += 1
+    hedge = asyncio.ensure_future(_call_tool(name, args))
+    pending = {primary, hedge}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        router_stats["hedge_wins"] += 1
+                    return task.result()
+        return primary.result()  # both failed: report the original call's error
+    finally:
+        for task in (primary, hedge):
+            task.cancel()
+
+
+# Tool routes with an SSE mode, and the URL that last worked for each
+STREAMING_TOOLS = ("example_sentence", "extract_top_expressions")
+_stream_urls: Dict[str, Tuple[str, str]] = {}
+
+
+async def stream_tool(name: str, args: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Yield ``(event, data)`` from a tool's server-sent events as they arrive.
+
+    example_sentence emits ``delta`` chunks then ``sentence``;
+    extract_top_expressions emits one ``phrase`` per expression. Both end with
+    ``done`` carrying the same JSON the non-streaming route returns. The
+    incremental ``/stream`` route is tried first, then ``?stream=true`` on the
+    classic route (same events, delivered in one body); each under the host's
+    known prefix (``/tools`` or ``/api/tools``) first, as in ``_post_tool``.
+    """
+    host = urlsplit(BASE).netloc
+    known = _host_prefix.get(host)
+    prefixes = [known] + [p for p in TOOL_PREFIXES if p != known] if known else list(TOOL_PREFIXES)
+    # (prefix, url): the incremental route under every prefix, then the buffered one
+    urls = [(p, f"{BASE}/{p}/{name}/stream") for p in prefixes] + [(p, f"{BASE}/{p}/{name}?stream=true") for p in prefixes]
+    if name in _stream_urls:
+        urls.insert(0, _stream_urls[name])
+    last_err = last_status = None
+    client = get_client("tools")
+    headers = {"Accept": "text/event-stream"}
+    if is_background():
+        headers["X-Priority"] = "background"  # as in _post_tool
+    for prefix, url in dict.fromkeys(urls):
+        started = False
+        try:
+            async with client.stream("POST", _with_code(url), json=args, headers=headers) as resp:
+                if resp.status_code == 404:
+                    last_err, last_status = f"404 {url}", 404
+                    continue
+                resp.raise_for_status()
+                _stream_urls[name] = (prefix, url)
+                _host_prefix[host] = prefix
+                event = "message"
+                async for line in resp.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[6:].strip()
+                    elif line.startswith("data:"):
+                        started = True
+                        yield event, json.loads(line[5:].strip())
+                    elif not line:
+                        event = "message"
+                return
+        except httpx.HTTPStatusError as e:
+            last_err, last_status = f"{e.response.status_code}", e.response.status_code
+        except httpx.TransportError as e:
+            if started:
+                raise ToolError(f"stream_tool failed for {name}: {e}") from e  # do not replay events from another URL
+            last_err, last_status = str(e) or type(e).__name__, None
+    raise ToolError(f"stream_tool failed for {name}: {last_err}", last_status)
@@ -0,0 +1,246 @@
+"""Learning-card generation shared by both child views.
+
+After a video, the cards need ``index_video``, then the word (or expression)
+list, then per card an example sentence and the pronunciation audio. Only the
+first two steps depend on each other: the per-card steps of all cards run
+concurrently, and each card is reported through ``on_card`` as soon as its
+own steps finish, so the UI can show the first card without waiting for the
+slowest one. Definitions come with ``extract_top_words`` and need no call.
+
+``call_tool`` is passed in (Streamlit's remote-or-stub ``call_tool``) so the
+pipeline runs the same against Functions and the local stubs. An optional
+``stream_tool`` (``(event, data)`` pairs, see ``azure_tools.stream_tool``)
+lets phrase cards start as soon as each expression is mined instead of after
+the whole list; word cards keep the one-shot ``example_sentence``, since a
+card needs the whole sentence anyway.
+
+The cards depend only on the video, the child's CEFR (and favourite
+character, for the sentences), so ``card_prefetcher`` starts them as soon as
+a video is selected, with ``X-Priority: background`` on every tool call, and
+keeps them for CARD_PREFETCH_TTL_SEC. ``stream_cards`` at "시청 완료" then
+replays finished cards at once and joins a run still in flight, raising its
+remaining calls to interactive priority. A failed run, or one where
+``call_tool`` answered from its local stubs (backend down), is dropped so the
+next attempt starts over.
+"""
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import async_runner
+from .azure_tools import Lane, tool_fallbacks, tool_priority
+
+WORD_COUNT = 5
+PHRASE_COUNT = 3
+VOICE = "en-US-AvaNeural"
+
+PREFETCH_ENABLED = os.getenv("CARD_PREFETCH", "true").lower() in ("1", "true", "yes")
+PREFETCH_TTL_SEC = float(os.getenv("CARD_PREFETCH_TTL_SEC", "1800"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("CARD_PREFETCH_MAX_ENTRIES", "32"))
+
+CallTool = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+StreamTool = Callable[[str, Dict[str, Any]], AsyncIterator[Tuple[str, Any]]]
+OnCard = Callable[[int, Dict[str, Any]], None]
+
+
+def _image_url(word: str = "") -> str:
+    return f"https://source.unsplash.com/400x240/?{word + ',' if word else ''}kids"
+
+
+def _phrase_cards(exps: Any) -> List[Dict[str, Any]]:
+    phrases = exps.get("phrases") if isinstance(exps, dict) else exps
+    return [{"phrase": p, "imageUrl": _image_url()} for p in (phrases or [])]
+
+
+async def _items(
+    call_tool: CallTool, video: Dict[str, Any], profile: Dict[str, Any], kind: str, stream_tool: Optional[StreamTool] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Uncompleted cards in rank order, each as soon as it is known."""
+    idx = await call_tool("index_video", {"videoUrl": video.get("url", "")})
+    tx_id = (idx or {}).get("transcriptId", "tx")
+    if kind == "phrases":
+        args = {"transcriptId": tx_id, "count": PHRASE_COUNT, "cefr": profile.get("cefr")}
+        if stream_tool is None:
+            for card in _phrase_cards(await call_tool("extract_top_expressions", args)):
+                yield card
+            return
+        streamed = 0
+        async for event, data in stream_tool("extract_top_expressions", args):
+            if event == "phrase" and isinstance(data, dict) and data.get("text"):
+                streamed += 1
+                yield {"phrase": data["text"], "imageUrl": _image_url()}
+            elif event == "done" and not streamed:
+                # Buffered answer (or the one-shot fallback): the whole list at once
+                for card in _phrase_cards(data):
+                    yield card
+        return
+    words = await call_tool("extract_top_words", {"transcriptId": tx_id, "count": WORD_COUNT, "cefr": profile.get("cefr")})
+    for w in words or []:
+        yield {"word": w.get("word", ""), "definition": w.get("definition", ""), "imageUrl": _image_url(w.get("word", ""))}
+
+
+async def _complete(call_tool: CallTool, card: Dict[str, Any], video: Dict[str, Any], profile: Dict[str, Any]) -> Dict[str, Any]:
+    text = card.get("word") or card.get("phrase") or ""
+    steps = [call_tool("say_word", {"word": text, "voice": VOICE})]
+    if "word" in card:
+        context = {"videoTitle": video.get("title", ""), "character": (profile.get("characters") or [""])[0]}
+        steps.append(call_tool("example_sentence", {"word": text, "cefr": profile.get("cefr"), "context": context}))
+    audio, *rest = await asyncio.gather(*steps, return_exceptions=True)
+    if isinstance(audio, dict):
+        # Prefetched so "발음 듣기" plays without another round trip
+        card["audioB64"] = audio.get("audioB64")
+        card["audioUrl"] = audio.get("audioUrl")
+    if rest:
+        card["sentence"] = rest[0].get("sentence", "") if isinstance(rest[0], dict) else ""
+    return card
+
+
+async def generate_cards(
+    call_tool: CallTool,
+    video: Dict[str, Any],
+    profile: Dict[str, Any],
+    kind: str = "words",
+    on_card: Optional[OnCard] = None,
+    stream_tool: Optional[StreamTool] = None,
+) -> List[Dict[str, Any]]:
+    """Cards for ``video`` in rank order; ``kind`` is "words" (child_view) or
+    "phrases" (child_view_v2). ``on_card(index, card)`` fires per finished card."""
+
+    async def _one(i: int, card: Dict[str, Any]) -> Dict[str, Any]:
+        card = await _complete(call_tool, card, video, profile)
+        if on_card is not None:
+            on_card(i, card)
+        return card
+
+    # Each card's own steps start as soon as the card is known
+    tasks: List["asyncio.Task[Dict[str, Any]]"] = []
+    try:
+        async for card in _items(call_tool, video, profile, kind, stream_tool):
+            tasks.append(asyncio.ensure_future(_one(len(tasks), card)))
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            task.cancel()  # no-op once done; stops the rest if the list failed
+
+
+class _Job:
+    """One generation run: cards as they finish plus the overall future."""
+
+    def __init__(self, background: bool):
+        self.cards: Dict[int, Dict[str, Any]] = {}
+        self.cond = threading.Condition()
+        self.future: Optional["concurrent.futures.Future[Any]"] = None
+        self.lane = Lane("background" if background else "interactive")
+        self.fallbacks: List[str] = []  # tools answered by the local stubs
+        self.ts = time.time()
+
+    async def run(self, coro: Awaitable[Any]) -> Any:
+        # Context set here is local to this task and the ones it spawns
+        tool_priority.set(self.lane)
+        tool_fallbacks.set(self.fallbacks)
+        return await coro
+
+    def on_card(self, i: int, card: Dict[str, Any]) -> None:
+        with self.cond:
+            self.cards[i] = card
+            self.cond.notify_all()
+
+    def on_done(self, _fut) -> None:
+        with self.cond:
+            self.cond.notify_all()
+
+    def iter_cards(self) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        sent = set()
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: len(self.cards) > len(sent) or self.future.done())
+                new = [(i, c) for i, c in sorted(self.cards.items()) if i not in sent]
+                finished = self.future.done()
+            for i, card in new:
+                sent.add(i)
+                yield i, card
+            if finished and len(sent) == len(self.cards):
+                break
+        self.future.result()  # re-raise a failed index/extract step
+
+
+class CardPrefetcher:
+    """Cards keyed by video, CEFR, character and kind, started speculatively
+    when a video is selected so "시청 완료" finds them ready (or in flight)."""
+
+    def __init__(self, ttl_sec: float = PREFETCH_TTL_SEC, max_entries: int = PREFETCH_MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._jobs: "OrderedDict[Tuple, _Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(video: Dict[str, Any], profile: Dict[str, Any], kind: str) -> Tuple:
+        return (video.get("id") or video.get("url", ""), profile.get("cefr"), (profile.get("characters") or [""])[0], kind)
+
+    def _job(
+        self, call_tool: CallTool, video: Dict[str, Any], profile: Dict[str, Any], kind: str, background: bool, stream_tool: Optional[StreamTool]
+    ) -> Tuple[_Job, bool]:
+        key = self.key(video, profile, kind)
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and time.time() - job.ts <= self.ttl_sec:
+                self._jobs.move_to_end(key)
+                if not background:
+                    job.lane.value = "interactive"  # the child is waiting now
+                return job, True
+            job = self._jobs[key] = _Job(background)
+            while len(self._jobs) > self.max_entries:
+                self._jobs.popitem(last=False)
+            # Submitted under the lock: a concurrent caller must never see a job without its future
+            coro = generate_cards(call_tool, video, profile, kind, on_card=job.on_card, stream_tool=stream_tool)
+            job.future = async_runner.submit(job.run(coro))
+
+        def _forget_failed(f):
+            # Stub cards are only good for this run, never for the cache
+            if f.cancelled() or f.exception() is not None or job.fallbacks:
+                with self._lock:
+                    if self._jobs.get(key) is job:
+                        del self._jobs[key]
+
+        job.future.add_done_callback(_forget_failed)
+        job.future.add_done_callback(job.on_done)
+        return job, False
+
+    def prefetch(
+        self, call_tool: CallTool, video: Dict[str, Any], profile: Dict[str, Any], kind: str = "words", stream_tool: Optional[StreamTool] = None
+    ) -> None:
+        """Start generating ``video``'s cards at background priority (no-op
+        when they are cached or already in flight)."""
+        if PREFETCH_ENABLED and (video.get("id") or video.get("url")):
+            self._job(call_tool, video, profile, kind, True, stream_tool)
+
+    def stream(
+        self, call_tool: CallTool, video: Dict[str, Any], profile: Dict[str, Any], kind: str = "words", stream_tool: Optional[StreamTool] = None
+    ) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Yield ``(index, card)`` from the calling thread: prefetched cards at
+        once, the rest as they finish; starts an interactive run on a miss."""
+        job, found = self._job(call_tool, video, profile, kind, False, stream_tool)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return job.iter_cards()
+
+
+card_prefetcher = CardPrefetcher()
+
+
+def stream_cards(
+    call_tool: CallTool, video: Dict[str, Any], profile: Dict[str, Any], kind: str = "words", stream_tool: Optional[StreamTool] = None
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Run (or join) the generation for ``video`` on the background loop and
+    yield ``(index, card)`` from the calling thread as cards finish."""
+    return card_prefetcher.stream(call_tool, video, profile, kind, stream_tool)
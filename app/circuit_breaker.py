@@ -0,0 +1,119 @@
+"""Per-tool circuit breakers for the Streamlit ``call_tool`` path.
+
+A breaker opens when the recent window of calls is mostly failures, or after a
+few consecutive failures. Calls slower than ``slow_call_sec`` count as
+failures. While open, ``allow()`` returns False and the caller goes straight
+to its local fallback. After ``open_sec`` the breaker turns half-open, lets a
+single probe through, and closes again if the probe succeeds. ``record(None)``
+(a cancelled call) only frees the probe slot. Breakers are
+shared by all sessions of the process (the backend is the same for every
+session), so state is guarded by a lock.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        consecutive_failures: int = 3,
+        slow_call_sec: float = 5.0,
+        open_sec: float = 30.0,
+    ):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.consecutive_failures = consecutive_failures
+        self.slow_call_sec = slow_call_sec
+        self.open_sec = open_sec
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)  # True = good call
+        self._streak = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_sec:
+                self.state = HALF_OPEN
+                self._probing = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, ok: Optional[bool], elapsed: float) -> None:
+        good = bool(ok) and elapsed <= self.slow_call_sec
+        with self._lock:
+            if ok is None:
+                if self.state == HALF_OPEN:
+                    self._probing = False
+                return
+            if self.state == HALF_OPEN:
+                self._probing = False
+                if good:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    self._streak = 0
+                else:
+                    self._open()
+                return
+            self._outcomes.append(good)
+            self._streak = 0 if good else self._streak + 1
+            bad = self._outcomes.count(False)
+            if self._streak >= self.consecutive_failures or (
+                len(self._outcomes) >= self.min_calls and bad / len(self._outcomes) >= self.failure_rate
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._outcomes)
+            retry_in = max(0.0, self.open_sec - (time.monotonic() - self._opened_at)) if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "calls": n,
+                "failureRate": round(self._outcomes.count(False) / n, 2) if n else 0.0,
+                "retryInSec": round(retry_in, 1),
+                "shortCircuited": self.short_circuited,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(name: str) -> CircuitBreaker:
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(
+                slow_call_sec=float(os.getenv("BREAKER_SLOW_CALL_SEC", "5")),
+                open_sec=float(os.getenv("BREAKER_OPEN_SEC", "30")),
+                failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+            )
+        return _breakers[name]
+
+
+def breaker_states() -> List[Dict[str, Any]]:
+    with _registry_lock:
+        items = sorted(_breakers.items())
+    return [{"tool": name, **b.snapshot()} for name, b in items]
@@ -0,0 +1,80 @@
+"""Text embeddings for the app side.
+
+With AZURE_OPENAI_EMBEDDING_DEPLOYMENT set, ``embed_texts`` calls the Azure
+OpenAI embeddings endpoint (through the shared gateway and client pool).
+Otherwise it uses ``local_embed``: hashed character 2/3-grams plus words,
+with Korean polite endings and particles stripped, L2-normalised. The
+stand-in needs no service and matches Korean paraphrases ("시작해요" /
+"시작하나요") well enough for near-duplicate lookups and tests. Vectors from
+the two embedders are not comparable; ``EMBEDDER`` names the active one so
+persisted indexes can tell.
+"""
+
+import math
+import os
+import re
+import zlib
+from typing import List
+
+from .aoai_gateway import BACKGROUND, gateway
+from .http_clients import get_client
+
+AOAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AOAI_KEY = os.getenv("AZURE_OPENAI_API_KEY")
+EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+
+LOCAL_DIM = 512
+EMBEDDER = f"aoai:{EMBEDDING_DEPLOYMENT}" if (AOAI_ENDPOINT and AOAI_KEY and EMBEDDING_DEPLOYMENT) else f"local:{LOCAL_DIM}"
+
+_PUNCT = re.compile(r"[^\w\s]")
+_SPACE = re.compile(r"\s+")
+# Korean polite endings and particles carry little meaning for lookups
+_ENDING = re.compile(r"(?:하나요|할까요|인가요|해요|나요|까요|세요|어요|아요|예요|에요|가요|요)$")
+_PARTICLE = re.compile(r"(?:은|는|이|가|을|를|에|도)$")
+
+
+def normalize_text(text: str) -> str:
+    return _SPACE.sub(" ", _PUNCT.sub(" ", (text or "").lower())).strip()
+
+
+def _unit(vec: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vec))
+    return [v / norm for v in vec] if norm else vec
+
+
+def stem(word: str) -> str:
+    word = _ENDING.sub("", word) or word
+    return _PARTICLE.sub("", word) if len(word) >= 3 else word
+
+
+def local_embed(text: str, dim: int = LOCAL_DIM) -> List[float]:
+    vec = [0.0] * dim
+    features = [stem(w) for w in normalize_text(text).split()]
+    compact = "".join(features)
+    for n in (2, 3):
+        features += [compact[i : i + n] for i in range(len(compact) - n + 1)]
+    for f in features:
+        h = zlib.crc32(f.encode("utf-8"))
+        vec[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    return _unit(vec)
+
+
+def cosine(a: List[float], b: List[float]) -> float:
+    """Dot product; both embedders return unit vectors."""
+    return sum(x * y for x, y in zip(a, b))
+
+
+async def embed_texts(texts: List[str], priority: int = BACKGROUND) -> List[List[float]]:
+    if not EMBEDDER.startswith("aoai:"):
+        return [local_embed(t) for t in texts]
+    url = f"{AOAI_ENDPOINT}/openai/deployments/{EMBEDDING_DEPLOYMENT}/embeddings?api-version={API_VERSION}"
+    headers = {"Content-Type": "application/json", "api-key": AOAI_KEY}
+    resp = await gateway.post(get_client("aoai"), url, headers, {"input": texts}, priority=priority)
+    resp.raise_for_status()
+    data = sorted(resp.json().get("data", []), key=lambda d: d.get("index", 0))
+    return [_unit(d["embedding"]) for d in data]
+
+
+async def embed_text(text: str, priority: int = BACKGROUND) -> List[float]:
+    return (await embed_texts([text], priority=priority))[0]
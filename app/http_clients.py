@@ -0,0 +1,100 @@
+"""Shared httpx.AsyncClient pools for the agent, the tool router and search.
+
+Clients keep connections alive between calls (one TLS handshake per host
+instead of one per request) and use HTTP/2 when the ``h2`` package is
+installed. An AsyncClient belongs to the event loop it was first used on, so
+pools are kept per running loop: everything inside one ``asyncio.run`` (an
+agent turn with its whole tool loop) shares connections, and a long-lived loop
+shares them for the life of the process.
+
+Call ``aclose_clients()`` before a loop ends; clients of loops that closed
+without it are dropped on the next lookup, and the rest are closed at exit.
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Any, Dict
+
+import httpx
+
+# Per-pool defaults; the timeout matches what each caller used before pooling
+CLIENT_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "aoai": {"timeout": 60},
+    "tools": {"timeout": 30},
+    "search": {"timeout": 20},
+}
+
+HTTP2 = importlib.util.find_spec("h2") is not None and os.getenv("HTTP2_DISABLED", "false").lower() not in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "50")),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SEC", "30")),
+    )
+
+
+def get_client(name: str = "default") -> httpx.AsyncClient:
+    """The pooled client called ``name`` for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        for stale in [lp for lp in _clients if lp.is_closed()]:
+            del _clients[stale]
+        pool = _clients.setdefault(loop, {})
+        client = pool.get(name)
+        if client is None or client.is_closed:
+            opts = {"timeout": 30, **CLIENT_DEFAULTS.get(name, {})}
+            client = pool[name] = httpx.AsyncClient(http2=HTTP2, limits=_limits(), **opts)
+        return client
+
+
+async def aclose_clients() -> None:
+    """Close the running loop's clients (e.g. at the end of ``asyncio.run``)."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        pool = _clients.pop(loop, {})
+    for client in pool.values():
+        await client.aclose()
+
+
+def run(coro):
+    """``asyncio.run`` that closes the pooled clients before the loop goes away."""
+
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await aclose_clients()
+
+    return asyncio.run(_main())
+
+
+@atexit.register
+def _shutdown() -> None:
+    with _lock:
+        pools = list(_clients.items())
+        _clients.clear()
+    for loop, pool in pools:
+        if loop.is_closed():
+            continue
+
+        async def _close(clients=list(pool.values())):
+            for c in clients:
+                await c.aclose()
+
+        try:
+            if loop.is_running():
+                # Loop owned by another thread (e.g. a background runner)
+                asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=5)
+            else:
+                loop.run_until_complete(_close())
+        except Exception:
+            pass
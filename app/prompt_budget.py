@@ -0,0 +1,144 @@
+"""Prompt token budget for the agent.
+
+``fit(messages)`` is applied before every completion in the tool loop:
+
+- The system prompt stays first and byte-identical, so Azure OpenAI can reuse
+  the cached prefix across calls.
+- Tool results from earlier user turns are re-serialized without URLs,
+  thumbnails, audio, transcript segments and long lists (cut lists end with
+  "... N more"); results of the current turn only lose payloads the model
+  cannot use (base64 audio, data URLs).
+- When the rest exceeds AGENT_PROMPT_BUDGET tokens, the oldest turns are
+  dropped in blocks of AGENT_COMPACT_BLOCK user turns and replaced by a short
+  local summary. Cutting in blocks keeps the prefix stable for several turns
+  instead of changing it on every call.
+
+Token counts use tiktoken when installed, otherwise a character heuristic
+(about 4 ASCII characters or 1 Hangul syllable per token).
+"""
+
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+BUDGET_TOKENS = int(os.getenv("AGENT_PROMPT_BUDGET", "6000"))
+COMPACT_BLOCK = int(os.getenv("AGENT_COMPACT_BLOCK", "4"))
+SUMMARY_LINES = int(os.getenv("AGENT_SUMMARY_LINES", "12"))
+MESSAGE_OVERHEAD = 4  # role/separators per chat message
+
+# Never useful to the model; dropped from every tool result
+_HEAVY_KEYS = {"audioB64"}
+# Needed while the turn is in progress (e.g. index_video on a search result),
+# dropped once the turn is over
+_STALE_KEYS = {"thumbnail", "url", "audioUrl", "mapUrl", "chartData", "segments"}
+_MAX_LIST = 5
+_MAX_STR = 400
+
+try:
+    import tiktoken
+
+    _enc = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _enc = None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    if _enc is not None:
+        return len(_enc.encode(text))
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+def message_tokens(m: Dict[str, Any]) -> int:
+    n = MESSAGE_OVERHEAD + count_tokens(m.get("content") or "")
+    for tc in m.get("tool_calls") or []:
+        fn = tc.get("function") or {}
+        n += count_tokens(fn.get("name") or "") + count_tokens(fn.get("arguments") or "")
+    return n
+
+
+def compact_value(value: Any, stale: bool = False) -> Any:
+    if isinstance(value, dict):
+        drop = _HEAVY_KEYS | (_STALE_KEYS if stale else set())
+        return {k: compact_value(v, stale) for k, v in value.items() if k not in drop}
+    if isinstance(value, list):
+        if not stale:
+            return [compact_value(v) for v in value]
+        items = [compact_value(v, stale) for v in value[:_MAX_LIST]]
+        if len(value) > _MAX_LIST:
+            items.append(f"... {len(value) - _MAX_LIST} more")
+        return items
+    if isinstance(value, str):
+        if value.startswith("data:"):
+            return "<omitted>"
+        if stale and len(value) > _MAX_STR:
+            return value[:_MAX_STR] + "..."
+    return value
+
+
+def compact_tool_result(result: Any, stale: bool = False) -> str:
+    """Serialized tool result for a ``tool`` message."""
+    return json.dumps(compact_value(result, stale), ensure_ascii=False)
+
+
+def _restale(m: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        content = compact_tool_result(json.loads(m.get("content") or "null"), stale=True)
+    except ValueError:
+        return m
+    return {**m, "content": content}
+
+
+def _turns(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Split at user messages so tool calls stay with their results."""
+    turns: List[List[Dict[str, Any]]] = []
+    for m in messages:
+        if m.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(m)
+    return turns
+
+
+def _clip(text: str, n: int = 100) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= n else text[:n] + "..."
+
+
+def summarize(turns: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Local, deterministic recap of dropped turns (the most recent lines)."""
+    lines: List[str] = []
+    for turn in turns:
+        for m in turn:
+            if m.get("role") == "user":
+                lines.append(f"- user: {_clip(m.get('content'))}")
+            elif m.get("role") == "assistant" and (m.get("content") or "").strip():
+                lines.append(f"- assistant: {_clip(m.get('content'))}")
+            elif m.get("role") == "tool":
+                lines.append(f"- tool {m.get('name', '')} was called")
+    return {"role": "system", "content": "Earlier in this conversation (summary):\n" + "\n".join(lines[-SUMMARY_LINES:])}
+
+
+def fit(messages: List[Dict[str, Any]], budget: int = None) -> List[Dict[str, Any]]:
+    budget = BUDGET_TOKENS if budget is None else budget
+    head = messages[:1] if messages and messages[0].get("role") == "system" else []
+    turns = _turns(messages[len(head):])
+    # Tool results of finished turns lose URLs/thumbnails/long lists
+    turns = [[_restale(m) if m.get("role") == "tool" else m for m in t] for t in turns[:-1]] + turns[-1:]
+
+    total = sum(message_tokens(m) for t in turns for m in t)
+    dropped = 0
+    summary = None
+    while total > budget and len(turns) - dropped > 1:
+        step = min(COMPACT_BLOCK, len(turns) - dropped - 1)
+        total -= sum(message_tokens(m) for t in turns[dropped : dropped + step] for m in t)
+        if summary is not None:
+            total -= message_tokens(summary)
+        dropped += step
+        summary = summarize(turns[:dropped])
+        total += message_tokens(summary)
+    kept = [m for t in turns[dropped:] for m in t]
+    return head + ([summary] if summary else []) + kept
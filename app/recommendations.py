@@ -0,0 +1,123 @@
+"""Per-child cache of video recommendations for the Streamlit views.
+
+Streamlit reruns the whole script on every click, and both child views ask
+``search_youtube_videos`` for recommendations at the top. ``RecoCache`` keeps
+the last result per child, profile (age, CEFR, characters) and watched set
+for the whole process. ``fetch(exclude_ids, refresh)`` asks the backend for
+videos other than ``exclude_ids``, so watched videos do not take up the
+``max`` slots, and with ``refresh`` it skips the backend's result cache:
+
+- a changed profile is a different key and fetches right away;
+- a newly watched video is a different key too (sessions of the same child
+  can have different watched sets); it is served from the profile's other
+  entries (minus watched videos) while its own fetch runs on the background
+  loop, and the next rerun picks it up;
+- an entry older than RECO_REFRESH_SEC is served while it refreshes in the
+  background; one older than RECO_CACHE_TTL_SEC, or with nothing unwatched
+  left, is fetched synchronously;
+- ``invalidate(profile, shown_ids)`` (the "새 영상 추천" button) drops the
+  child's entries; its next fetch also excludes ``shown_ids`` and bypasses
+  the backend cache, so it brings videos the child has not seen yet.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import async_runner
+
+TTL_SEC = float(os.getenv("RECO_CACHE_TTL_SEC", "3600"))
+REFRESH_SEC = float(os.getenv("RECO_REFRESH_SEC", "600"))
+MAX_ENTRIES = 256
+
+Fetch = Callable[[List[str], bool], Awaitable[List[Dict[str, Any]]]]
+
+
+def profile_key(profile: Dict[str, Any], max_results: int) -> Tuple:
+    return (
+        profile.get("childId", ""),
+        profile.get("age"),
+        profile.get("cefr"),
+        tuple(profile.get("characters") or []),
+        max_results,
+    )
+
+
+class RecoCache:
+    def __init__(self, ttl_sec: float = TTL_SEC, refresh_sec: float = REFRESH_SEC, max_entries: int = MAX_ENTRIES):
+        self.ttl_sec = ttl_sec
+        self.refresh_sec = refresh_sec
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        self._refreshing: Dict[Tuple, Any] = {}
+        self._renew: Dict[str, frozenset] = {}  # childId -> ids to skip on the next fetch
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, profile: Dict[str, Any], watched_ids: Iterable[str], fetch: Fetch, max_results: int) -> List[Dict[str, Any]]:
+        """Unwatched recommendations for ``profile``; ``fetch`` makes a new
+        coroutine calling the backend."""
+        watched = frozenset(watched_ids)
+        base = profile_key(profile, max_results)
+        key = base + (watched,)
+        now = time.time()
+        with self._lock:
+            own = entry = self._entries.get(key)
+            renew = self._renew.get(base[0])
+            if entry is None and renew is None:
+                # Another watched set of the same profile tides the rerun over
+                siblings = [e for k, e in self._entries.items() if k[:-1] == base and now - e["ts"] <= self.ttl_sec]
+                entry = max(siblings, key=lambda e: e["ts"]) if siblings else None
+        if entry is not None and now - entry["ts"] <= self.ttl_sec:
+            items = [it for it in entry["items"] if it.get("id") not in watched]
+            if items:
+                self.hits += 1
+                if entry is not own or now - entry["ts"] > self.refresh_sec:
+                    self._refresh(key, watched, fetch)
+                return items
+        self.misses += 1
+        items = async_runner.run(fetch(sorted(watched | (renew or frozenset())), renew is not None)) or []
+        with self._lock:
+            if self._renew.get(base[0]) is renew:
+                self._renew.pop(base[0], None)
+        self._store(key, items)
+        return [it for it in items if it.get("id") not in watched]
+
+    def invalidate(self, profile: Optional[Dict[str, Any]] = None, shown_ids: Iterable[str] = ()) -> None:
+        """Drop the entries of ``profile``'s child (every entry when None); the
+        child's next fetch skips ``shown_ids`` and the backend cache."""
+        with self._lock:
+            if profile is None:
+                self._entries.clear()
+            else:
+                child = profile.get("childId", "")
+                for key in [k for k in self._entries if k[0] == child]:
+                    del self._entries[key]
+                self._renew[child] = frozenset(shown_ids)
+
+    def _store(self, key: Tuple, items: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = {"items": list(items), "ts": time.time()}
+            if len(self._entries) > self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k]["ts"])
+                del self._entries[oldest]
+
+    def _refresh(self, key: Tuple, watched: frozenset, fetch: Fetch) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            fut = self._refreshing[key] = async_runner.submit(fetch(sorted(watched), False))
+
+        def _done(f):
+            with self._lock:
+                self._refreshing.pop(key, None)
+                renewing = key[0] in self._renew  # invalidated meanwhile: the renewed fetch wins
+            if not renewing and not f.cancelled() and f.exception() is None:
+                self._store(key, f.result() or [])
+
+        fut.add_done_callback(_done)
+
+
+reco_cache = RecoCache()
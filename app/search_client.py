@@ -1,24 +1,108 @@
-import os, json, httpx
+import os, json, time, threading
+from collections import OrderedDict
+
+from .embeddings import normalize_text, stem
+from .http_clients import get_client
+from .search_engine import HybridSearchEngine
 
 SEARCH_ENDPOINT = os.getenv("AZURE_SEARCH_ENDPOINT")
 SEARCH_KEY = os.getenv("AZURE_SEARCH_API_KEY")
 INDEX = os.getenv("AZURE_SEARCH_INDEX")
 
-async def search_docs(query: str, top: int = 5):
+# azure: remote index only; local: embedded engine only (offline dev/benchmarks);
+# tiered: embedded engine as an L1 of hot documents in front of the remote index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "azure").lower()
+SEARCH_SNAPSHOT = os.getenv("SEARCH_SNAPSHOT")
+L1_MIN_COVERAGE = float(os.getenv("SEARCH_L1_MIN_COVERAGE", "0.8"))
+L1_MAX_DOCS = int(os.getenv("SEARCH_L1_MAX_DOCS", "5000"))
+
+# Result cache: normalized query + top + index version, with a TTL
+CACHE_TTL_SEC = float(os.getenv("SEARCH_CACHE_TTL_SEC", "600"))
+CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+INDEX_VERSION = os.getenv("AZURE_SEARCH_INDEX_VERSION", "0")
+
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, hits)
+_cache_lock = threading.Lock()
+cache_stats = {"hits": 0, "misses": 0}
+
+_engine = None
+
+
+def local_engine() -> HybridSearchEngine:
+    """The embedded engine, loaded from SEARCH_SNAPSHOT on first use."""
+    global _engine
+    if _engine is None:
+        _engine = HybridSearchEngine.load_snapshot(SEARCH_SNAPSHOT) if SEARCH_SNAPSHOT and os.path.exists(SEARCH_SNAPSHOT) else HybridSearchEngine()
+    return _engine
+
+
+def _hit(doc):
+    return {"id": doc.get("id", ""), "content": doc.get("content", ""), "source": doc.get("source", "")}
+
+
+async def _remote_search(query: str, top: int):
     if not (SEARCH_ENDPOINT and SEARCH_KEY and INDEX):
         return [{"id": "env-missing", "content": "환경변수 설정을 확인하세요.", "source": ""}]
     url = f"{SEARCH_ENDPOINT}/indexes/{INDEX}/docs/search?api-version=2024-12-01-preview"
     headers = {"Content-Type": "application/json", "api-key": SEARCH_KEY}
     body = {"search": query, "queryType": "semantic", "top": top}
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.post(url, headers=headers, json=body)
-        r.raise_for_status()
-        data = r.json()
-        hits = []
-        for item in data.get("value", []):
-            hits.append({
-                "id": item.get("@search.documentId") or item.get("id", ""),
-                "content": item.get("content") or item.get("text") or "",
-                "source": item.get("source") or item.get("url") or "",
-            })
+    r = await get_client("search").post(url, headers=headers, json=body)
+    r.raise_for_status()
+    data = r.json()
+    hits = []
+    for item in data.get("value", []):
+        hits.append({
+            "id": item.get("@search.documentId") or item.get("id", ""),
+            "content": item.get("content") or item.get("text") or "",
+            "source": item.get("source") or item.get("url") or "",
+        })
+    return hits
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cased, punctuation-free, with Korean endings/particles stripped,
+    so "파닉스는 언제 시작해요?" and "파닉스 언제 시작하나요" share an entry."""
+    return " ".join(stem(w) for w in normalize_text(query).split())
+
+
+def _cache_key(query: str, top: int) -> tuple:
+    # The embedded engine's version changes with its content; tiered L1
+    # churn does not change what the remote index would answer
+    local_version = local_engine().version if SEARCH_BACKEND == "local" else 0
+    return (SEARCH_BACKEND, INDEX, INDEX_VERSION, local_version, normalize_query(query), int(top))
+
+
+async def search_docs(query: str, top: int = 5):
+    key = _cache_key(query, top)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now:
+            _cache.move_to_end(key)
+            cache_stats["hits"] += 1
+            return [dict(h) for h in entry[1]]
+    cache_stats["misses"] += 1
+    hits = await _search_uncached(query, top)
+    if not any(h.get("id") == "env-missing" for h in hits):
+        with _cache_lock:
+            _cache[key] = (now + CACHE_TTL_SEC, [dict(h) for h in hits])
+            while len(_cache) > CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+    return hits
+
+
+async def _search_uncached(query: str, top: int):
+    if SEARCH_BACKEND == "local":
+        return [_hit(d) for d in await local_engine().search(query, top)]
+    if SEARCH_BACKEND == "tiered":
+        engine = local_engine()
+        local = await engine.search(query, top)
+        # Serve from L1 when its best hit contains (nearly) every query term
+        if local and local[0]["coverage"] >= L1_MIN_COVERAGE:
+            return [_hit(d) for d in local]
+        hits = await _remote_search(query, top)
+        for h in hits:
+            if h["id"] and h["id"] != "env-missing":
+                engine.add(h, max_docs=L1_MAX_DOCS)
         return hits
+    return await _remote_search(query, top)
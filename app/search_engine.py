@@ -0,0 +1,259 @@
+"""Embedded hybrid search engine (BM25 + approximate vector search).
+
+A local stand-in for the Azure AI Search index behind ``search_docs``: used
+for offline development and benchmarks, and as a low-latency L1 in front of
+the remote index (see ``search_client``).
+
+- ``BM25Index``: inverted index over stemmed words plus Hangul character
+  bigrams (Korean words carry particles, so whole-word matching alone misses).
+- ``LSHIndex``: random-hyperplane LSH, several tables with one-bit multiprobe;
+  candidates are re-ranked by exact cosine, and small collections are simply
+  scanned.
+- ``HybridSearchEngine`` fuses both rankings with reciprocal rank fusion
+  (RRF, k=60) and can be saved to / loaded from a JSON snapshot, including the
+  vectors and the name of the embedder that produced them.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .embeddings import EMBEDDER, LOCAL_DIM, cosine, embed_text, local_embed, normalize_text, stem
+
+RRF_K = 60
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for word in normalize_text(text).split():
+        w = stem(word)
+        tokens.append(w)
+        if len(w) > 2 and _HANGUL.search(w):
+            tokens += [w[i : i + 2] for i in range(len(w) - 1)]
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Counter] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+
+    def add(self, doc_id: str, tokens: List[str]) -> None:
+        self.remove(doc_id)
+        tf = Counter(tokens)
+        self.doc_terms[doc_id] = tf
+        self.doc_len[doc_id] = len(tokens)
+        self.total_len += len(tokens)
+        for term, n in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = n
+
+    def remove(self, doc_id: str) -> None:
+        tf = self.doc_terms.pop(doc_id, None)
+        if tf is None:
+            return
+        self.total_len -= self.doc_len.pop(doc_id)
+        for term in tf:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+
+    def coverage(self, doc_id: str, tokens: List[str]) -> float:
+        """Share of the distinct query tokens that occur in the document."""
+        terms = set(tokens)
+        tf = self.doc_terms.get(doc_id) or {}
+        return sum(1 for t in terms if t in tf) / len(terms) if terms else 0.0
+
+    def search(self, tokens: List[str], k: int) -> List[Tuple[float, str]]:
+        n_docs = len(self.doc_terms)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs
+        scores: Dict[str, float] = {}
+        for term in set(tokens):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                denom = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / denom
+        return sorted(((s, d) for d, s in scores.items()), reverse=True)[:k]
+
+
+def _sparse(vec: List[float]) -> List[Tuple[int, float]]:
+    return [(i, v) for i, v in enumerate(vec) if v]
+
+
+class LSHIndex:
+    def __init__(self, dim: int, tables: int = 6, bits: int = 8, seed: int = 7, exact_below: int = 2000):
+        self.dim = dim
+        self.tables = tables
+        self.bits = bits
+        self.exact_below = exact_below
+        rng = random.Random(seed)
+        self.planes = [[[rng.gauss(0, 1) for _ in range(dim)] for _ in range(bits)] for _ in range(tables)]
+        self.buckets: List[Dict[int, set]] = [{} for _ in range(tables)]
+        self.vectors: Dict[str, List[float]] = {}
+        self.signatures: Dict[str, List[int]] = {}
+
+    def signature(self, vec: List[float]) -> List[int]:
+        nz = _sparse(vec)  # local_embed vectors are mostly zeros
+        sig = []
+        for planes in self.planes:
+            code = 0
+            for bit, plane in enumerate(planes):
+                if sum(plane[i] * v for i, v in nz) >= 0:
+                    code |= 1 << bit
+            sig.append(code)
+        return sig
+
+    def add(self, doc_id: str, vec: List[float], sig: Optional[List[int]] = None) -> None:
+        self.remove(doc_id)
+        sig = sig or self.signature(vec)
+        self.vectors[doc_id] = vec
+        self.signatures[doc_id] = sig
+        for table, code in zip(self.buckets, sig):
+            table.setdefault(code, set()).add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        sig = self.signatures.pop(doc_id, None)
+        self.vectors.pop(doc_id, None)
+        if sig is None:
+            return
+        for table, code in zip(self.buckets, sig):
+            docs = table.get(code)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del table[code]
+
+    def search(self, vec: List[float], k: int) -> List[Tuple[float, str]]:
+        if len(self.vectors) <= self.exact_below:
+            candidates: Iterable[str] = self.vectors.keys()
+        else:
+            found = set()
+            for table, code in zip(self.buckets, self.signature(vec)):
+                found |= table.get(code, set())
+                for bit in range(self.bits):  # multiprobe: neighbours one bit away
+                    found |= table.get(code ^ (1 << bit), set())
+            candidates = found
+        scored = [(cosine(vec, self.vectors[d]), d) for d in candidates]
+        return sorted(scored, reverse=True)[:k]
+
+
+class HybridSearchEngine:
+    def __init__(self, embedder: str = "", dim: int = 0):
+        self.embedder = embedder or f"local:{LOCAL_DIM}"
+        self.dim = dim or LOCAL_DIM
+        self.bm25 = BM25Index()
+        self.ann = LSHIndex(self.dim)
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.version = 0  # bumped on every change, for result caches
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(
+        self, doc: Dict[str, Any], vector: Optional[List[float]] = None, sig: Optional[List[int]] = None, max_docs: Optional[int] = None
+    ) -> None:
+        """Index ``doc`` ({"id", "content", "source", ...}). Without a vector,
+        ``local:`` engines embed it locally; other engines index it for
+        keyword search only. With ``max_docs``, a new doc evicts the oldest
+        ones to stay within it (checked under the same lock as the insert)."""
+        doc_id = str(doc["id"])
+        text = f"{doc.get('title', '')} {doc.get('content', '')}"
+        if vector is None and self.embedder.startswith("local:"):
+            vector = local_embed(text, self.dim)
+        with self._lock:
+            if max_docs and doc_id not in self.docs:
+                while self.docs and len(self.docs) >= max_docs:
+                    self._remove(next(iter(self.docs)))  # oldest first
+            self.docs[doc_id] = {k: v for k, v in doc.items() if k not in ("vector", "lsh")}
+            self.bm25.add(doc_id, tokenize(text))
+            if vector is not None:
+                self.ann.add(doc_id, vector, sig)
+            else:
+                self.ann.remove(doc_id)
+            self.version += 1
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        self.docs.pop(doc_id, None)
+        self.bm25.remove(doc_id)
+        self.ann.remove(doc_id)
+        self.version += 1
+
+    async def query_vector(self, query: str) -> Optional[List[float]]:
+        if self.embedder.startswith("local:"):
+            return local_embed(query, self.dim)
+        if self.embedder == EMBEDDER:
+            return await embed_text(query)
+        return None  # vectors from an embedder we cannot run: keyword search only
+
+    def search_with_vector(self, query: str, vector: Optional[List[float]], top: int = 5) -> List[Dict[str, Any]]:
+        depth = max(top * 4, 20)
+        tokens = tokenize(query)
+        with self._lock:
+            keyword = self.bm25.search(tokens, depth)
+            semantic = self.ann.search(vector, depth) if vector else []
+            fused: Dict[str, float] = {}
+            for ranking in (keyword, semantic):
+                for rank, (_, doc_id) in enumerate(ranking):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+            best = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:top]
+            return [
+                {**self.docs[d], "score": round(s, 6), "coverage": round(self.bm25.coverage(d, tokens), 3)}
+                for d, s in best
+            ]
+
+    async def search(self, query: str, top: int = 5) -> List[Dict[str, Any]]:
+        return self.search_with_vector(query, await self.query_vector(query), top)
+
+    def save_snapshot(self, path: str) -> None:
+        with self._lock:
+            docs = []
+            for d, doc in self.docs.items():
+                if d in self.ann.vectors:  # keyword-only docs have no vector
+                    doc = {**doc, "vector": [round(v, 6) for v in self.ann.vectors[d]], "lsh": self.ann.signatures[d]}
+                docs.append(doc)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"embedder": self.embedder, "dim": self.dim, "lsh": [self.ann.tables, self.ann.bits], "docs": docs}, f, ensure_ascii=False)
+
+    @classmethod
+    def load_snapshot(cls, path: str) -> "HybridSearchEngine":
+        """Snapshot: {"embedder", "dim", "docs": [{"id", "content", ..., "vector"?}]}
+        or a plain list of docs (embedded locally on load)."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            data = {"docs": data}
+        engine = cls(data.get("embedder", ""), int(data.get("dim") or 0))
+        same_lsh = data.get("lsh") == [engine.ann.tables, engine.ann.bits]
+        for doc in data.get("docs", []):
+            engine.add(doc, doc.get("vector"), doc.get("lsh") if same_lsh else None)
+        return engine
+
+
+if __name__ == "__main__":
+    # python -m app.search_engine docs.json snapshot.json
+    import sys
+
+    src, dst = sys.argv[1], sys.argv[2]
+    eng = HybridSearchEngine.load_snapshot(src)
+    eng.save_snapshot(dst)
+    print(f"indexed {len(eng)} docs -> {dst}")
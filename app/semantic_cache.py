@@ -0,0 +1,134 @@
+"""Semantic answer cache for general parent questions.
+
+Parents keep asking the same handful of questions ("5살 아이 영어 어떻게
+시작해요?") that the agent answers from the guide in the system prompt.
+``FAQCache`` embeds the normalised question, looks up near-duplicates in a
+``VectorIndex`` and returns the stored answer when the similarity passes
+FAQ_CACHE_THRESHOLD. The hashed ``local:`` embedder scores short questions
+that differ in one word ("start" / "stop") above any usable threshold, so
+with it only the same stemmed text hits: lower-cased, punctuation removed,
+Korean polite endings and particles stripped per word, so "시작해요?" and
+"시작하나요?" share an entry.
+
+Entries are scoped by ``cache_scope``: the caller's role and system messages,
+since both change what the agent answers.
+
+Only answers that cannot depend on per-child data are stored or served:
+- the conversation must be a single user question (no earlier context),
+- the question must not mention the child's own data (progress, reports,
+  recommendations, profile),
+- the turn that produced the answer must not have called any tool,
+- numbers must match exactly, so "5살" never gets the "3살" answer.
+"""
+
+import hashlib
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from .embeddings import EMBEDDER, embed_text, normalize_text, stem
+from .vector_index import VectorIndex
+
+ENABLED = os.getenv("FAQ_CACHE", "true").lower() in ("1", "true", "yes")
+THRESHOLD = float(os.getenv("FAQ_CACHE_THRESHOLD", "0.85"))
+TTL_SEC = float(os.getenv("FAQ_CACHE_TTL_SEC", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.getenv("FAQ_CACHE_MAX_ENTRIES", "500"))
+EXACT_ONLY = EMBEDDER.startswith("local:")
+
+# Questions about this child's own data are never answered from the cache
+PERSONAL_MARKERS = (
+    "우리 아이", "우리 애", "우리애", "제 아이", "내 아이", "저희 아이", "우리 딸", "우리 아들",
+    "진도", "리포트", "보고서", "레벨", "점수", "기록", "지난주", "이번 주", "이번주", "오늘",
+    "추천해", "찾아줘", "학원", "프로필", "저장",
+    "my child", "my kid", "my son", "my daughter", "report", "progress", "recommend",
+)
+_NUMBER = re.compile(r"\d+")
+
+
+def _numbers(text: str) -> List[str]:
+    return _NUMBER.findall(text)
+
+
+def cacheable_question(history: List[Dict[str, Any]]) -> Optional[str]:
+    """The question to cache on, or None when the turn may depend on child data."""
+    if not ENABLED:
+        return None
+    users = [m for m in history if m.get("role") == "user"]
+    others = [m for m in history if m.get("role") not in ("user", "system")]
+    if len(users) != 1 or others:
+        return None
+    question = (users[0].get("content") or "").strip()
+    lowered = question.lower()
+    if not question or len(question) > 300 or any(p in lowered for p in PERSONAL_MARKERS):
+        return None
+    return question
+
+
+def cache_scope(history: List[Dict[str, Any]], role: Optional[str] = None) -> str:
+    """Answers are shared only between turns with the same role and system messages."""
+    system = "\n".join(str(m.get("content") or "") for m in history if m.get("role") == "system")
+    return hashlib.sha1(f"{role or ''}\n{system}".encode("utf-8")).hexdigest()[:16]
+
+
+def _canonical(question: str) -> str:
+    return " ".join(stem(w) for w in normalize_text(question).split())
+
+
+def _key(question: str, scope: str) -> str:
+    return hashlib.sha1(f"{scope}\n{_canonical(question)}".encode("utf-8")).hexdigest()
+
+
+class FAQCache:
+    def __init__(self, threshold: float = THRESHOLD, ttl_sec: float = TTL_SEC, max_entries: int = MAX_ENTRIES, exact_only: bool = EXACT_ONLY):
+        self.threshold = threshold
+        self.exact_only = exact_only
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self.index = VectorIndex()
+        self.hits = 0
+        self.misses = 0
+
+    async def lookup(self, question: str, scope: str = "") -> Optional[str]:
+        key = _key(question, scope)
+        if self.exact_only:
+            entry = self.index.payloads().get(key)
+            candidates = [(1.0, key, entry)] if entry else []
+        else:
+            try:
+                vec = await embed_text(normalize_text(question))
+            except Exception:
+                return None
+            candidates = self.index.search(vec, k=3, min_score=self.threshold)
+        now = time.time()
+        for score, key, entry in candidates:
+            if entry["scope"] != scope:
+                continue
+            if now - entry["ts"] > self.ttl_sec:
+                self.index.delete(key)
+                continue
+            if entry["numbers"] == _numbers(question):
+                self.hits += 1
+                return entry["answer"]
+        self.misses += 1
+        return None
+
+    async def store(self, question: str, answer: str, scope: str = "") -> None:
+        if not answer:
+            return
+        try:
+            vec = [] if self.exact_only else await embed_text(normalize_text(question))
+        except Exception:
+            return
+        entry = {"question": question, "answer": answer, "numbers": _numbers(question), "scope": scope, "ts": time.time()}
+        self.index.upsert(_key(question, scope), vec, entry)
+        if len(self.index) > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entries = sorted((e["ts"], k) for k, e in self.index.payloads().items())
+        for _, key in entries[: len(entries) - self.max_entries]:
+            self.index.delete(key)
+
+
+faq_cache = FAQCache()
@@ -0,0 +1,138 @@
+"""Per-turn telemetry for the agent loop.
+
+Each ``chat_with_agent`` / ``stream_chat_with_agent`` call records a
+``TurnTrace``: one entry per completion (prompt/completion/cached tokens from
+the ``usage`` block, latency), one per tool call (latency, ok), the number of
+loop iterations and the wall time. Finished turns are passed to subscribers
+(``subscribe(fn)``) as plain dicts and kept in a rolling window that
+``stats()`` aggregates (p50/p95 wall time, token averages, per-tool latency and
+error rate, cost) and ``recent_turns()`` returns as-is; the parent view shows
+both.
+
+Streamed completions carry no ``usage`` block on the API version we pin, so
+their token counts are estimated with ``prompt_budget.count_tokens`` and
+flagged ``estimated``. Cost uses AOAI_PRICE_PROMPT_PER_1K /
+AOAI_PRICE_COMPLETION_PER_1K (USD, default 0).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+PRICE_PROMPT_PER_1K = float(os.getenv("AOAI_PRICE_PROMPT_PER_1K", "0"))
+PRICE_COMPLETION_PER_1K = float(os.getenv("AOAI_PRICE_COMPLETION_PER_1K", "0"))
+WINDOW = int(os.getenv("AGENT_TELEMETRY_WINDOW", "200"))
+
+_lock = threading.Lock()
+_turns: deque = deque(maxlen=WINDOW)
+_subscribers: List[Callable[[Dict[str, Any]], None]] = []
+
+
+def subscribe(fn: Callable[[Dict[str, Any]], None]) -> None:
+    """Call ``fn(turn)`` for every finished turn (e.g. to log or export it)."""
+    _subscribers.append(fn)
+
+
+class TurnTrace:
+    def __init__(self, mode: str = "chat", role: Optional[str] = None, tools_sent: int = 0):
+        self.mode = mode
+        self.role = role
+        self.tools_sent = tools_sent
+        self.completions: List[Dict[str, Any]] = []
+        self.tools: List[Dict[str, Any]] = []
+        self._started = time.perf_counter()
+
+    def completion(self, usage: Optional[Dict[str, Any]], elapsed: float, estimated: bool = False) -> None:
+        usage = usage or {}
+        details = usage.get("prompt_tokens_details") or {}
+        self.completions.append({
+            "promptTokens": int(usage.get("prompt_tokens") or 0),
+            "completionTokens": int(usage.get("completion_tokens") or 0),
+            "cachedTokens": int(details.get("cached_tokens") or 0),
+            "ms": round(elapsed * 1000, 1),
+            "estimated": estimated,
+        })
+
+    def tool_done(self, tc: Dict[str, Any], result: Any, elapsed: float) -> None:
+        ok = not (isinstance(result, dict) and "error" in result)
+        self.tools.append({"name": tc["function"]["name"], "ms": round(elapsed * 1000, 1), "ok": ok})
+
+    def finish(self, error: Optional[str] = None) -> Dict[str, Any]:
+        prompt = sum(c["promptTokens"] for c in self.completions)
+        completion = sum(c["completionTokens"] for c in self.completions)
+        turn = {
+            "ts": time.time(),
+            "mode": self.mode,
+            "role": self.role,
+            "iterations": len(self.completions),
+            "toolsSent": self.tools_sent,
+            "toolCalls": len(self.tools),
+            "promptTokens": prompt,
+            "completionTokens": completion,
+            "cachedTokens": sum(c["cachedTokens"] for c in self.completions),
+            "costUsd": round(prompt / 1000 * PRICE_PROMPT_PER_1K + completion / 1000 * PRICE_COMPLETION_PER_1K, 6),
+            "aoaiMs": round(sum(c["ms"] for c in self.completions), 1),
+            "wallMs": round((time.perf_counter() - self._started) * 1000, 1),
+            "completions": self.completions,
+            "tools": self.tools,
+            "error": error,
+        }
+        with _lock:
+            _turns.append(turn)
+        for fn in list(_subscribers):
+            try:
+                fn(turn)
+            except Exception:
+                pass
+        return turn
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def recent_turns(n: int = 20) -> List[Dict[str, Any]]:
+    """The last ``n`` finished turns, oldest first."""
+    with _lock:
+        return list(_turns)[-n:]
+
+
+def stats() -> Dict[str, Any]:
+    """Aggregates over the rolling window of recent turns."""
+    with _lock:
+        turns = list(_turns)
+    n = len(turns)
+    if not n:
+        return {"turns": 0}
+    per_tool: Dict[str, List[Dict[str, Any]]] = {}
+    for t in turns:
+        for call in t["tools"]:
+            per_tool.setdefault(call["name"], []).append(call)
+    wall = [t["wallMs"] for t in turns]
+    return {
+        "turns": n,
+        "errors": sum(1 for t in turns if t["error"]),
+        "wallMsP50": _pct(wall, 0.5),
+        "wallMsP95": _pct(wall, 0.95),
+        "aoaiShare": round(sum(t["aoaiMs"] for t in turns) / max(sum(wall), 1e-9), 3),
+        "avgIterations": round(sum(t["iterations"] for t in turns) / n, 2),
+        "avgToolCalls": round(sum(t["toolCalls"] for t in turns) / n, 2),
+        "avgPromptTokens": round(sum(t["promptTokens"] for t in turns) / n, 1),
+        "avgCompletionTokens": round(sum(t["completionTokens"] for t in turns) / n, 1),
+        "cachedTokenShare": round(sum(t["cachedTokens"] for t in turns) / max(sum(t["promptTokens"] for t in turns), 1), 3),
+        "costUsd": round(sum(t["costUsd"] for t in turns), 6),
+        "tools": {
+            name: {
+                "calls": len(calls),
+                "msP50": _pct([c["ms"] for c in calls], 0.5),
+                "msP95": _pct([c["ms"] for c in calls], 0.95),
+                "errorRate": round(sum(1 for c in calls if not c["ok"]) / len(calls), 3),
+            }
+            for name, calls in sorted(per_tool.items())
+        },
+    }
@@ -0,0 +1,93 @@
+"""Session-scoped memo for idempotent agent tools.
+
+Within one conversation the model often repeats read-only calls
+(``load_profile``, the same ``search_youtube_videos`` query, ``index_video``
+for a URL it already indexed). ``ToolMemo.call`` answers those from memory,
+keyed by tool name and canonical JSON arguments, and shares one in-flight call
+between identical concurrent requests. A mutating tool (``save_profile``,
+``update_progress``, ``save_prefs``) drops the entries of the same child, or
+every child-scoped entry when it carries no ``childId``. Failures are never
+stored.
+
+Keep one ``ToolMemo`` per conversation (e.g. in ``st.session_state``) and pass
+it to ``chat_with_agent``; without one, a fresh memo covers a single turn.
+"""
+
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+IDEMPOTENT_TOOLS = {
+    "search_youtube_videos",
+    "index_video",
+    "rank_video_by_level",
+    "extract_top_words",
+    "compute_level",
+    "parent_report",
+    "find_local_academies",
+    "search_academies_ai",
+    "say_word",
+    "load_profile",
+    "load_prefs",
+    "search_docs",
+}
+MUTATING_TOOLS = {"save_profile", "update_progress", "save_prefs"}
+
+Key = Tuple[str, str]
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    return json.dumps(args or {}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ToolMemo:
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[Key, Tuple[Optional[str], Any]]" = OrderedDict()
+        self._pending: Dict[Key, "asyncio.Future"] = {}
+        self._generation = 0  # bumped by invalidate(); in-flight reads from before are not stored
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, child_id: Optional[str] = None) -> None:
+        self._generation += 1
+        for key, (child, _) in list(self._results.items()):
+            if child is not None and (child_id is None or child == child_id):
+                del self._results[key]
+
+    async def call(self, name: str, args: Dict[str, Any], router: Callable[[str, Dict[str, Any]], Awaitable[Any]]) -> Any:
+        if name in MUTATING_TOOLS:
+            try:
+                return await router(name, args)
+            finally:
+                self.invalidate((args or {}).get("childId"))
+        if name not in IDEMPOTENT_TOOLS:
+            return await router(name, args)
+
+        key = (name, canonical_args(args))
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.hits += 1
+            return self._results[key][1]
+        task = self._pending.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            self.misses += 1
+            task = asyncio.ensure_future(router(name, args))
+            self._pending[key] = task
+            child, gen = (args or {}).get("childId"), self._generation
+            task.add_done_callback(lambda t: self._store(key, child, gen, t))
+        else:
+            self.hits += 1
+        # shield: one caller timing out must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _store(self, key: Key, child: Optional[str], generation: int, task: "asyncio.Future") -> None:
+        if self._pending.get(key) is task:
+            del self._pending[key]
+        if task.cancelled() or task.exception() is not None or generation != self._generation:
+            return
+        self._results[key] = (child, task.result())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
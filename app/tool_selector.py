@@ -0,0 +1,84 @@
+"""Per-turn tool subset selection for the agent.
+
+Sending all tool schemas with every completion costs prompt tokens (and
+latency) on turns where only a couple of tools make sense. ``select_tools``
+classifies the conversation into phases (recommend / learn / report / profile)
+with a keyword classifier over the recent user messages plus the caller's
+role, and returns the union of those phases' tools. Tools already called in
+the conversation stay available so follow-ups keep working, and when nothing
+matches the full spec is sent.
+
+Subsets are cached per set of names and keep the order of the full
+spec, so the same phase always produces the same ``tools`` payload (which also
+keeps the prompt prefix cacheable).
+"""
+
+import os
+import re
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("AGENT_TOOL_SELECTION", "true").lower() in ("1", "true", "yes")
+
+PHASE_TOOLS: Dict[str, FrozenSet[str]] = {
+    "recommend": frozenset({"search_youtube_videos", "index_video", "rank_video_by_level", "load_profile", "load_prefs"}),
+    "learn": frozenset({"index_video", "extract_top_words", "example_sentence", "say_word", "play_cheer", "update_progress"}),
+    "report": frozenset({"parent_report", "compute_level", "find_local_academies", "search_academies_ai", "load_profile"}),
+    "profile": frozenset({"save_profile", "load_profile", "save_prefs", "load_prefs"}),
+}
+
+# Lower-cased substrings; Korean stems match regardless of particles/endings
+PHASE_KEYWORDS: Dict[str, Sequence[str]] = {
+    "recommend": ("영상", "동영상", "비디오", "추천", "보고 싶", "볼래", "만화", "유튜브", "video", "watch", "recommend", "cartoon", "youtube", "peppa"),
+    "learn": ("단어", "배우", "공부", "문장", "발음", "읽어", "말해", "퀴즈", "카드", "시청 완료", "다 봤", "word", "learn", "sentence", "say", "pronounce", "quiz", "card", "finished"),
+    "report": ("리포트", "보고서", "레포트", "진도", "레벨", "수준", "성적", "학원", "주간", "report", "progress", "level", "academy", "academies", "week"),
+    "profile": ("프로필", "이름", "나이", "좋아하는 캐릭터", "설정", "저장", "즐겨찾기", "profile", "name", "age", "favorite", "save", "settings"),
+}
+
+# Default phases when the recent messages give no signal
+ROLE_PHASES: Dict[str, Sequence[str]] = {
+    "child": ("recommend", "learn"),
+    "parent": ("report", "profile"),
+}
+
+_SPACE = re.compile(r"\s+")
+
+
+def classify_phases(text: str) -> List[str]:
+    t = _SPACE.sub(" ", (text or "").lower())
+    return [phase for phase, words in PHASE_KEYWORDS.items() if any(w in t for w in words)]
+
+
+_subsets: Dict[Tuple[int, FrozenSet[str]], List[Dict[str, Any]]] = {}
+
+
+def _subset(spec: List[Dict[str, Any]], names: FrozenSet[str]) -> List[Dict[str, Any]]:
+    key = (id(spec), names)
+    if key not in _subsets:
+        _subsets[key] = [t for t in spec if t["function"]["name"] in names]
+    return _subsets[key]
+
+
+def select_tools(spec: List[Dict[str, Any]], messages: List[Dict[str, Any]], role: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Tools from ``spec`` relevant to the conversation so far."""
+    if not ENABLED:
+        return spec
+    users = [m.get("content") or "" for m in messages if m.get("role") == "user"]
+    phases = classify_phases(users[-1]) if users else []
+    if not phases and len(users) > 1:
+        # Short follow-ups ("응", "그거 해줘") stay in the previous phase
+        phases = classify_phases(users[-2])
+    if not phases:
+        phases = list(ROLE_PHASES.get((role or "").lower(), ()))
+
+    names = set()
+    for phase in phases:
+        names |= PHASE_TOOLS[phase]
+    for m in messages:
+        for tc in m.get("tool_calls") or []:
+            names.add(tc["function"]["name"])
+
+    available = {t["function"]["name"] for t in spec}
+    names &= available
+    if not phases or not names:
+        return spec
+    return _subset(spec, frozenset(names))
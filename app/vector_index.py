@@ -0,0 +1,44 @@
+"""In-memory vector index over unit vectors (exact cosine search).
+
+Pure Python; a linear scan of a few thousand ``embeddings.LOCAL_DIM``-d
+(512) vectors takes a few milliseconds, which is plenty for FAQ-sized
+collections.
+"""
+
+import heapq
+import threading
+from typing import Any, Dict, List, Tuple
+
+from .embeddings import cosine
+
+
+class VectorIndex:
+    def __init__(self):
+        self._vectors: Dict[str, List[float]] = {}
+        self._payloads: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def upsert(self, key: str, vector: List[float], payload: Any = None) -> None:
+        with self._lock:
+            self._vectors[key] = vector
+            self._payloads[key] = payload
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._vectors.pop(key, None)
+            self._payloads.pop(key, None)
+
+    def payloads(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._payloads)
+
+    def search(self, vector: List[float], k: int = 5, min_score: float = -1.0) -> List[Tuple[float, str, Any]]:
+        """Top ``k`` ``(score, key, payload)`` with score >= ``min_score``, best first."""
+        with self._lock:
+            items = list(self._vectors.items())
+        scored = ((cosine(vector, v), key) for key, v in items)
+        top = heapq.nlargest(k, (s for s in scored if s[0] >= min_score))
+        return [(score, key, self._payloads.get(key)) for score, key in top]
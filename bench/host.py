@@ -0,0 +1,125 @@
+"""Minimal in-process host for function_app.
+
+Dispatches HTTP requests to the functions registered on ``function_app.app``
+the way the Functions host does (route template match, thread pool for sync
+handlers), so the benchmark does not need Azure Functions Core Tools.
+Use ``--target`` in run.py to benchmark a real ``func start`` instead.
+"""
+
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions")
+
+
+def load_app():
+    if FUNCTIONS_DIR not in sys.path:
+        sys.path.insert(0, FUNCTIONS_DIR)
+    import function_app
+
+    return function_app.app
+
+
+class FunctionsHost:
+    def __init__(self, app=None, workers: int = 16, port: int = 0):
+        import azure.functions as func
+
+        self._func = func
+        self.app = app or load_app()
+        self._routes: Dict[Tuple[str, str], object] = {}
+        for f in self.app.get_functions():
+            trigger = f.get_trigger()
+            for method in getattr(trigger, "methods", None) or ["GET", "POST"]:
+                self._routes[(str(getattr(method, "value", method)).upper(), trigger.route.strip("/"))] = f.get_user_function()
+        # PYTHON_THREADPOOL_THREAD_COUNT equivalent: cap concurrent sync invocations
+        self._slots = threading.BoundedSemaphore(workers)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FunctionsHost":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="functions-host", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def invoke(self, method: str, raw_path: str, headers: Dict[str, str], body: bytes):
+        func = self._func
+        parsed = urlparse(raw_path)
+        fn = self._routes.get((method, parsed.path.strip("/")))
+        if fn is None:
+            return func.HttpResponse("not found", status_code=404)
+        req = func.HttpRequest(
+            method=method,
+            url=raw_path,
+            headers=headers,
+            params={k: v[0] for k, v in parse_qs(parsed.query).items()},
+            body=body,
+        )
+        with self._slots:
+            try:
+                return fn(req)
+            except Exception as e:
+                return func.HttpResponse(f"unhandled: {e}", status_code=500)
+
+    def _handler_class(self):
+        host = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _serve(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                resp = host.invoke(method, self.path, dict(self.headers.items()), body)
+                payload = resp.get_body() or b""
+                self.send_response(resp.status_code)
+                ctype = resp.headers.get("Content-Type") or resp.mimetype or "application/octet-stream"
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Serve function_app on 127.0.0.1 without Core Tools")
+    ap.add_argument("--port", type=int, default=7071)
+    ap.add_argument("--workers", type=int, default=16)
+    args = ap.parse_args(argv)
+    host = FunctionsHost(workers=args.workers, port=args.port).start()
+    print(f"READY {host.url}", flush=True)
+    try:
+        host._thread.join()
+    except KeyboardInterrupt:
+        host.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""Load-test the /tools/* routes against local upstream stand-ins.
+
+Starts the stand-ins from standins.py, points function_app at them, runs the
+app in a local host process (or targets a running ``func start`` with --target), drives each
+route at the requested concurrency and reports throughput and latency
+percentiles. Runs offline on a laptop:
+
+    python bench/run.py --concurrency 16 --requests 300 --latency aoai=400,youtube=80
+    python bench/run.py --json bench/baseline.json
+    python bench/run.py --baseline bench/baseline.json --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import standins  # noqa: E402
+
+PAYLOADS: Dict[str, Dict[str, Any]] = {
+    "search_youtube_videos": {"age": 5, "cefr": "A1", "characters": ["Peppa Pig"], "max": 5},
+    "index_video": {"videoUrl": "https://www.youtube.com/watch?v=bench0001"},
+    "rank_video_by_level": {"transcriptId": "tx_bench", "cefr": "A1"},
+    "extract_top_words": {"transcriptId": "tx_bench", "count": 5, "cefr": "A1"},
+    "extract_top_expressions": {"transcriptId": "tx_bench", "count": 3, "cefr": "A1"},
+    "example_sentence": {"word": "forest", "cefr": "A1", "context": {"videoTitle": "Bench", "character": "Bluey"}},
+    "update_progress": {"childId": "bench", "videoId": "v1", "learnedWords": ["forest"], "quizScore": 90, "durationSec": 300},
+    "compute_level": {"childId": "bench"},
+    "find_local_academies": {"address": "서울 마포구 합정동", "radiusMeters": 3000, "topK": 5},
+    "search_academies_ai": {"region": "서울 마포구", "topK": 5},
+    "play_cheer": {"voice": "child", "style": "cheerful"},
+    "parent_report": {"childId": "bench", "period": "7d"},
+    "say_word": {"word": "forest"},
+    "save_profile": {"childId": "bench", "name": "B", "age": 5, "region": "Seoul", "study": "없다", "characters": [], "cefr": "A1"},
+    "load_profile": {"childId": "bench"},
+    "save_prefs": {"childId": "bench", "recent_videos": [], "favorite_videos": []},
+    "load_prefs": {"childId": "bench"},
+}
+
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = max(0, min(len(sorted_vals) - 1, int(round(p / 100.0 * len(sorted_vals) + 0.5)) - 1))
+    return sorted_vals[k]
+
+
+async def drive_route(client: httpx.AsyncClient, base: str, route: str, concurrency: int, requests: int) -> Dict[str, Any]:
+    url = f"{base}/tools/{route}"
+    body = PAYLOADS[route]
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            t0 = time.perf_counter()
+            try:
+                r = await client.post(url, json=body)
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    lat = sorted(latencies)
+    return {
+        "route": route,
+        "requests": len(lat),
+        "errors": errors,
+        "rps": round(len(lat) / wall, 1) if wall > 0 else 0.0,
+        "p50Ms": round(percentile(lat, 50), 1),
+        "p95Ms": round(percentile(lat, 95), 1),
+        "p99Ms": round(percentile(lat, 99), 1),
+    }
+
+
+def parse_kv(spec: Optional[str], cast=float) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            k, v = part.split("=", 1)
+            out[k.strip()] = cast(v)
+    return out
+
+
+def standin_config(args) -> Dict[str, Dict[str, Any]]:
+    cfg: Dict[str, Dict[str, Any]] = {name: {} for name in standins.UPSTREAMS}
+    for key, spec, cast in (
+        ("latency_ms", args.latency, float),
+        ("jitter_ms", args.jitter, float),
+        ("error_rate", args.error_rate, float),
+        ("error_status", args.error_status, int),
+    ):
+        for name, v in parse_kv(spec, cast).items():
+            if name == "all":
+                for c in cfg.values():
+                    c[key] = v
+            elif name in cfg:
+                cfg[name][key] = v
+            else:
+                raise SystemExit(f"unknown upstream '{name}' (expected one of {', '.join(standins.UPSTREAMS)} or all)")
+    return cfg
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {r["route"]: r for r in json.load(f).get("results", [])}
+    regressions = []
+    for r in results:
+        b = base.get(r["route"])
+        if not b or not b.get("p95Ms"):
+            continue
+        if r["p95Ms"] > b["p95Ms"] * (1 + tolerance):
+            regressions.append(f"{r['route']}: p95 {r['p95Ms']} ms vs baseline {b['p95Ms']} ms")
+    return regressions
+
+
+async def run(args) -> int:
+    stands = standins.start_all(standin_config(args))
+    host = None
+    try:
+        if args.target:
+            base = args.target.rstrip("/")
+            print("Targeting external host; configure it with:", file=sys.stderr)
+            for k, v in standins.env_for(stands).items():
+                print(f"  {k}={v}", file=sys.stderr)
+        else:
+            # Host the app in its own process so the driver and stand-ins do not
+            # share its GIL, like a real Functions worker.
+            env = {**os.environ, **standins.env_for(stands)}
+            host = subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "host.py"), "--port", "0", "--workers", str(args.workers)],
+                env=env,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            line = host.stdout.readline().strip()
+            if not line.startswith("READY "):
+                raise SystemExit(f"functions host failed to start: {line!r}")
+            base = line.split(" ", 1)[1]
+
+        routes = [r.strip() for r in args.routes.split(",")] if args.routes else list(PAYLOADS)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        results = []
+        async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+            for route in routes:
+                if route not in PAYLOADS:
+                    raise SystemExit(f"unknown route '{route}'")
+                # Warm up (first import of lazy SDKs, connection setup) outside the measurement
+                await drive_route(client, base, route, min(args.concurrency, 2), min(args.requests, 4))
+                results.append(await drive_route(client, base, route, args.concurrency, args.requests))
+    finally:
+        if host:
+            host.terminate()
+            host.wait(timeout=10)
+        for s in stands.values():
+            s.stop()
+
+    print(f"{'route':<26} {'n':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(f"{r['route']:<26} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8} {r['p50Ms']:>8} {r['p95Ms']:>8} {r['p99Ms']:>8}")
+    print("upstream calls: " + ", ".join(f"{n}={s.requests}" for n, s in stands.items()))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"concurrency": args.concurrency, "requests": args.requests, "results": results}, f, indent=2)
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            return 1
+    return 0
+
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--routes", help="comma-separated tool names (default: all)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200, help="requests per route")
+    ap.add_argument("--workers", type=int, default=16, help="in-process host worker threads")
+    ap.add_argument("--target", help="benchmark an already running host, e.g. http://localhost:7071")
+    ap.add_argument("--latency", help="per-upstream latency in ms, e.g. aoai=400,youtube=80 or all=50")
+    ap.add_argument("--jitter", help="per-upstream +/- jitter in ms")
+    ap.add_argument("--error-rate", help="per-upstream error probability, e.g. aoai=0.05")
+    ap.add_argument("--error-status", help="per-upstream injected status, e.g. aoai=429")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--baseline", help="fail if any route's p95 regresses past --tolerance vs this results file")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    return asyncio.run(run(ap.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
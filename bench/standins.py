@@ -0,0 +1,272 @@
+"""Local stand-ins for every upstream the Functions app talks to.
+
+Each stand-in is a small threaded HTTP server that answers the subset of the
+real API the tool routes use, with configurable latency, jitter and error
+injection. No network access or keys are needed.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+Response = Tuple[int, Dict[str, str], bytes]
+Handler = Callable[[str, Dict[str, List[str]], bytes, "re.Match"], Response]
+
+UPSTREAMS = ("youtube", "aoai", "speech", "maps", "search")
+
+
+def _json(data: Any, status: int = 200) -> Response:
+    return status, {"Content-Type": "application/json"}, json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _vid(seed: str, i: int) -> str:
+    return f"v{zlib.crc32(f'{seed}:{i}'.encode()) % 10**10:010d}"
+
+
+# --- upstream fakes ---------------------------------------------------------
+
+def youtube_routes() -> List[Tuple[str, str, Handler]]:
+    def search(path, query, body, m):
+        q = (query.get("q") or [""])[0]
+        n = int((query.get("maxResults") or ["10"])[0])
+        return _json({"items": [{"id": {"kind": "youtube#video", "videoId": _vid(q, i)}} for i in range(n)]})
+
+    def videos(path, query, body, m):
+        ids = [x for x in (query.get("id") or [""])[0].split(",") if x]
+        items = []
+        for vid in ids:
+            secs = 60 + zlib.crc32(vid.encode()) % 600
+            items.append({
+                "id": vid,
+                "snippet": {
+                    "title": f"Peppa Pig phonics song {vid[-3:]}",
+                    "channelTitle": "Peppa Pig",
+                    "thumbnails": {"high": {"url": f"https://img.youtube.com/vi/{vid}/hqdefault.jpg"}},
+                },
+                "contentDetails": {"duration": f"PT{secs // 60}M{secs % 60}S", "caption": "true"},
+                "status": {"embeddable": True},
+            })
+        return _json({"items": items})
+
+    return [("GET", r"/youtube/v3/search$", search), ("GET", r"/youtube/v3/videos$", videos)]
+
+
+def aoai_routes() -> List[Tuple[str, str, Handler]]:
+    def chat(path, query, body, m):
+        req = json.loads(body or b"{}")
+        wants_json = (req.get("response_format") or {}).get("type") == "json_object"
+        if wants_json:
+            content = json.dumps({"phrases": ["Let's play together", "Look at that", "Time to go home", "I can do it", "Well done"]})
+        else:
+            content = "I like to play in the park."
+        if req.get("stream"):
+            # One chunk per word, like the token stream of the real service
+            words = content.split(" ")
+            chunks = [{"choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]}]
+            chunks += [{"choices": [{"index": 0, "delta": {"content": w if i == 0 else " " + w}}]} for i, w in enumerate(words)]
+            chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            payload = "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+            return 200, {"Content-Type": "text/event-stream"}, payload.encode("utf-8")
+        return _json({
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 12, "total_tokens": 132},
+        })
+
+    def embeddings(path, query, body, m):
+        inputs = json.loads(body or b"{}").get("input") or []
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return _json({
+            "data": [{"index": i, "embedding": [((hash(t) >> k) & 1) - 0.5 for k in range(16)]} for i, t in enumerate(inputs)],
+            "usage": {"prompt_tokens": 8 * len(inputs), "total_tokens": 8 * len(inputs)},
+        })
+
+    return [
+        ("POST", r"/openai/deployments/[^/]+/chat/completions$", chat),
+        ("POST", r"/openai/deployments/[^/]+/embeddings$", embeddings),
+    ]
+
+
+def speech_routes() -> List[Tuple[str, str, Handler]]:
+    audio = b"ID3" + bytes(4093)  # ~4 KB, the size of a short word clip
+
+    def tts(path, query, body, m):
+        return 200, {"Content-Type": "audio/mpeg"}, audio
+
+    return [("POST", r"/cognitiveservices/v1$", tts)]
+
+
+def maps_routes() -> List[Tuple[str, str, Handler]]:
+    def geocode(path, query, body, m):
+        return _json({"results": [{"position": {"lat": 37.59, "lon": 126.92}}]})
+
+    def fuzzy(path, query, body, m):
+        q = (query.get("query") or [""])[0]
+        limit = int((query.get("limit") or ["10"])[0])
+        return _json({"results": [
+            {
+                "poi": {"id": _vid(q, i), "name": f"{q} {i + 1}", "phone": "02-000-0000"},
+                "address": {"freeformAddress": f"Seoul {i + 1}"},
+                "position": {"lat": 37.59, "lon": 126.92},
+                "dist": 100.0 * (i + 1),
+            }
+            for i in range(limit)
+        ]})
+
+    return [("GET", r"/search/address/json$", geocode), ("GET", r"/search/fuzzy/json$", fuzzy)]
+
+
+def search_routes() -> List[Tuple[str, str, Handler]]:
+    def docs(path, query, body, m):
+        top = int((query.get("$top") or ["5"])[0])
+        return _json({"value": [{"name": f"Academy {i}", "address": "Seoul", "phone": "02-000-0000"} for i in range(top)]})
+
+    def search(path, query, body, m):
+        req = json.loads(body or b"{}")
+        if req.get("filter"):
+            return _json({"value": []})  # filtered lookups (ingestion) match nothing stored
+        top = int(req.get("top") or 5)
+        return _json({"value": [
+            {"id": f"doc{i}", "content": f"Curriculum note {i} for {req.get('search', '')}", "source": "faq", "@search.score": 1.0 / (i + 1)}
+            for i in range(top)
+        ]})
+
+    def index(path, query, body, m):
+        batch = json.loads(body or b"{}").get("value") or []
+        return _json({"value": [{"key": d.get("id"), "status": True, "statusCode": 200} for d in batch]})
+
+    return [
+        ("GET", r"/indexes/([^/]+)/docs$", docs),
+        ("POST", r"/indexes/([^/]+)/docs/search$", search),
+        ("POST", r"/indexes/([^/]+)/docs/index$", index),
+    ]
+
+
+ROUTES = {
+    "youtube": youtube_routes,
+    "aoai": aoai_routes,
+    "speech": speech_routes,
+    "maps": maps_routes,
+    "search": search_routes,
+}
+
+
+# --- server -----------------------------------------------------------------
+
+class StandIn:
+    """One upstream stand-in on 127.0.0.1 with latency/error injection."""
+
+    def __init__(
+        self,
+        name: str,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        port: int = 0,
+    ):
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self._routes = [(meth, re.compile(rx), fn) for meth, rx, fn in ROUTES[name]()]
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandIn":
+        self._thread = threading.Thread(target=self._server.serve_forever, name=f"standin-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _dispatch(self, method: str, raw_path: str, body: bytes) -> Response:
+        with self._lock:
+            self.requests += 1
+        delay = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        if self.error_rate and random.random() < self.error_rate:
+            headers = {"Retry-After": "1"} if self.error_status == 429 else {}
+            status, h, payload = _json({"error": {"code": str(self.error_status), "message": "injected"}}, self.error_status)
+            return status, {**h, **headers}, payload
+        parsed = urlparse(raw_path)
+        query = parse_qs(parsed.query)
+        for meth, rx, fn in self._routes:
+            m = rx.search(parsed.path)
+            if meth == method and m:
+                return fn(parsed.path, query, body, m)
+        return _json({"error": f"{self.name} stand-in: no route for {method} {parsed.path}"}, 404)
+
+    def _handler_class(self):
+        standin = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _serve(self, method: str) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, payload = standin._dispatch(method, self.path, body)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return _Handler
+
+
+def start_all(config: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, StandIn]:
+    """Start one stand-in per upstream. ``config`` maps upstream name to
+    StandIn keyword arguments (latency_ms, jitter_ms, error_rate, error_status)."""
+    config = config or {}
+    return {name: StandIn(name, **config.get(name, {})).start() for name in UPSTREAMS}
+
+
+def env_for(standins: Dict[str, StandIn]) -> Dict[str, str]:
+    """Environment that points function_app at the stand-ins."""
+    return {
+        "YOUTUBE_API_KEY": "bench",
+        "YOUTUBE_API_BASE": standins["youtube"].url + "/youtube/v3",
+        "AZURE_OPENAI_ENDPOINT": standins["aoai"].url,
+        "AZURE_OPENAI_API_KEY": "bench",
+        "AZURE_OPENAI_DEPLOYMENT": "bench-chat",
+        "AZURE_OPENAI_EMBEDDING_DEPLOYMENT": "bench-embed",
+        "AZURE_SPEECH_REGION": "local",
+        "AZURE_SPEECH_KEY": "bench",
+        "AZURE_SPEECH_ENDPOINT": standins["speech"].url,
+        "AZURE_MAPS_KEY": "bench",
+        "AZURE_MAPS_ENDPOINT": standins["maps"].url,
+        "AZURE_SEARCH_ENDPOINT": standins["search"].url,
+        "AZURE_SEARCH_API_KEY": "bench",
+        "AZURE_SEARCH_INDEX": "kidsenglish",
+    }
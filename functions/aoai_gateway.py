@@ -0,0 +1,231 @@
+"""Shared gateway for Azure OpenAI calls made by the tool routes.
+
+- AIMD concurrency limit: +1 slot per window of successful calls, halved on a
+  429/503 or a failed call (timeout, reset), bounded by
+  AOAI_MIN_CONCURRENCY..AOAI_MAX_CONCURRENCY.
+- Priority lanes: waiting interactive calls are admitted before background
+  ones (callers opt into the background lane with ``X-Priority: background``).
+- Queueing with deadlines: a call that cannot start within AOAI_DEADLINE_SEC
+  raises GatewayTimeout so the route can fall back quickly.
+- 429/503 retries honour ``retry-after-ms`` / ``Retry-After`` and otherwise
+  back off exponentially with jitter; no retry is started past the deadline.
+
+app/aoai_gateway.py is the asyncio twin used by the agent; the two deploy
+separately so each keeps its own limiter.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import metrics
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class GatewayTimeout(RuntimeError):
+    """The call could not be admitted or completed before its deadline."""
+
+
+def priority_from_headers(headers) -> int:
+    return BACKGROUND if (headers.get("x-priority") or "").lower() == "background" else INTERACTIVE
+
+
+def retry_after_seconds(resp) -> Optional[float]:
+    ms = resp.headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    ra = resp.headers.get("retry-after")
+    if ra:
+        try:
+            return float(ra)
+        except ValueError:
+            return None
+    return None
+
+
+class AIMDLimiter:
+    def __init__(self, initial: float = 4, minimum: float = 1, maximum: float = 16, decrease: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.decrease = decrease
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters: List[List[Any]] = []  # heap of [priority, seq, granted, cancelled]
+        self._seq = itertools.count()
+
+    def acquire(self, priority: int, deadline: float) -> None:
+        with self._cond:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return
+            waiter = [priority, next(self._seq), False, False]
+            heapq.heappush(self._waiters, waiter)
+            while not waiter[2]:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    waiter[3] = True
+                    raise GatewayTimeout("AOAI queue deadline exceeded")
+                self._cond.wait(remaining)
+
+    def release(self, throttled: bool) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / max(self.limit, 1.0))
+            self._grant()
+
+    def _grant(self) -> None:
+        granted = False
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = heapq.heappop(self._waiters)
+            if waiter[3]:
+                continue
+            waiter[2] = True
+            self.in_flight += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+
+class AOAIGateway:
+    def __init__(
+        self,
+        limiter: AIMDLimiter,
+        max_retries: int = 3,
+        deadline_sec: float = 12.0,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+    ):
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.deadline_sec = deadline_sec
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+    @classmethod
+    def from_env(cls) -> "AOAIGateway":
+        return cls(
+            AIMDLimiter(
+                initial=float(os.getenv("AOAI_INITIAL_CONCURRENCY", "4")),
+                minimum=float(os.getenv("AOAI_MIN_CONCURRENCY", "1")),
+                maximum=float(os.getenv("AOAI_MAX_CONCURRENCY", "16")),
+            ),
+            max_retries=int(os.getenv("AOAI_MAX_RETRIES", "3")),
+            deadline_sec=float(os.getenv("AOAI_DEADLINE_SEC", "12")),
+        )
+
+    def _backoff(self, resp, attempt: int) -> float:
+        delay = retry_after_seconds(resp)
+        if delay is None:
+            delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return delay + random.uniform(0, delay * 0.1)
+
+    def post(
+        self,
+        client,
+        url: str,
+        headers: Dict[str, str],
+        body: Dict[str, Any],
+        op: str,
+        priority: int = INTERACTIVE,
+        deadline_sec: Optional[float] = None,
+    ):
+        """POST through the limiter and return the final response; the caller
+        still calls ``raise_for_status()``."""
+        deadline = time.monotonic() + (deadline_sec or self.deadline_sec)
+        attempt = 0
+        while True:
+            self.limiter.acquire(priority, deadline)
+            throttled = False
+            try:
+                with metrics.track_upstream("aoai", op) as call:
+                    resp = client.post(url, headers=headers, json=body)
+                    call.status = resp.status_code
+                throttled = resp.status_code in (429, 503)
+            except Exception:
+                throttled = True  # timeout / reset: back off like on a 429
+                raise
+            finally:
+                self.limiter.release(throttled)
+            if resp.status_code not in (429, 503) or attempt >= self.max_retries:
+                return resp
+            metrics.inc("aoai_retries_total", op=op, status=resp.status_code)
+            delay = self._backoff(resp, attempt)
+            if time.monotonic() + delay >= deadline:
+                return resp
+            time.sleep(delay)
+            attempt += 1
+
+    @contextmanager
+    def stream(
+        self,
+        client,
+        url: str,
+        headers: Dict[str, str],
+        body: Dict[str, Any],
+        op: str,
+        priority: int = INTERACTIVE,
+        deadline_sec: Optional[float] = None,
+    ):
+        """Like ``post`` for ``stream: true`` bodies: retries happen on the
+        status line, and the slot is held until the caller finishes reading."""
+        deadline = time.monotonic() + (deadline_sec or self.deadline_sec)
+        attempt = 0
+        while True:
+            self.limiter.acquire(priority, deadline)
+            throttled = False
+            delay = None
+            try:
+                with metrics.track_upstream("aoai", op) as call, client.stream("POST", url, headers=headers, json=body) as resp:
+                    call.status = resp.status_code
+                    throttled = resp.status_code in (429, 503)
+                    if resp.status_code in (429, 503) and attempt < self.max_retries:
+                        delay = self._backoff(resp, attempt)
+                        if time.monotonic() + delay >= deadline:
+                            delay = None
+                    if delay is None:
+                        yield resp
+                        return
+            except Exception:
+                throttled = True  # connect or mid-stream read failure
+                raise
+            finally:
+                self.limiter.release(throttled)
+            metrics.inc("aoai_retries_total", op=op, status=resp.status_code)
+            time.sleep(delay)
+            attempt += 1
+
+
+def iter_chat_deltas(resp) -> Iterator[str]:
+    """Content deltas from a ``stream: true`` chat completion (SSE lines)."""
+    for line in resp.iter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get("choices") or []:
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                yield content
+
+
+gateway = AOAIGateway.from_env()
@@ -0,0 +1,108 @@
+"""Shared helpers for the tool routes.
+
+Heavy SDKs (httpx, azure-storage-blob, azure-cosmos) are imported inside the
+helpers on first use so that registering the routes at cold start stays cheap.
+"""
+
+import json
+import os
+from typing import Any, Iterable, Tuple
+
+import azure.functions as func
+
+import metrics
+
+
+def json_response(data: Any, status_code: int = 200) -> func.HttpResponse:
+    return func.HttpResponse(
+        json.dumps(data, ensure_ascii=False),
+        status_code=status_code,
+        mimetype="application/json",
+    )
+
+
+def bad_request(err: str) -> func.HttpResponse:
+    return json_response({"error": err}, 400)
+
+
+def wants_event_stream(req: func.HttpRequest) -> bool:
+    return (req.params.get("stream") or "").lower() in ("1", "true", "yes") or "text/event-stream" in (req.headers.get("accept") or "")
+
+
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: Iterable[Tuple[str, Any]]) -> func.HttpResponse:
+    # The classic HTTP model buffers the body, so the events arrive together;
+    # routes/streaming.py serves the same events incrementally when HTTP streams
+    # are available.
+    return func.HttpResponse(
+        "".join(sse(e, d) for e, d in events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def http_client(**kwargs):
+    import httpx
+
+    return httpx.Client(**kwargs)
+
+
+def speech_tts_url(region: str) -> str:
+    # AZURE_SPEECH_ENDPOINT overrides the regional host (custom domains, local stand-ins)
+    base = os.getenv("AZURE_SPEECH_ENDPOINT") or f"https://{region}.tts.speech.microsoft.com"
+    return base.rstrip("/") + "/cognitiveservices/v1"
+
+
+def blob_client_from_env():
+    conn = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+    account = os.getenv("AZURE_STORAGE_ACCOUNT")
+    key = os.getenv("AZURE_STORAGE_KEY") or os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
+    if not conn and not (account and key):
+        return None
+    from azure.storage.blob import BlobServiceClient
+
+    if conn:
+        try:
+            return BlobServiceClient.from_connection_string(conn)
+        except Exception:
+            return None
+    try:
+        return BlobServiceClient(account_url=f"https://{account}.blob.core.windows.net", credential=key)
+    except Exception:
+        return None
+
+
+_cosmos_cache = {}
+
+
+def cosmos_container():
+    conn = os.getenv("COSMOS_CONN")
+    if not conn:
+        return None
+    db_name = os.getenv("COSMOS_DB", "kids")
+    cont_name = os.getenv("COSMOS_PREFS_CONTAINER") or os.getenv("COSMOS_PROFILE_CONTAINER") or "Prefs"
+    pk_path = os.getenv("COSMOS_PARTITION_KEY", "/id")
+    cache_key = (conn, db_name, cont_name, pk_path)
+    # Reuse the client across invocations on a warm worker; the create-if-not-exists
+    # round trips only need to happen once per process.
+    if cache_key in _cosmos_cache:
+        metrics.count_cache("cosmos_container", True)
+        return _cosmos_cache[cache_key]
+    metrics.count_cache("cosmos_container", False)
+    from azure.cosmos import CosmosClient, PartitionKey
+
+    try:
+        with metrics.track_upstream("cosmos", "open_container"):
+            client = CosmosClient.from_connection_string(conn)
+            db = client.create_database_if_not_exists(id=db_name)
+            container = db.create_container_if_not_exists(
+                id=cont_name,
+                partition_key=PartitionKey(path=pk_path),
+            )
+    except Exception:
+        return None
+    _cosmos_cache[cache_key] = container
+    return container
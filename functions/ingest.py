@@ -0,0 +1,354 @@
+"""Transcript ingestion into the Azure AI Search chunk index.
+
+``index_video`` hands the segments it stored to ``submit``. The pipeline:
+
+1. chunks consecutive segments up to INGEST_CHUNK_CHARS characters, starting
+   each chunk with the last INGEST_CHUNK_OVERLAP_CHARS of the previous one;
+2. drops repeated chunks (choruses) by content hash; the hash is also the
+   document key suffix, so re-ingesting a video rewrites the same documents,
+   and the video's documents whose chunk no longer exists are deleted first;
+3. embeds only chunks whose vector is unknown: first an in-process LRU, then
+   one lookup per batch of hashes in the index itself (any video's identical
+   chunk already carries the vector), then Azure OpenAI in batches of
+   INGEST_EMBED_BATCH inputs;
+4. upserts ``mergeOrUpload`` batches of up to 1000 documents with at most
+   INGEST_MAX_INFLIGHT batches in flight, splitting on 413, honouring
+   Retry-After on 429/503 and retrying the keys a 207 reports as failed.
+
+Runs on a single background worker; when INGEST_MAX_PENDING videos are
+already queued the request ingests inline instead, so a burst slows callers
+down rather than growing an unbounded queue. INGEST_MODE=sync always runs
+inline, INGEST_MODE=off disables ingestion.
+
+Index TRANSCRIPT_SEARCH_INDEX fields: id (key), transcriptId (filterable),
+videoUrl, lang, content, t0, t1, contentHash (filterable) and the vector field
+INGEST_VECTOR_FIELD (retrievable, so it can serve as the embedding cache).
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import metrics
+from aoai_gateway import BACKGROUND, gateway, retry_after_seconds
+from common import http_client
+
+CHUNK_CHARS = int(os.getenv("INGEST_CHUNK_CHARS", "600"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("INGEST_CHUNK_OVERLAP_CHARS", "120"))
+EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+UPSERT_BATCH = min(1000, int(os.getenv("INGEST_UPSERT_BATCH", "1000")))
+MAX_INFLIGHT = int(os.getenv("INGEST_MAX_INFLIGHT", "2"))
+MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "8"))
+MAX_RETRIES = 3
+VECTOR_FIELD = os.getenv("INGEST_VECTOR_FIELD", "contentVector")
+SEARCH_API_VERSION = os.getenv("AZURE_SEARCH_API_VERSION", "2023-11-01").strip()
+
+_SPACE = re.compile(r"\s+")
+
+_EMBED_CACHE_MAX = 20_000
+_embed_lock = threading.Lock()
+_embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+_pending_lock = threading.Lock()
+_pending = 0
+
+
+# --- chunking ---------------------------------------------------------------
+
+def chunk_segments(segments: List[Dict[str, Any]], max_chars: int = CHUNK_CHARS, overlap_chars: int = CHUNK_OVERLAP_CHARS) -> List[Dict[str, Any]]:
+    """Group segments into ``{"text", "t0", "t1"}`` chunks of about ``max_chars``."""
+    segs = [s for s in segments if str(s.get("text") or "").strip()]
+    chunks: List[Dict[str, Any]] = []
+    i = 0
+    while i < len(segs):
+        j, size = i, 0
+        while j < len(segs) and (j == i or size + len(str(segs[j]["text"])) <= max_chars):
+            size += len(str(segs[j]["text"])) + 1
+            j += 1
+        part = segs[i:j]
+        chunks.append({
+            "text": " ".join(str(s["text"]).strip() for s in part),
+            "t0": part[0].get("t0"),
+            "t1": part[-1].get("t1"),
+        })
+        if j >= len(segs):
+            break
+        # Step back over whole segments until they cover the overlap
+        k, back = j, 0
+        while k - 1 > i and back < overlap_chars:
+            k -= 1
+            back += len(str(segs[k]["text"])) + 1
+        i = k
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(_SPACE.sub(" ", text.strip().lower()).encode("utf-8")).hexdigest()
+
+
+def build_docs(transcript_id: str, video_url: str, segments: List[Dict[str, Any]], lang: str = "en") -> List[Dict[str, Any]]:
+    docs: List[Dict[str, Any]] = []
+    seen = set()
+    chunks = chunk_segments(segments)
+    for chunk in chunks:
+        h = content_hash(chunk["text"])
+        if h in seen:
+            continue
+        seen.add(h)
+        docs.append({
+            "id": f"{transcript_id}_{h[:16]}",
+            "transcriptId": transcript_id,
+            "videoUrl": video_url,
+            "lang": lang,
+            "content": chunk["text"],
+            "t0": chunk["t0"],
+            "t1": chunk["t1"],
+            "contentHash": h,
+        })
+    if len(chunks) > len(docs):
+        metrics.inc("ingest_chunks_total", len(chunks) - len(docs), result="deduped")
+    return docs
+
+
+# --- embeddings -------------------------------------------------------------
+
+def _search_config():
+    ep = os.getenv("AZURE_SEARCH_ENDPOINT")
+    key = os.getenv("AZURE_SEARCH_API_KEY")
+    index = os.getenv("TRANSCRIPT_SEARCH_INDEX", "video-transcripts")
+    return (ep.rstrip("/"), key, index) if (ep and key) else None
+
+
+def _embedding_config():
+    ep = os.getenv("AZURE_OPENAI_ENDPOINT")
+    key = os.getenv("AZURE_OPENAI_API_KEY")
+    dep = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+    ver = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    if not (ep and key and dep):
+        return None
+    return f"{ep}/openai/deployments/{dep}/embeddings?api-version={ver}", key, dep
+
+
+def _cache_get(key: str) -> Optional[List[float]]:
+    with _embed_lock:
+        vec = _embed_cache.get(key)
+        if vec is not None:
+            _embed_cache.move_to_end(key)
+        return vec
+
+
+def _cache_put(key: str, vec: List[float]) -> None:
+    with _embed_lock:
+        _embed_cache[key] = vec
+        _embed_cache.move_to_end(key)
+        while len(_embed_cache) > _EMBED_CACHE_MAX:
+            _embed_cache.popitem(last=False)
+
+
+def _indexed_vectors(client, search, hashes: List[str]) -> Dict[str, List[float]]:
+    """Vectors already stored in the index for these content hashes."""
+    ep, key, index = search
+    found: Dict[str, List[float]] = {}
+    for i in range(0, len(hashes), 500):
+        part = hashes[i : i + 500]
+        body = {
+            "search": "*",
+            "filter": f"search.in(contentHash, '{','.join(part)}', ',')",
+            "select": f"contentHash,{VECTOR_FIELD}",
+            "top": len(part),
+        }
+        try:
+            with metrics.track_upstream("search", "lookup"):
+                r = client.post(f"{ep}/indexes/{index}/docs/search", params={"api-version": SEARCH_API_VERSION}, headers={"api-key": key}, json=body)
+                r.raise_for_status()
+        except Exception:
+            continue  # treated as unknown: they get embedded
+        for d in r.json().get("value", []):
+            if d.get("contentHash") and d.get(VECTOR_FIELD):
+                found[d["contentHash"]] = d[VECTOR_FIELD]
+    return found
+
+
+def embed_docs(client, docs: List[Dict[str, Any]], search=None) -> None:
+    """Set ``VECTOR_FIELD`` on ``docs``, embedding only unseen content."""
+    emb = _embedding_config()
+    if not emb or not docs:
+        return
+    url, aoai_key, deployment = emb
+    missing = []
+    for d in docs:
+        vec = _cache_get(f"{deployment}:{d['contentHash']}")
+        if vec is not None:
+            d[VECTOR_FIELD] = vec
+        else:
+            missing.append(d)
+    if missing and search:
+        known = _indexed_vectors(client, search, [d["contentHash"] for d in missing])
+        for d in missing:
+            if d["contentHash"] in known:
+                d[VECTOR_FIELD] = known[d["contentHash"]]
+                _cache_put(f"{deployment}:{d['contentHash']}", d[VECTOR_FIELD])
+        missing = [d for d in missing if VECTOR_FIELD not in d]
+    metrics.inc("ingest_chunks_total", len(docs) - len(missing), result="embedding_cached")
+
+    headers = {"api-key": aoai_key, "Content-Type": "application/json"}
+    for i in range(0, len(missing), EMBED_BATCH):
+        batch = missing[i : i + EMBED_BATCH]
+        r = gateway.post(client, url, headers, {"input": [d["content"] for d in batch]}, "embeddings", priority=BACKGROUND)
+        r.raise_for_status()
+        for item in r.json().get("data", []):
+            d = batch[item["index"]]
+            d[VECTOR_FIELD] = item["embedding"]
+            _cache_put(f"{deployment}:{d['contentHash']}", item["embedding"])
+        metrics.inc("ingest_chunks_total", len(batch), result="embedded")
+
+
+# --- upsert -----------------------------------------------------------------
+
+def _upsert_batch(client, search, docs: List[Dict[str, Any]]) -> int:
+    """Upload one batch, retrying throttling and per-key failures; returns
+    the number of documents that failed for good."""
+    ep, key, index = search
+    url = f"{ep}/indexes/{index}/docs/index"
+    attempt, lost = 0, 0
+    while docs:
+        body = {"value": [{"@search.action": "mergeOrUpload", **d} for d in docs]}
+        with metrics.track_upstream("search", "upsert") as call:
+            r = client.post(url, params={"api-version": SEARCH_API_VERSION}, headers={"api-key": key}, json=body)
+            call.status = r.status_code
+        if r.status_code == 413 and len(docs) > 1:
+            half = len(docs) // 2
+            return lost + _upsert_batch(client, search, docs[:half]) + _upsert_batch(client, search, docs[half:])
+        if r.status_code in (429, 503) and attempt < MAX_RETRIES:
+            time.sleep(retry_after_seconds(r) or 2 ** attempt)
+            attempt += 1
+            continue
+        if r.status_code not in (200, 207):
+            metrics.inc("ingest_chunks_total", len(docs), result="failed")
+            return lost + len(docs)
+        # 207: some keys failed; retry the ones the service calls transient
+        results = r.json().get("value", [])
+        failed = {v["key"] for v in results if not v.get("status")}
+        retry = {k for k in failed if attempt < MAX_RETRIES} & {
+            v["key"] for v in results if v.get("statusCode") in (409, 422, 503)
+        }
+        metrics.inc("ingest_chunks_total", len(docs) - len(failed), result="upserted")
+        if len(failed) > len(retry):
+            metrics.inc("ingest_chunks_total", len(failed) - len(retry), result="failed")
+            lost += len(failed) - len(retry)
+        docs = [d for d in docs if d["id"] in retry]
+        if docs:
+            time.sleep(2 ** attempt)
+            attempt += 1
+    return lost
+
+
+def _odata_quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _indexed_ids(client, search, transcript_id: str) -> List[str]:
+    """Ids of the documents the index holds for ``transcript_id``."""
+    ep, key, index = search
+    ids: List[str] = []
+    while True:
+        body = {
+            "search": "*",
+            "filter": f"transcriptId eq '{_odata_quote(transcript_id)}'",
+            "select": "id",
+            "top": 1000,
+            "skip": len(ids),
+        }
+        with metrics.track_upstream("search", "lookup"):
+            r = client.post(f"{ep}/indexes/{index}/docs/search", params={"api-version": SEARCH_API_VERSION}, headers={"api-key": key}, json=body)
+            r.raise_for_status()
+        page = [d["id"] for d in r.json().get("value", []) if d.get("id")]
+        ids += page
+        if len(page) < 1000 or len(ids) >= 100_000:  # $skip is capped at 100k
+            return ids
+
+
+def delete_stale(client, search, transcript_id: str, keep: List[Dict[str, Any]]) -> int:
+    """Delete the transcript's indexed chunks that are not in ``keep`` (a
+    re-ingested video with fewer or changed chunks); returns how many."""
+    keep_ids = {d["id"] for d in keep}
+    stale = [i for i in _indexed_ids(client, search, transcript_id) if i not in keep_ids]
+    ep, key, index = search
+    for i in range(0, len(stale), UPSERT_BATCH):
+        body = {"value": [{"@search.action": "delete", "id": doc_id} for doc_id in stale[i : i + UPSERT_BATCH]]}
+        with metrics.track_upstream("search", "delete"):
+            r = client.post(f"{ep}/indexes/{index}/docs/index", params={"api-version": SEARCH_API_VERSION}, headers={"api-key": key}, json=body)
+            r.raise_for_status()
+    if stale:
+        metrics.inc("ingest_chunks_total", len(stale), result="deleted")
+    return len(stale)
+
+
+def upsert_docs(client, search, docs: List[Dict[str, Any]]) -> int:
+    """Upload ``docs`` in batches, at most MAX_INFLIGHT at a time."""
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, MAX_INFLIGHT)) as pool:
+        inflight = set()
+        for i in range(0, len(docs), UPSERT_BATCH):
+            if len(inflight) >= MAX_INFLIGHT:
+                done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+                failed += sum(f.result() for f in done)
+            inflight.add(pool.submit(_upsert_batch, client, search, docs[i : i + UPSERT_BATCH]))
+        failed += sum(f.result() for f in inflight)
+    return failed
+
+
+# --- entry points -----------------------------------------------------------
+
+def ingest_transcript(transcript_id: str, video_url: str, segments: List[Dict[str, Any]], lang: str = "en") -> Dict[str, int]:
+    search = _search_config()
+    if not search:
+        return {"chunks": 0}
+    docs = build_docs(transcript_id, video_url, segments, lang)
+    with http_client(timeout=60) as client:
+        try:
+            with metrics.track_stage("index_video", "embed"):
+                embed_docs(client, docs, search)
+        except Exception:
+            # Keyword search still works without vectors
+            metrics.count_fallback("index_video", "embedding_error")
+        try:
+            with metrics.track_stage("index_video", "delete_stale"):
+                delete_stale(client, search, transcript_id, docs)
+        except Exception:
+            # Stale chunks only add noise to search; still index the new ones
+            metrics.count_fallback("index_video", "delete_stale_error")
+        with metrics.track_stage("index_video", "upsert"):
+            failed = upsert_docs(client, search, docs)
+    return {"chunks": len(docs), "failed": failed}
+
+
+def _run(transcript_id: str, video_url: str, segments: List[Dict[str, Any]], lang: str) -> None:
+    global _pending
+    try:
+        ingest_transcript(transcript_id, video_url, segments, lang)
+    except Exception:
+        metrics.count_fallback("index_video", "ingest_error")
+    finally:
+        with _pending_lock:
+            _pending -= 1
+
+
+def submit(transcript_id: str, video_url: str, segments: List[Dict[str, Any]], lang: str = "en") -> None:
+    global _pending
+    mode = os.getenv("INGEST_MODE", "background").lower()
+    if mode == "off" or not _search_config():
+        return
+    with _pending_lock:
+        inline = mode == "sync" or _pending >= MAX_PENDING
+        _pending += 1
+    if inline:
+        _run(transcript_id, video_url, segments, lang)
+    else:
+        _executor.submit(_run, transcript_id, video_url, segments, lang)
@@ -0,0 +1,222 @@
+"""In-process metrics for the tool routes.
+
+Route and upstream latencies are kept as fixed-bucket histograms, fallbacks and
+cache lookups as counters. ``render_prometheus()`` serves them from the
+``/metrics`` route; when APPLICATIONINSIGHTS_CONNECTION_STRING is set and
+azure-monitor-opentelemetry is installed the same observations are also
+exported to App Insights.
+
+Counters are per worker process, like any Prometheus client without a
+push gateway.
+"""
+
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PREFIX = "kidsenglish_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    "route_request_seconds": ("histogram", "Tool route latency by route and HTTP status."),
+    "route_stage_seconds": ("histogram", "Time spent in a named stage of a route."),
+    "upstream_request_seconds": ("histogram", "Upstream call latency by service, operation and outcome."),
+    "upstream_errors_total": ("counter", "Upstream calls that raised or returned an HTTP error."),
+    "fallback_total": ("counter", "Responses served from a fallback/stub instead of the upstream."),
+    "cache_requests_total": ("counter", "Cache lookups by cache and result (hit/miss)."),
+    "youtube_quota_units_total": ("counter", "YouTube Data API quota units spent by operation."),
+    "aoai_retries_total": ("counter", "Azure OpenAI calls retried after a 429/503, by operation and status."),
+    "ingest_chunks_total": ("counter", "Transcript chunks handled by the search ingestion pipeline, by result."),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Labels], List[float]] = {}  # [bucket counts..., sum, count]
+_counters: Dict[Tuple[str, Labels], float] = {}
+
+
+def _key(name: str, labels: Dict[str, object]) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    k = _key(name, labels)
+    with _lock:
+        h = _histograms.get(k)
+        if h is None:
+            h = _histograms[k] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+    _export(name, seconds, labels)
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    k = _key(name, labels)
+    with _lock:
+        _counters[k] = _counters.get(k, 0.0) + amount
+    _export(name, amount, labels)
+
+
+def count_fallback(route: str, reason: str) -> None:
+    inc("fallback_total", route=route, reason=reason)
+
+
+def count_cache(cache: str, hit: bool) -> None:
+    inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+class _UpstreamCall:
+    status: Optional[int] = None
+
+
+@contextmanager
+def track_upstream(upstream: str, op: str) -> Iterator[_UpstreamCall]:
+    """Time one upstream call. Set ``call.status`` when the code checks the
+    status itself instead of calling ``raise_for_status()``."""
+    call = _UpstreamCall()
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield call
+        if call.status is not None and call.status >= 400:
+            outcome = "error"
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("upstream_request_seconds", time.perf_counter() - start, upstream=upstream, op=op, outcome=outcome)
+        if outcome == "error":
+            inc("upstream_errors_total", upstream=upstream, op=op)
+
+
+@contextmanager
+def track_stage(route: str, stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("route_stage_seconds", time.perf_counter() - start, route=route, stage=stage)
+
+
+def instrument(route: str):
+    """Decorator recording latency and status code of an HTTP route handler."""
+
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(req):
+            start = time.perf_counter()
+            status = 500
+            try:
+                resp = fn(req)
+                status = resp.status_code
+                return resp
+            finally:
+                observe("route_request_seconds", time.perf_counter() - start, route=route, status=status)
+
+        return wrapper
+
+    return deco
+
+
+def _fmt_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = list(labels) + list(extra)
+    if not items:
+        return ""
+    esc = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in esc) + "}"
+
+
+def render_prometheus() -> str:
+    with _lock:
+        hists = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    lines: List[str] = []
+    for name, (kind, help_text) in _HELP.items():
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        if kind == "histogram":
+            for (n, labels), h in sorted(hists.items()):
+                if n != name:
+                    continue
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    lines.append(f"{full}_bucket{_fmt_labels(labels, (('le', repr(bound)),))} {int(h[i])}")
+                lines.append(f"{full}_bucket{_fmt_labels(labels, (('le', '+Inf'),))} {int(h[-1])}")
+                lines.append(f"{full}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+                lines.append(f"{full}_count{_fmt_labels(labels)} {int(h[-1])}")
+        else:
+            for (n, labels), v in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_fmt_labels(labels)} {v:g}")
+    # Convenience gauge so dashboards do not have to divide the counters.
+    full = PREFIX + "cache_hit_ratio"
+    lines.append(f"# HELP {full} Share of cache lookups that were hits since worker start.")
+    lines.append(f"# TYPE {full} gauge")
+    per_cache: Dict[str, List[float]] = {}
+    for (n, labels), v in counters.items():
+        if n != "cache_requests_total":
+            continue
+        d = dict(labels)
+        hm = per_cache.setdefault(d.get("cache", ""), [0.0, 0.0])
+        hm[0 if d.get("result") == "hit" else 1] += v
+    for cache, (hits, misses) in sorted(per_cache.items()):
+        lines.append(f"{full}{_fmt_labels((('cache', cache),))} {hits / (hits + misses):.4f}")
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+# --- optional App Insights export -------------------------------------------
+
+_otel_state: Dict[str, object] = {}
+
+
+def _otel_instrument(name: str):
+    if "meter" not in _otel_state:
+        _otel_state["meter"] = None
+        if os.getenv("APPLICATIONINSIGHTS_CONNECTION_STRING"):
+            try:
+                from azure.monitor.opentelemetry import configure_azure_monitor
+                from opentelemetry import metrics as otel_metrics
+
+                configure_azure_monitor()
+                _otel_state["meter"] = otel_metrics.get_meter("kids-english-tools")
+            except Exception:
+                _otel_state["meter"] = None
+    meter = _otel_state["meter"]
+    if meter is None:
+        return None
+    inst = _otel_state.get(name)
+    if inst is None:
+        kind, help_text = _HELP[name]
+        if kind == "histogram":
+            inst = meter.create_histogram(PREFIX + name, unit="s", description=help_text)
+        else:
+            inst = meter.create_counter(PREFIX + name, description=help_text)
+        _otel_state[name] = inst
+    return inst
+
+
+def _export(name: str, value: float, labels: Dict[str, object]) -> None:
+    inst = _otel_instrument(name)
+    if inst is None:
+        return
+    attrs = {k: str(v) for k, v in labels.items()}
+    try:
+        if hasattr(inst, "record"):
+            inst.record(value, attributes=attrs)
+        else:
+            inst.add(value, attributes=attrs)
+    except Exception:
+        pass
@@ -0,0 +1,150 @@
+"""Local phrase mining for extract_top_expressions.
+
+Counts 2–5 word n-grams within the sentences of a transcript, scores them with
+the kid-speech phrase frequency table in data/kid_phrases.tsv and keeps only
+phrases at or below the child's CEFR level (data/kid_words.txt decides the
+level of phrases missing from the table). Pure Python, a few milliseconds for
+a cartoon-length transcript.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+CEFR_ORDER = ["PREA1", "A1", "A2", "B1", "B2", "C1", "C2"]
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+_SENTENCE_SPLIT = re.compile(r"[.!?;:\n\"()\[\]]+|\s[-–—]\s")
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Mined n-grams may not start/end with these unless the table lists the phrase
+_BAD_START = {"and", "or", "but", "of", "to", "so", "because", "if", "than", "then", "that", "which"}
+_BAD_END = {
+    "the", "a", "an", "and", "or", "but", "of", "to", "in", "at", "with", "for", "from", "by", "is", "are",
+    "was", "were", "be", "my", "your", "his", "her", "our", "their", "its", "this", "that", "so", "if", "very",
+}
+_FUNCTION_WORDS = _BAD_START | _BAD_END | {"i", "you", "he", "she", "it", "we", "they", "me", "him", "us", "them", "on", "not", "do", "did", "have", "has"}
+
+_tables: Dict[str, object] = {}
+
+
+def _level_index(cefr: Optional[str]) -> int:
+    c = (cefr or "A1").upper().replace("-", "").replace(" ", "")
+    return CEFR_ORDER.index(c) if c in CEFR_ORDER else CEFR_ORDER.index("A1")
+
+
+def _load() -> Tuple[Dict[str, Tuple[float, str]], Dict[str, str]]:
+    if "phrases" not in _tables:
+        phrases: Dict[str, Tuple[float, str]] = {}
+        with open(os.path.join(_DATA_DIR, "kid_phrases.tsv"), encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                phrase, freq, cefr = line.rstrip("\n").split("\t")
+                phrases[phrase] = (float(freq), cefr.upper())
+        words: Dict[str, str] = {}
+        level = "A1"
+        with open(os.path.join(_DATA_DIR, "kid_words.txt"), encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("["):
+                    level = line.strip("[]").upper()
+                    continue
+                for w in line.split():
+                    words.setdefault(w, level)
+        _tables["phrases"] = phrases
+        _tables["words"] = words
+    return _tables["phrases"], _tables["words"]  # type: ignore[return-value]
+
+
+def _tokens(sentence: str) -> List[str]:
+    return _WORD.findall(sentence.lower().replace("’", "'"))
+
+
+def ngram_counts(text: str, min_n: int = 2, max_n: int = 5) -> Counter:
+    """Count n-grams without crossing sentence boundaries."""
+    counts: Counter = Counter()
+    for sentence in _SENTENCE_SPLIT.split(text or ""):
+        toks = _tokens(sentence)
+        for n in range(min_n, max_n + 1):
+            for i in range(len(toks) - n + 1):
+                counts[" ".join(toks[i : i + n])] += 1
+    return counts
+
+
+def phrase_level(phrase: str) -> str:
+    table, words = _load()
+    if phrase in table:
+        return table[phrase][1]
+    worst = 0
+    for w in phrase.split():
+        worst = max(worst, CEFR_ORDER.index(words.get(w, "B1")))
+    return CEFR_ORDER[worst]
+
+
+def display(phrase: str) -> str:
+    out = " ".join("I" + w[1:] if w == "i" or w.startswith("i'") else w for w in phrase.split())
+    return out[:1].upper() + out[1:]
+
+
+def score_candidates(text: str, cefr: Optional[str]) -> List[Tuple[str, float]]:
+    """All admissible phrases in ``text`` with their scores, best first."""
+    table, _ = _load()
+    max_level = max(_level_index(cefr), CEFR_ORDER.index("A1"))
+    max_words = 3 if _level_index(cefr) == 0 else 5
+    counts = ngram_counts(text)
+    scores: Dict[str, float] = {}
+    for phrase, count in counts.items():
+        toks = phrase.split()
+        if len(toks) > max_words or CEFR_ORDER.index(phrase_level(phrase)) > max_level:
+            continue
+        if phrase in table:
+            scores[phrase] = count * (1.0 + math.log1p(table[phrase][0]))
+        else:
+            if count < 2 or toks[0] in _BAD_START or toks[-1] in _BAD_END:
+                continue
+            if all(t in _FUNCTION_WORDS for t in toks) or len(set(toks)) == 1:
+                continue
+            scores[phrase] = count * (1.0 + 0.25 * (len(toks) - 2))
+    # Prefer "one more time" over "one more" when the shorter never occurs alone
+    for phrase in list(scores):
+        toks = phrase.split()
+        if len(toks) > 2:
+            for part in (" ".join(toks[:-1]), " ".join(toks[1:])):
+                if part in scores and counts[part] == counts[phrase]:
+                    scores[part] = 0.0
+    scored = [(p, sc) for p, sc in scores.items() if sc > 0]
+    scored.sort(key=lambda ps: (-ps[1], -len(ps[0]), ps[0]))
+    return scored
+
+
+def _overlaps(a: str, b: str) -> bool:
+    return f" {a} " in f" {b} " or f" {b} " in f" {a} "
+
+
+def select(scored: List[Tuple[str, float]], count: int) -> List[str]:
+    """Top ``count`` phrases, skipping ones contained in (or containing) a pick."""
+    picked: List[str] = []
+    for phrase, _ in scored:
+        if any(_overlaps(phrase, p) for p in picked):
+            continue
+        picked.append(phrase)
+        if len(picked) >= count:
+            break
+    return picked
+
+
+def common_phrases(cefr: Optional[str], count: int) -> List[str]:
+    """Most frequent table phrases at the level, for when no transcript is stored."""
+    table, _ = _load()
+    max_level = max(_level_index(cefr), CEFR_ORDER.index("A1"))
+    ranked = sorted(
+        (p for p, (_, lvl) in table.items() if CEFR_ORDER.index(lvl) <= max_level),
+        key=lambda p: (-table[p][0], p),
+    )
+    return select([(p, 0.0) for p in ranked], count)
+
@@ -0,0 +1,203 @@
+"""Watch-history preferences document (``prefs_{childId}``) in Cosmos DB.
+
+The document keeps recent and favourite videos as maps keyed by videoId::
+
+    {"id": "prefs_c1", "childId": "c1",
+     "recent": {"<videoId>": {"videoId", "title", "watched", "learned", "ts"}},
+     "favorites": {"<videoId>": {"videoId", "title", "ts"} | null}}
+
+so a change is a Cosmos partial update (``set /recent/<videoId>``) whose size
+and RU charge follow the change, not the child's whole history. ``apply``:
+
+- sends at most 10 operations per patch (the Cosmos limit); with ``if_match``
+  the first patch is conditional on the caller's ETag and every following one
+  on the ETag the previous patch returned, so a concurrent writer surfaces as
+  ``PreconditionFailed`` instead of an interleaved history;
+- creates the document on first write, and migrates documents written by the
+  old whole-list ``save_prefs`` with a read / conditional replace;
+- compacts when ``recent`` grows past PREFS_RECENT_WINDOW + PREFS_COMPACT_SLACK
+  entries: keeps the newest PREFS_RECENT_WINDOW, drops removed favourites, and
+  replaces the document only if it is unchanged since the patch (a lost race
+  just leaves compaction to the next write).
+
+azure-cosmos / azure-core are imported on first use, like ``common``.
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+RECENT_WINDOW = int(os.getenv("PREFS_RECENT_WINDOW", "50"))
+FAVORITES_MAX = int(os.getenv("PREFS_FAVORITES_MAX", "200"))
+COMPACT_SLACK = int(os.getenv("PREFS_COMPACT_SLACK", "25"))
+_PATCH_LIMIT = 10
+_FIELDS = ("videoId", "title", "url", "thumbnail", "watched", "learned")
+
+
+class PreconditionFailed(Exception):
+    """The document changed since the caller's ETag."""
+
+
+def doc_id(child_id: str) -> str:
+    return f"prefs_{child_id}"
+
+
+def _pointer(video_id: str) -> str:
+    return str(video_id).replace("~", "~0").replace("/", "~1")
+
+
+def _entry(video: Dict[str, Any], ts: float) -> Dict[str, Any]:
+    out = {k: video[k] for k in _FIELDS if k in video}
+    out["ts"] = ts
+    return out
+
+
+def _as_map(value: Any) -> Dict[str, Any]:
+    """Map form of ``recent``/``favorites``; old documents stored lists."""
+    if isinstance(value, dict):
+        return dict(value)
+    now = time.time()
+    return {
+        str(v["videoId"]): {**v, "ts": v.get("ts", now - len(value) + i)}
+        for i, v in enumerate(value or [])
+        if isinstance(v, dict) and v.get("videoId")
+    }
+
+
+def _newest(entries: Dict[str, Any], limit: int) -> Dict[str, Any]:
+    live = sorted(((k, v) for k, v in entries.items() if v), key=lambda kv: kv[1].get("ts", 0))
+    return dict(live[-limit:])
+
+
+def to_lists(item: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """``(recent_videos, favorite_videos)`` oldest first, recent bounded to the window."""
+    recent = _as_map(item.get("recent", item.get("recent_videos")))
+    favorites = _as_map(item.get("favorites", item.get("favorite_videos")))
+    return list(_newest(recent, RECENT_WINDOW).values()), list(_newest(favorites, FAVORITES_MAX).values())
+
+
+def new_doc(child_id: str, recent: Iterable[Dict[str, Any]] = (), favorites: Iterable[Dict[str, Any]] = ()) -> Dict[str, Any]:
+    """Whole document from lists (the old ``save_prefs`` body), bounded."""
+    return {
+        "id": doc_id(child_id),
+        "childId": child_id,
+        "recent": _newest(_as_map([v for v in recent if isinstance(v, dict)]), RECENT_WINDOW),
+        "favorites": _newest(_as_map([v for v in favorites if isinstance(v, dict)]), FAVORITES_MAX),
+    }
+
+
+def changes_from(data: Dict[str, Any]) -> List[Tuple[str, str, Optional[Dict[str, Any]]]]:
+    """``(field, videoId, entry or None)`` from a delta ``save_prefs`` body:
+    ``recent_upserts``/``favorite_upserts`` (video objects) and
+    ``favorite_removes`` (videoIds)."""
+    now = time.time()
+    changes: List[Tuple[str, str, Optional[Dict[str, Any]]]] = []
+    for field, key in (("recent", "recent_upserts"), ("favorites", "favorite_upserts")):
+        for i, v in enumerate(data.get(key) or []):
+            if isinstance(v, dict) and v.get("videoId"):
+                changes.append((field, str(v["videoId"]), _entry(v, now + i * 1e-3)))
+    for vid in data.get("favorite_removes") or []:
+        changes.append(("favorites", str(vid), None))
+    return changes
+
+
+def _apply_local(item: Dict[str, Any], changes) -> Dict[str, Any]:
+    item = dict(item)
+    item["recent"] = _as_map(item.pop("recent", item.pop("recent_videos", None)))
+    item["favorites"] = _as_map(item.pop("favorites", item.pop("favorite_videos", None)))
+    for field, vid, entry in changes:
+        item[field][vid] = entry
+    return item
+
+
+def _compacted(item: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in item.items() if not k.startswith("_")}
+    out["recent"] = _newest(item.get("recent") or {}, RECENT_WINDOW)
+    out["favorites"] = _newest(item.get("favorites") or {}, FAVORITES_MAX)
+    return out
+
+
+def _conditional(etag: Optional[str]) -> Dict[str, Any]:
+    from azure.core import MatchConditions
+
+    return {"etag": etag, "match_condition": MatchConditions.IfNotModified} if etag else {}
+
+
+def _migrate(cont, child_id: str, changes, if_match: Optional[str]) -> Dict[str, Any]:
+    """Read / modify / conditionally replace, for a missing or old-format document."""
+    from azure.cosmos import exceptions
+
+    did = doc_id(child_id)
+    for _ in range(3):
+        try:
+            with metrics.track_upstream("cosmos", "read_prefs"):
+                item = cont.read_item(item=did, partition_key=did)
+        except exceptions.CosmosResourceNotFoundError:
+            if if_match:
+                raise PreconditionFailed()
+            try:
+                with metrics.track_upstream("cosmos", "create_prefs"):
+                    return cont.create_item(_compacted(_apply_local(new_doc(child_id), changes)))
+            except exceptions.CosmosResourceExistsError:
+                continue
+        if if_match and item.get("_etag") != if_match:
+            raise PreconditionFailed()
+        try:
+            with metrics.track_upstream("cosmos", "replace_prefs"):
+                return cont.replace_item(item=did, body=_compacted(_apply_local(item, changes)), **_conditional(item.get("_etag")))
+        except exceptions.CosmosAccessConditionFailedError:
+            if if_match:
+                raise PreconditionFailed()
+    raise PreconditionFailed()
+
+
+def replace(cont, child_id: str, recent: List[Dict[str, Any]], favorites: List[Dict[str, Any]], if_match: Optional[str] = None) -> Optional[str]:
+    """Write the whole document from lists (bounded); returns the new ETag."""
+    from azure.cosmos import exceptions
+
+    doc = new_doc(child_id, recent, favorites)
+    try:
+        with metrics.track_upstream("cosmos", "upsert_prefs"):
+            if if_match:
+                item = cont.replace_item(item=doc["id"], body=doc, **_conditional(if_match))
+            else:
+                item = cont.upsert_item(doc)
+    except exceptions.CosmosAccessConditionFailedError:
+        raise PreconditionFailed()
+    return item.get("_etag")
+
+
+def apply(cont, child_id: str, changes, if_match: Optional[str] = None) -> Optional[str]:
+    """Apply ``changes`` (see ``changes_from``) and return the new ETag."""
+    from azure.cosmos import exceptions
+
+    if not changes:
+        return if_match
+    did = doc_id(child_id)
+    ops = [
+        {"op": "set", "path": f"/{field}/{_pointer(vid)}", "value": entry}
+        for field, vid, entry in changes
+    ]
+    etag, item = if_match, None
+    for i in range(0, len(ops), _PATCH_LIMIT):
+        try:
+            with metrics.track_upstream("cosmos", "patch_prefs"):
+                item = cont.patch_item(item=did, partition_key=did, patch_operations=ops[i : i + _PATCH_LIMIT], **_conditional(etag))
+        except exceptions.CosmosAccessConditionFailedError:
+            raise PreconditionFailed()
+        except exceptions.CosmosHttpResponseError as e:
+            # 404: no document yet; 400: old whole-list document without the maps
+            if i == 0 and e.status_code in (400, 404):
+                return _migrate(cont, child_id, changes, if_match).get("_etag")
+            raise
+        etag = item.get("_etag") if if_match else None
+
+    if len(item.get("recent") or {}) > RECENT_WINDOW + COMPACT_SLACK or len(item.get("favorites") or {}) > FAVORITES_MAX + COMPACT_SLACK:
+        try:
+            with metrics.track_upstream("cosmos", "compact_prefs"):
+                item = cont.replace_item(item=did, body=_compacted(item), **_conditional(item.get("_etag")))
+        except exceptions.CosmosAccessConditionFailedError:
+            pass  # someone wrote in between; the next write compacts
+    return item.get("_etag")
@@ -0,0 +1 @@
+"""HTTP tool routes, one Blueprint per area, registered by function_app.py."""
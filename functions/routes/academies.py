@@ -0,0 +1,164 @@
+import os
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus
+
+import azure.functions as func
+from pydantic import ValidationError
+
+import metrics
+from common import bad_request, http_client, json_response
+from schemas import AcademyItem, FindLocalAcademiesReq, SearchAcademiesReq
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="tools/find_local_academies", methods=["POST"])
+@metrics.instrument("find_local_academies")
+def find_local_academies(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = FindLocalAcademiesReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    maps_key = os.getenv("AZURE_MAPS_KEY")
+    if not maps_key:
+        # Fallback stub when key is missing
+        metrics.count_fallback("find_local_academies", "not_configured")
+        results = [
+            AcademyItem(
+                name="해피 잉글리시",
+                phone="010-1234-5678",
+                address=payload.address,
+                mapUrl=None,
+                distanceM=850,
+            ).model_dump()
+        ]
+        return json_response(results[: payload.topK])
+
+    base = os.getenv("AZURE_MAPS_ENDPOINT", "https://atlas.microsoft.com").rstrip("/")
+    headers = {"User-Agent": "kids-english-agent/0.1"}
+
+    def geocode_address(address: str) -> Optional[Dict[str, float]]:
+        url = (
+            f"{base}/search/address/json?api-version=1.0&query={quote_plus(address)}&subscription-key={maps_key}"
+        )
+        with http_client(timeout=10, headers=headers) as client:
+            with metrics.track_upstream("maps", "geocode") as call:
+                r = client.get(url)
+                call.status = r.status_code
+            if r.status_code != 200:
+                return None
+            data = r.json()
+            results = data.get("results", [])
+            if not results:
+                return None
+            pos = results[0].get("position", {})
+            lat = pos.get("lat")
+            lon = pos.get("lon")
+            return {"lat": lat, "lon": lon} if lat is not None and lon is not None else None
+
+    def search_poi(lat: float, lon: float, q: str, radius: int, limit: int) -> List[Dict[str, Any]]:
+        # Use fuzzy search to capture KR/EN variants
+        url = (
+            f"{base}/search/fuzzy/json?api-version=1.0&subscription-key={maps_key}"
+            f"&query={quote_plus(q)}&lat={lat}&lon={lon}&radius={radius}&limit={limit}"
+        )
+        with http_client(timeout=10, headers=headers) as client:
+            with metrics.track_upstream("maps", "fuzzy_search") as call:
+                r = client.get(url)
+                call.status = r.status_code
+            if r.status_code != 200:
+                return []
+            return r.json().get("results", [])
+
+    geo = geocode_address(payload.address)
+    if not geo:
+        return json_response([])
+
+    # Try both Korean and English queries; merge results
+    raw: List[Dict[str, Any]] = []
+    for query in ("영어학원", "영어 유치원", "english academy", "english school kids"):
+        raw.extend(search_poi(geo["lat"], geo["lon"], query, int(payload.radiusMeters), int(payload.topK)))
+
+    # Deduplicate by id or address
+    seen = set()
+    items: List[Dict[str, Any]] = []
+    for r in raw:
+        poi = r.get("poi") or {}
+        addr = r.get("address") or {}
+        uid = poi.get("id") or addr.get("freeformAddress") or poi.get("name")
+        if not uid or uid in seen:
+            continue
+        seen.add(uid)
+        coords = r.get("position") or {}
+        url_map = None
+        if coords.get("lat") is not None and coords.get("lon") is not None:
+            url_map = f"https://www.bing.com/maps?cp={coords['lat']}~{coords['lon']}"
+        items.append(
+            AcademyItem(
+                name=poi.get("name") or "학원",
+                phone=(poi.get("phone") or addr.get("localName") or None),
+                address=addr.get("freeformAddress") or payload.address,
+                mapUrl=url_map,
+                distanceM=int(r.get("dist", 0)) if r.get("dist") is not None else None,
+            ).model_dump()
+        )
+
+    return json_response(items[: payload.topK])
+
+
+@bp.route(route="tools/search_academies_ai", methods=["POST"])
+@metrics.instrument("search_academies_ai")
+def search_academies_ai(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = SearchAcademiesReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    ep = os.getenv("AZURE_SEARCH_ENDPOINT")
+    key = os.getenv("AZURE_SEARCH_API_KEY")
+    index = os.getenv("AZURE_SEARCH_INDEX", "kidsenglish")
+    if not (ep and key and index):
+        metrics.count_fallback("search_academies_ai", "not_configured")
+        return json_response([])
+
+    headers = {"api-key": key}
+    search_text = (payload.query or "english academy kids") + " " + (payload.region or "")
+    params = {
+        "api-version": os.getenv("AZURE_SEARCH_API_VERSION", "2023-11-01").strip(),
+        "search": search_text,
+        "$top": int(payload.topK),
+        "queryType": "simple",
+    }
+    url = f"{ep}/indexes/{index}/docs"
+    items: List[Dict[str, Any]] = []
+    try:
+        with http_client(timeout=10) as client:
+            with metrics.track_upstream("search", "academies"):
+                r = client.get(url, params=params, headers=headers)
+                r.raise_for_status()
+            data = r.json() or {}
+            for d in data.get("value", [])[: int(payload.topK)]:
+                name = d.get("name") or d.get("title") or d.get("academy") or "Academy"
+                addr = d.get("address") or d.get("addr") or payload.region
+                phone = d.get("phone") or d.get("tel") or None
+                lat = d.get("lat") or d.get("latitude")
+                lon = d.get("lon") or d.get("longitude")
+                map_url = None
+                if lat is not None and lon is not None:
+                    map_url = f"https://www.bing.com/maps?cp={lat}~{lon}"
+                items.append(
+                    AcademyItem(
+                        name=name,
+                        phone=phone,
+                        address=addr,
+                        mapUrl=map_url,
+                        distanceM=None,
+                    ).model_dump()
+                )
+    except Exception:
+        metrics.count_fallback("search_academies_ai", "upstream_error")
+        items = []
+
+    return json_response(items)
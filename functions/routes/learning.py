@@ -0,0 +1,239 @@
+import json
+import os
+from typing import Any, Iterator, List, Optional, Tuple
+
+import azure.functions as func
+from pydantic import ValidationError
+
+import metrics
+import phrases
+import transcripts
+from aoai_gateway import GatewayTimeout, gateway, iter_chat_deltas, priority_from_headers
+from common import bad_request, http_client, json_response, sse_response, wants_event_stream
+from schemas import (
+    ComputeLevelReq,
+    ComputeLevelResp,
+    ExampleSentenceReq,
+    ExampleSentenceResp,
+    ExtractExpressionsReq,
+    ExtractExpressionsResp,
+    ExtractTopWordsReq,
+    ParentReportReq,
+    ParentReportResp,
+    UpdateProgressReq,
+    UpdateProgressResp,
+    WordEntry,
+)
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="tools/extract_top_words", methods=["POST"])
+@metrics.instrument("extract_top_words")
+def extract_top_words(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = ExtractTopWordsReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Frequency × pedagogical value × novelty; exclude known words via WordMastery
+    words = [
+        WordEntry(word="forest", pos="noun", cefr="A1", definition="a large area of trees"),
+        WordEntry(word="climb", pos="verb", cefr="A1", definition="go up something"),
+        WordEntry(word="brave", pos="adj", cefr="A2", definition="showing no fear"),
+    ]
+    return json_response([w.model_dump() for w in words[: payload.count]])
+
+
+def _aoai_config() -> Optional[Tuple[str, str]]:
+    aoai_ep = os.getenv("AZURE_OPENAI_ENDPOINT")
+    aoai_key = os.getenv("AZURE_OPENAI_API_KEY")
+    aoai_dep = os.getenv("AZURE_OPENAI_DEPLOYMENT")
+    aoai_ver = os.getenv("AZURE_OPENAI_API_VERSION", "2024-06-01")
+    if not (aoai_ep and aoai_key and aoai_dep):
+        return None
+    return f"{aoai_ep}/openai/deployments/{aoai_dep}/chat/completions?api-version={aoai_ver}", aoai_key
+
+
+def expression_events(payload: ExtractExpressionsReq, req_headers) -> Iterator[Tuple[str, Any]]:
+    """Yields ``("phrase", {"text"})`` per locally mined phrase, then
+    ``("done", ExtractExpressionsResp)`` with the final (possibly reranked) list."""
+    count = int(payload.count)
+    # Mine the stored transcript locally; the LLM only reranks the candidates
+    # (EXPRESSIONS_LLM_RERANK) since this runs right after a video ends.
+    segments = transcripts.load(payload.transcriptId)
+    scored = []
+    with metrics.track_stage("extract_top_expressions", "mine"):
+        if segments:
+            scored = phrases.score_candidates(transcripts.text(segments), payload.cefr)
+        picked = phrases.select(scored, count)
+        if not picked:
+            metrics.count_fallback("extract_top_expressions", "no_transcript")
+            picked = phrases.common_phrases(payload.cefr, count)
+    for p in picked:
+        yield "phrase", {"text": phrases.display(p)}
+
+    aoai = _aoai_config()
+    rerank = os.getenv("EXPRESSIONS_LLM_RERANK", "false").lower() in ("1", "true", "yes")
+    candidates = phrases.select(scored, count * 3)
+    if rerank and aoai and len(candidates) > count:
+        chat_url, aoai_key = aoai
+        sys = (
+            "You are a kids' English tutor. From the candidate expressions mined from a"
+            " children's video, choose the ones most useful for a child to reuse in daily life."
+            ' Return ONLY a JSON object {"phrases": [...]} using candidates verbatim.'
+        )
+        user = (
+            f"cefr: {payload.cefr or 'A1'}\n"
+            f"count: {count}\n"
+            "candidates:\n" + "\n".join(f"- {c}" for c in candidates)
+        )
+        headers = {"api-key": aoai_key, "Content-Type": "application/json"}
+        body = {"messages": [{"role": "system", "content": sys}, {"role": "user", "content": user}], "temperature": 0.2, "response_format": {"type": "json_object"}}
+        try:
+            with http_client(timeout=15) as client:
+                r = gateway.post(client, chat_url, headers, body, "extract_top_expressions", priority=priority_from_headers(req_headers))
+                r.raise_for_status()
+                data = r.json()
+                content = (data.get("choices", [{}])[0].get("message", {}).get("content") or "").strip()
+                obj = json.loads(content) if content else {}
+                arr = obj.get("phrases") or obj.get("items") or []
+            allowed = set(candidates)
+            chosen = [p for p in (str(x).strip().lower() for x in arr) if p in allowed]
+            picked = phrases.select([(p, 0.0) for p in chosen + candidates], count)
+        except GatewayTimeout:
+            metrics.count_fallback("extract_top_expressions", "overloaded")
+        except Exception:
+            metrics.count_fallback("extract_top_expressions", "upstream_error")
+
+    out = [phrases.display(p) for p in picked] or ["Let's go!", "Good job!", "Come on!"][:count]
+    yield "done", ExtractExpressionsResp(phrases=out).model_dump()
+
+
+@bp.route(route="tools/extract_top_expressions", methods=["POST"])
+@metrics.instrument("extract_top_expressions")
+def extract_top_expressions(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = ExtractExpressionsReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    events = expression_events(payload, req.headers)
+    if wants_event_stream(req):
+        return sse_response(events)
+    return json_response(dict(events)["done"])
+
+
+def sentence_events(payload: ExampleSentenceReq, req_headers, stream: bool = True) -> Iterator[Tuple[str, Any]]:
+    """Yields ``("delta", {"text"})`` chunks while Azure OpenAI streams (when
+    ``stream``), then ``("sentence", {"text"})`` and ``("done", ExampleSentenceResp)``."""
+    # Try Azure OpenAI to generate a short kid-friendly sentence (<= 10 words)
+    aoai = _aoai_config()
+    sentence_text: Optional[str] = None
+    if aoai:
+        chat_url, aoai_key = aoai
+        headers = {"api-key": aoai_key, "Content-Type": "application/json"}
+        sys = (
+            "You are a kids' English tutor. Generate ONE short, positive,"
+            " kid-friendly sentence in English using the given word."
+            " Max 10 words. Avoid names or sensitive content."
+        )
+        ctx = payload.context or {}
+        user = (
+            f"word: {payload.word}\n"
+            f"cefr: {payload.cefr}\n"
+            f"videoTitle: {ctx.get('videoTitle','')} character: {ctx.get('character','')}\n"
+            "Return only the sentence."
+        )
+        body = {"messages": [{"role": "system", "content": sys}, {"role": "user", "content": user}], "temperature": 0.2}
+        priority = priority_from_headers(req_headers)
+        reason = "upstream_error"
+        parts: List[str] = []
+        try:
+            with http_client(timeout=15) as client:
+                if stream:
+                    with gateway.stream(client, chat_url, headers, {**body, "stream": True}, "example_sentence", priority=priority) as r:
+                        r.raise_for_status()
+                        for delta in iter_chat_deltas(r):
+                            parts.append(delta)
+                            yield "delta", {"text": delta}
+                        sentence_text = "".join(parts).strip()
+                else:
+                    r = gateway.post(client, chat_url, headers, body, "example_sentence", priority=priority)
+                    r.raise_for_status()
+                    data = r.json()
+                    sentence_text = (data.get("choices", [{}])[0].get("message", {}).get("content") or "").strip()
+        except GatewayTimeout:
+            reason = "overloaded"
+        except Exception:
+            # Deltas already sent stay the answer; the stock sentence is only
+            # for a stream that never started
+            sentence_text = "".join(parts).strip() or None
+            if sentence_text:
+                metrics.count_fallback("example_sentence", "stream_cut")
+    else:
+        reason = "not_configured"
+
+    if not sentence_text:
+        metrics.count_fallback("example_sentence", reason)
+        sentence_text = f"The {payload.word} is fun to say."
+
+    yield "sentence", {"text": sentence_text}
+    yield "done", ExampleSentenceResp(sentence=sentence_text).model_dump()
+
+
+@bp.route(route="tools/example_sentence", methods=["POST"])
+@metrics.instrument("example_sentence")
+def example_sentence(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = ExampleSentenceReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    if wants_event_stream(req):
+        return sse_response(sentence_events(payload, req.headers))
+    return json_response(dict(sentence_events(payload, req.headers, stream=False))["done"])
+
+
+@bp.route(route="tools/update_progress", methods=["POST"])
+@metrics.instrument("update_progress")
+def update_progress(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = UpdateProgressReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Write WatchLog + LearningSession + WordMastery; recompute CEFR and streak
+    resp = UpdateProgressResp(ok=True, newLevel="A1", streak=3)
+    return json_response(resp.model_dump())
+
+
+@bp.route(route="tools/compute_level", methods=["POST"])
+@metrics.instrument("compute_level")
+def compute_level(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = ComputeLevelReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Implement Bayesian mastery across CEFR bins (IRT-like)
+    resp = ComputeLevelResp(cefr="A1", confidence=0.78, deltas={"A1": +3, "A2": +1})
+    return json_response(resp.model_dump())
+
+
+@bp.route(route="tools/parent_report", methods=["POST"])
+@metrics.instrument("parent_report")
+def parent_report(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = ParentReportReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Aggregate KPIs; optionally precompute via Synapse Link + Power BI
+    resp = ParentReportResp(
+        summaryText="Great progress this week! Keep watching and practicing.",
+        kpis={"watchMin": 120, "sessions": 4, "wordsLearned": 15, "levelChange": "+1"},
+        chartData={"series": [{"name": "Sessions", "data": [1, 2, 1, 0, 0, 0, 0]}]},
+    )
+    return json_response(resp.model_dump())
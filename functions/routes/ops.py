@@ -0,0 +1,22 @@
+import os
+
+import azure.functions as func
+
+import metrics
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="metrics", methods=["GET"])
+def metrics_endpoint(req: func.HttpRequest) -> func.HttpResponse:
+    # Optional shared secret so the scrape endpoint is not public on anonymous apps
+    token = os.getenv("METRICS_TOKEN")
+    if token and req.headers.get("Authorization") != f"Bearer {token}" and req.params.get("token") != token:
+        return func.HttpResponse("unauthorized", status_code=401)
+    return func.HttpResponse(
+        metrics.render_prometheus(),
+        status_code=200,
+        mimetype="text/plain",
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
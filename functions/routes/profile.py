@@ -0,0 +1,143 @@
+import json
+from datetime import datetime
+
+import azure.functions as func
+from pydantic import ValidationError
+
+import metrics
+import prefs
+from common import bad_request, cosmos_container, json_response
+from schemas import LoadProfileReq, LoadProfileResp, SaveProfileReq, SaveProfileResp
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="tools/save_profile", methods=["POST"])
+@metrics.instrument("save_profile")
+def save_profile(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = SaveProfileReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    cont = cosmos_container()
+    if not cont:
+        metrics.count_fallback("save_profile", "not_configured")
+        return json_response(SaveProfileResp(ok=False, storedId=None).model_dump())
+
+    doc_id = f"profile_{payload.childId}"
+    item = {
+        "id": doc_id,
+        "childId": payload.childId,
+        "type": "profile",
+        "name": payload.name,
+        "age": int(payload.age),
+        "region": payload.region,
+        "study": payload.study,
+        "characters": payload.characters,
+        "cefr": payload.cefr,
+        "interest": payload.interest,
+        "updatedAt": datetime.utcnow().isoformat() + "Z",
+    }
+    try:
+        with metrics.track_upstream("cosmos", "upsert_profile"):
+            cont.upsert_item(item)
+        return json_response(SaveProfileResp(ok=True, storedId=doc_id).model_dump())
+    except Exception:
+        metrics.count_fallback("save_profile", "upstream_error")
+        return json_response(SaveProfileResp(ok=False, storedId=None).model_dump())
+
+
+@bp.route(route="tools/load_profile", methods=["POST"])
+@metrics.instrument("load_profile")
+def load_profile(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = LoadProfileReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    cont = cosmos_container()
+    if not cont:
+        metrics.count_fallback("load_profile", "not_configured")
+        return json_response(LoadProfileResp(ok=False, profile=None).model_dump())
+    doc_id = f"profile_{payload.childId}"
+    try:
+        with metrics.track_upstream("cosmos", "read_profile"):
+            item = cont.read_item(item=doc_id, partition_key=doc_id)
+        profile = {
+            "childId": item.get("childId"),
+            "name": item.get("name"),
+            "age": item.get("age"),
+            "region": item.get("region"),
+            "study": item.get("study"),
+            "characters": item.get("characters", []),
+            "cefr": item.get("cefr"),
+            "interest": item.get("interest"),
+        }
+        return json_response(LoadProfileResp(ok=True, profile=profile).model_dump())
+    except Exception:
+        metrics.count_fallback("load_profile", "upstream_error")
+        return json_response(LoadProfileResp(ok=True, profile=None).model_dump())
+
+
+@bp.route(route="tools/save_prefs", methods=["POST"])
+@metrics.instrument("save_prefs")
+def save_prefs(req: func.HttpRequest) -> func.HttpResponse:
+    """Delta form: ``recent_upserts``/``favorite_upserts``/``favorite_removes``
+    patch single entries (see ``prefs.py``). The old form with whole
+    ``recent_videos``/``favorite_videos`` lists still replaces the document.
+    ``ifMatch`` (the ETag from ``load_prefs``) makes either conditional."""
+    try:
+        data = json.loads(req.get_body() or b"{}")
+        child_id = data.get("childId")
+        if not child_id:
+            return bad_request("childId required")
+        changes = prefs.changes_from(data)
+        if_match = data.get("ifMatch")
+    except Exception as ve:
+        return bad_request(str(ve))
+
+    cont = cosmos_container()
+    if not cont:
+        metrics.count_fallback("save_prefs", "not_configured")
+        return json_response({"ok": False, "error": "cosmos_not_configured"})
+    try:
+        if changes or not ("recent_videos" in data or "favorite_videos" in data):
+            etag = prefs.apply(cont, child_id, changes, if_match=if_match)
+        else:
+            etag = prefs.replace(cont, child_id, data.get("recent_videos") or [], data.get("favorite_videos") or [], if_match=if_match)
+    except prefs.PreconditionFailed:
+        return json_response({"ok": False, "error": "etag_mismatch"}, 412)
+    return json_response({"ok": True, "etag": etag})
+
+
+@bp.route(route="tools/load_prefs", methods=["POST"])
+@metrics.instrument("load_prefs")
+def load_prefs(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        data = json.loads(req.get_body() or b"{}")
+        child_id = data.get("childId")
+        if not child_id:
+            return bad_request("childId required")
+        doc_id = prefs.doc_id(child_id)
+    except Exception as ve:
+        return bad_request(str(ve))
+
+    cont = cosmos_container()
+    if not cont:
+        metrics.count_fallback("load_prefs", "not_configured")
+        return json_response({"ok": False, "error": "cosmos_not_configured"})
+    try:
+        with metrics.track_upstream("cosmos", "read_prefs"):
+            item = cont.read_item(item=doc_id, partition_key=doc_id)
+        recent, favorites = prefs.to_lists(item)
+        return json_response({
+            "ok": True,
+            "recent_videos": recent,
+            "favorite_videos": favorites,
+            "etag": item.get("_etag"),
+        })
+    except Exception:
+        metrics.count_fallback("load_prefs", "upstream_error")
+        return json_response({"ok": True, "recent_videos": [], "favorite_videos": []})
@@ -0,0 +1,137 @@
+import base64
+import os
+from datetime import datetime, timedelta
+
+import azure.functions as func
+from pydantic import ValidationError
+
+import metrics
+from common import bad_request, blob_client_from_env, http_client, json_response, speech_tts_url
+from schemas import PlayCheerReq, PlayCheerResp, SayWordReq, SayWordResp
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="tools/play_cheer", methods=["POST"])
+@metrics.instrument("play_cheer")
+def play_cheer(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = PlayCheerReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    region = os.getenv("AZURE_SPEECH_REGION")
+    key = os.getenv("AZURE_SPEECH_KEY")
+    text = "Great job! You did it!"
+    voice = "en-US-AvaNeural" if payload.voice == "child" else "en-US-JennyNeural"
+    ct = "audio-16khz-32kbitrate-mono-mp3"
+    data_bytes = None
+    if region and key:
+        headers = {
+            "Ocp-Apim-Subscription-Key": key,
+            "Content-Type": "application/ssml+xml",
+            "X-Microsoft-OutputFormat": ct,
+            "User-Agent": "kids-english-agent/0.1",
+        }
+        ssml = f"""
+<speak version='1.0' xml:lang='en-US'>
+  <voice name='{voice}'>
+    <prosody rate='0%'> {text} </prosody>
+  </voice>
+</speak>
+""".strip()
+        try:
+            with http_client(timeout=15) as client, metrics.track_upstream("speech", "play_cheer"):
+                r = client.post(speech_tts_url(region), headers=headers, content=ssml.encode("utf-8"))
+                r.raise_for_status()
+                data_bytes = r.content
+        except Exception:
+            metrics.count_fallback("play_cheer", "upstream_error")
+            data_bytes = None
+    else:
+        metrics.count_fallback("play_cheer", "not_configured")
+
+    if data_bytes:
+        bsc = blob_client_from_env()
+        if bsc:
+            try:
+                container = os.getenv("CHEER_CONTAINER", "cheer")
+                bsc.create_container(container)
+            except Exception:
+                pass
+            try:
+                container = os.getenv("CHEER_CONTAINER", "cheer")
+                blob_name = f"cheer_{int(datetime.utcnow().timestamp())}.mp3"
+                blob = bsc.get_blob_client(container=container, blob=blob_name)
+                with metrics.track_upstream("blob", "upload"):
+                    blob.upload_blob(data_bytes, overwrite=True, content_type="audio/mpeg")
+                account = bsc.account_name
+                key = os.getenv("AZURE_STORAGE_KEY") or os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
+                if account and key:
+                    from azure.storage.blob import BlobSasPermissions, generate_blob_sas
+
+                    sas = generate_blob_sas(
+                        account_name=account,
+                        container_name=container,
+                        blob_name=blob_name,
+                        account_key=key,
+                        permission=BlobSasPermissions(read=True),
+                        expiry=datetime.utcnow() + timedelta(minutes=30),
+                    )
+                    url = f"https://{account}.blob.core.windows.net/{container}/{blob_name}?{sas}"
+                    return json_response(PlayCheerResp(audioUrl=url).model_dump())
+            except Exception:
+                pass
+        # Fallback data URL if storage missing
+        metrics.count_fallback("play_cheer", "inline_audio")
+        b64 = base64.b64encode(data_bytes).decode("ascii")
+        return json_response(PlayCheerResp(audioUrl=f"data:audio/mpeg;base64,{b64}").model_dump())
+
+    return json_response(PlayCheerResp(audioUrl=None).model_dump())
+
+
+@bp.route(route="tools/say_word", methods=["POST"])
+@metrics.instrument("say_word")
+def say_word(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = SayWordReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    region = os.getenv("AZURE_SPEECH_REGION")
+    key = os.getenv("AZURE_SPEECH_KEY")
+    if not (region and key):
+        # Fallback: return empty to let UI handle gracefully
+        metrics.count_fallback("say_word", "not_configured")
+        return json_response(SayWordResp(audioUrl=None, audioB64=None, contentType=None).model_dump())
+
+    voice = payload.voice or "en-US-AvaNeural"
+    word = payload.word
+    ct = "audio-16khz-32kbitrate-mono-mp3"
+    url = speech_tts_url(region)
+    headers = {
+        "Ocp-Apim-Subscription-Key": key,
+        "Content-Type": "application/ssml+xml",
+        "X-Microsoft-OutputFormat": ct,
+        "User-Agent": "kids-english-agent/0.1",
+    }
+    ssml = f"""
+<speak version='1.0' xml:lang='en-US'>
+  <voice name='{voice}'>
+    <prosody rate='-10.00%'> {word} </prosody>
+  </voice>
+</speak>
+""".strip()
+    try:
+        with http_client(timeout=15) as client:
+            with metrics.track_upstream("speech", "say_word"):
+                r = client.post(url, headers=headers, content=ssml.encode("utf-8"))
+                r.raise_for_status()
+            audio = r.content
+            b64 = base64.b64encode(audio).decode("ascii")
+            data_url = f"data:audio/mpeg;base64,{b64}"
+            return json_response(SayWordResp(audioUrl=data_url, audioB64=b64, contentType="audio/mpeg").model_dump())
+    except Exception:
+        metrics.count_fallback("say_word", "upstream_error")
+        return json_response(SayWordResp(audioUrl=None, audioB64=None, contentType=None).model_dump())
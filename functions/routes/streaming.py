@@ -0,0 +1,41 @@
+"""Incremental SSE variants of the LLM-backed tools (HTTP streams).
+
+Needs azurefunctions-extensions-http-fastapi (in requirements.txt) and
+PYTHON_ENABLE_INIT_INDEXING=1; where the package is missing ``function_app``
+skips this module and the classic routes answer ``?stream=true`` with the
+same events in one buffered body.
+"""
+
+import azure.functions as func
+from azurefunctions.extensions.http.fastapi import JSONResponse, Request, Response, StreamingResponse
+from pydantic import ValidationError
+
+from common import sse
+from routes.learning import expression_events, sentence_events
+from schemas import ExampleSentenceReq, ExtractExpressionsReq
+
+
+bp = func.Blueprint()
+
+
+def _stream(events) -> StreamingResponse:
+    # Sync generator: Starlette iterates it on a worker thread and flushes each event
+    return StreamingResponse((sse(e, d) for e, d in events), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@bp.route(route="tools/extract_top_expressions/stream", methods=["POST"])
+async def extract_top_expressions_stream(req: Request) -> Response:
+    try:
+        payload = ExtractExpressionsReq.model_validate_json(await req.body())
+    except ValidationError as ve:
+        return JSONResponse({"error": ve.json()}, status_code=400)
+    return _stream(expression_events(payload, req.headers))
+
+
+@bp.route(route="tools/example_sentence/stream", methods=["POST"])
+async def example_sentence_stream(req: Request) -> Response:
+    try:
+        payload = ExampleSentenceReq.model_validate_json(await req.body())
+    except ValidationError as ve:
+        return JSONResponse({"error": ve.json()}, status_code=400)
+    return _stream(sentence_events(payload, req.headers))
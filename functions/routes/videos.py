@@ -0,0 +1,468 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+import azure.functions as func
+from pydantic import ValidationError
+
+import ingest
+import metrics
+import transcripts
+from common import bad_request, http_client, json_response
+from youtube_quota import UNIT_COST, QuotaLow, quota
+from schemas import (
+    IndexVideoReq,
+    IndexVideoResp,
+    RankVideoReq,
+    RankVideoResp,
+    SearchYouTubeReq,
+    VideoItem,
+)
+
+
+bp = func.Blueprint()
+
+
+@bp.route(route="tools/search_youtube_videos", methods=["POST"])
+@metrics.instrument("search_youtube_videos")
+def search_youtube_videos(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        with metrics.track_stage("search_youtube_videos", "validation"):
+            payload = SearchYouTubeReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    yt_key = os.getenv("YOUTUBE_API_KEY")
+
+    # Age-based recommendation rules (configurable via env AGE_RECO_RULES)
+    def load_age_rules() -> Dict[str, Dict[str, Any]]:
+        """Load age buckets from env JSON or return sane defaults.
+
+        Structure example:
+        {
+          "3-5": {"durationMaxSec": 360, "keywords": [...], "channels": [...], "avoid": [...]},
+          "6-8": {...},
+        }
+        """
+        raw = os.getenv("AGE_RECO_RULES")
+        if raw:
+            try:
+                data = json.loads(raw)
+                if isinstance(data, dict):
+                    return data
+            except Exception:
+                pass
+        # Defaults tuned for age-appropriate content
+        return {
+            "0-3": {
+                "durationMaxSec": 5 * 60,
+                "keywords": [
+                    "nursery rhymes",
+                    "lullaby",
+                    "hand play",
+                    "sensory music",
+                ],
+                "channels": [
+                    "Cocomelon",
+                    "Super Simple Songs",
+                    "Baby Einstein",
+                    "Hey Duggee",
+                    "Pocoyo",
+                    "Shaun the Sheep",
+                ],
+                "avoid": ["prank", "horror", "challenge"],
+            },
+            "4-6": {
+                "durationMaxSec": 6 * 60,
+                "keywords": [
+                    "simple dialogue",
+                    "phonics",
+                    "everyday english",
+                    "kids story",
+                ],
+                "channels": [
+                    "Peppa Pig",
+                    "Bluey",
+                    "Ben & Holly's Little Kingdom",
+                    "Thomas & Friends",
+                    "Octonauts",
+                    "Alphablocks",
+                    "Numberblocks",
+                ],
+                "avoid": ["prank", "horror", "challenge"],
+            },
+            "7-9": {
+                "durationMaxSec": 12 * 60,
+                "keywords": [
+                    "kids science",
+                    "story for kids",
+                    "basic social studies",
+                    "animals vocabulary",
+                ],
+                "channels": [
+                    "Wild Kratts",
+                    "The Magic School Bus",
+                    "Odd Squad",
+                    "Hilda",
+                    "Carmen Sandiego",
+                ],
+                "avoid": ["prank", "horror"],
+            },
+            "10-12": {
+                "durationMaxSec": 18 * 60,
+                "keywords": [
+                    "science for kids",
+                    "history for kids",
+                    "english comprehension",
+                    "a2 english",
+                ],
+                "channels": [
+                    "Crash Course Kids",
+                    "TED-Ed",
+                ],
+                "avoid": ["prank", "horror"],
+            },
+            "13-15": {
+                "durationMaxSec": 18 * 60,
+                "keywords": [
+                    "intermediate english for kids",
+                    "short stories b1",
+                    "news for kids",
+                ],
+                "channels": [
+                    "BBC Newsround",
+                ],
+                "avoid": ["prank", "horror"],
+            },
+        }
+
+    def pick_age_bucket(age: int, rules: Dict[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+        for k, v in rules.items():
+            try:
+                a, b = [int(x) for x in k.split("-")]
+                if a <= age <= b:
+                    return k, v
+            except Exception:
+                continue
+        # Fallback to widest bucket
+        return "6-8", rules.get("6-8", {})
+
+    # Helper: map some common Korean character names to English to improve hits
+    def norm_characters(chars: List[str]) -> List[str]:
+        mapping = {
+            "블루이": "Bluey",
+            "뽀로로": "Pororo",
+            "페파 피그": "Peppa Pig",
+            "피카츄": "Pikachu",
+            "포켓몬": "Pokemon",
+            "핑크퐁": "Pinkfong",
+        }
+        out = []
+        for c in (chars or []):
+            out.append(c)
+            if c in mapping:
+                out.append(mapping[c])
+        return list(dict.fromkeys([s for s in out if s]))
+
+    def level_keywords(cefr: str) -> List[str]:
+        table = {
+            "PREA1": ["phonics", "alphabet", "kids song", "nursery rhymes", "abc", "colors", "animals"],
+            "A1": ["basic", "easy english", "kids english", "simple sentences", "sight words"],
+            "A2": ["everyday english", "simple story", "short story", "english for kids a2"],
+            "B1": ["intermediate", "story for kids", "learn english b1"],
+        }
+        return table.get(cefr or "A1", table["A1"])
+
+    def duration_ok(age: int, dur: int) -> bool:
+        # Age-based duration guardrails from rules
+        rules = load_age_rules()
+        _, bucket = pick_age_bucket(age, rules)
+        max_sec = int(bucket.get("durationMaxSec", 12 * 60))
+        return dur <= max_sec
+
+    def score_item(item: Dict[str, Any], chars: List[str], cefr: str, age: int) -> float:
+        title = (item.get("title") or "").lower()
+        channel = (item.get("channel") or "").lower()
+        dur = int(item.get("durationSec") or 0)
+        # Character match boost
+        cm = 0.0
+        for c in chars:
+            c_low = c.lower()
+            if c_low and (c_low in title or c_low in channel):
+                cm = 1.0
+                break
+        # Level keyword match
+        kw = level_keywords(cefr)
+        lm = 0.0
+        for k in kw:
+            k_low = k.lower()
+            if k_low in title:
+                lm = 1.0
+                break
+        # Age-preferred channels/keywords
+        rules = load_age_rules()
+        _, bucket = pick_age_bucket(age, rules)
+        pref_channels = [c.lower() for c in bucket.get("channels", [])]
+        age_keys = [k.lower() for k in bucket.get("keywords", [])]
+        avoid = [k.lower() for k in bucket.get("avoid", [])]
+        ch_boost = 1.0 if any(pc in channel for pc in pref_channels if pc) else 0.0
+        age_kw = 1.0 if any(ak and ak in title for ak in age_keys) else 0.0
+        bad = 1.0 if any(av and av in title for av in avoid) else 0.0
+        # Duration preference (within age band)
+        ds = 1.0 if duration_ok(age, dur) else 0.2
+        # Captions bonus
+        cap = 1.0 if item.get("hasCaptions") else 0.0
+        # Final score weights
+        base = 0.35 * cm + 0.25 * lm + 0.15 * ds + 0.05 * cap
+        base += 0.15 * ch_boost + 0.10 * age_kw
+        # Penalize avoid keywords
+        if bad:
+            base -= 0.25
+        return base
+
+    def _duration_to_seconds(iso_dur: str) -> int:
+        # Minimal ISO8601 duration parser for YouTube (e.g., PT4M5S)
+        if not iso_dur or not iso_dur.startswith("P"):
+            return 0
+        import re
+        m = re.match(r"PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", iso_dur)
+        if not m:
+            return 0
+        h, m_, s = m.groups()
+        h = int(h) if h else 0
+        m_ = int(m_) if m_ else 0
+        s = int(s) if s else 0
+        return h * 3600 + m_ * 60 + s
+
+    chars_norm = norm_characters(payload.characters)
+    age_bucket, _ = pick_age_bucket(int(payload.age), load_age_rules())
+    # Same age/CEFR/characters -> same YouTube queries and ranking, so `max` is
+    # left out of the key and applied when slicing.
+    req_key = (int(payload.age), payload.cefr.upper(), tuple(chars_norm))
+    catalog_key = (age_bucket, payload.cefr.upper())
+    exclude = set(payload.excludeIds)
+
+    def top(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [it for it in items if it.get("id") not in exclude][: int(payload.max)]
+
+    def rank(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Filter and rank according to age/CEFR/characters
+        with metrics.track_stage("search_youtube_videos", "ranking"):
+            filtered = [r for r in items if duration_ok(int(payload.age), int(r.get("durationSec") or 0))]
+            return sorted(filtered, key=lambda x: score_item(x, chars_norm, payload.cefr, int(payload.age)), reverse=True)
+
+    def fetch_ranked() -> List[Dict[str, Any]]:
+        chars = chars_norm or ["kids"]
+        # Age bucket driven keywords
+        rules = load_age_rules()
+        _, bucket = pick_age_bucket(int(payload.age), rules)
+        age_kw = bucket.get("keywords", [])
+        # Build multiple queries to widen recall, later we re-rank
+        base_qs = []
+        # character + age keyword
+        if age_kw:
+            base_qs.append(" ".join([chars[0], age_kw[0], "english"]))
+        # character + generic learn english
+        base_qs.append(" ".join([chars[0], "kids video", "learn english"]))
+        # cefr derived
+        base_qs.append(" ".join(["kids english", *level_keywords(payload.cefr)[:1]]))
+        # preferred channel specific query (bias to channel)
+        pref_channels = (bucket.get("channels") or [])
+        if pref_channels:
+            base_qs.append(" ".join([pref_channels[0], "kids", "english"]))
+        # Each search.list costs 100 units; when the bucket is low run only the
+        # highest-priority queries (raises QuotaLow if none fit).
+        n_search = quota.reserve_searches(len(base_qs))
+        base_qs = base_qs[:n_search]
+        params = {
+            "key": yt_key,
+            "q": base_qs[0],
+            "maxResults": 10,
+            "type": "video",
+            "safeSearch": "strict",
+            "videoCaption": "closedCaption",
+            "videoEmbeddable": "true",
+            "relevanceLanguage": "en",
+        }
+        yt_base = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3").rstrip("/")
+        sent, listed, exhausted = 0, False, False
+        try:
+            with http_client(timeout=12) as client:
+                all_ids: List[str] = []
+                for q in base_qs:
+                    p = dict(params)
+                    p["q"] = q
+                    sent += 1
+                    with metrics.track_upstream("youtube", "search") as call:
+                        sr = client.get(f"{yt_base}/search", params=p)
+                        call.status = sr.status_code
+                    if sr.status_code == 403 and "quotaExceeded" in sr.text:
+                        exhausted = True
+                        quota.exhausted()
+                        raise QuotaLow()
+                    if sr.status_code != 200:
+                        continue
+                    sdata = sr.json()
+                    all_ids.extend([item["id"]["videoId"] for item in sdata.get("items", []) if item.get("id", {}).get("videoId")])
+                ids = list(dict.fromkeys(all_ids))[:15]
+                if not ids:
+                    return []
+                listed = True
+                with metrics.track_upstream("youtube", "videos.list"):
+                    vr = client.get(
+                        f"{yt_base}/videos",
+                        params={
+                            "key": yt_key,
+                            "id": ",".join(ids),
+                            "part": "snippet,contentDetails,status",
+                        },
+                    )
+                    vr.raise_for_status()
+                vdata = vr.json()
+        finally:
+            # Units were reserved up front: refund and don't count the calls never
+            # sent, unless YouTube said the quota is gone
+            if not exhausted:
+                quota.refund(searches=n_search - sent, videos_list=not listed)
+            if sent:
+                metrics.inc("youtube_quota_units_total", sent * UNIT_COST["search"], op="search")
+            if listed:
+                metrics.inc("youtube_quota_units_total", UNIT_COST["videos.list"], op="videos.list")
+        raw: List[Dict[str, Any]] = []
+        for it in vdata.get("items", []):
+            vid = it.get("id")
+            sn = it.get("snippet", {})
+            cd = it.get("contentDetails", {})
+            if not vid:
+                continue
+            title = sn.get("title", "")
+            channel = sn.get("channelTitle", "")
+            thumbs = (sn.get("thumbnails") or {}).get("high") or (sn.get("thumbnails") or {}).get("default") or {}
+            dur = _duration_to_seconds(cd.get("duration", ""))
+            has_cap = (cd.get("caption") == "true")
+            raw.append(
+                VideoItem(
+                    id=vid,
+                    title=title,
+                    channel=channel,
+                    url=f"https://www.youtube.com/watch?v={vid}",
+                    durationSec=dur,
+                    hasCaptions=has_cap,
+                    thumbnail=thumbs.get("url"),
+                    tags=list(set([payload.cefr] + payload.characters)),
+                ).model_dump()
+            )
+        ranked = rank(raw)
+        if ranked:
+            # Store before the in-flight entry is released so late arrivals hit the cache
+            quota.store(req_key, catalog_key, ranked)
+        return ranked
+
+    if yt_key:
+        cached = None if payload.refresh else quota.cached(req_key)
+        metrics.count_cache("youtube_results", cached is not None)
+        if cached is not None:
+            return json_response(top(cached))
+        try:
+            # Children opening the app together send identical searches; only
+            # one of them goes upstream.
+            ranked, shared = quota.flight.do(req_key, fetch_ranked)
+            metrics.count_cache("youtube_inflight", shared)
+            return json_response(top(ranked))
+        except QuotaLow:
+            metrics.count_fallback("search_youtube_videos", "quota_low")
+        except Exception:
+            metrics.count_fallback("search_youtube_videos", "upstream_error")
+        # Degrade to an expired cache entry, then to earlier results for the
+        # same age bucket and CEFR re-ranked for this child, before the stub.
+        stale = quota.cached(req_key, stale=True)
+        if stale:
+            metrics.count_fallback("search_youtube_videos", "stale_cache")
+            return json_response(top(stale))
+        from_catalog = rank(quota.catalog(catalog_key))
+        if from_catalog:
+            metrics.count_fallback("search_youtube_videos", "catalog")
+            return json_response(top(from_catalog))
+    else:
+        metrics.count_fallback("search_youtube_videos", "not_configured")
+
+    # Fallback stub if no API key or error
+    use_char = (payload.characters[:1] or ["Pikachu"])[0]
+    age = int(payload.age)
+    if age <= 5:
+        title = f"{use_char} ABC phonics song"
+        vid = "JY8cXbeAY3Y"
+        dur = 180
+    elif age <= 8:
+        title = f"{use_char} simple story for A1"
+        vid = "J---aiyznGQ"
+        dur = 360
+    else:
+        title = f"{use_char} science for kids (A2)"
+        vid = "3JZ_D3ELwOQ"
+        dur = 540
+    sample = [
+        VideoItem(
+            id=vid,
+            title=title,
+            channel="Kids Channel",
+            url=f"https://www.youtube.com/watch?v={vid}",
+            durationSec=dur,
+            hasCaptions=True,
+            thumbnail=f"https://img.youtube.com/vi/{vid}/hqdefault.jpg",
+            tags=[payload.cefr, use_char],
+        ).model_dump()
+    ]
+    return json_response(sample[: payload.max])
+
+
+_YOUTUBE_ID = re.compile(r"(?:[?&]v=|youtu\.be/|/embed/|/shorts/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+
+
+def _transcript_id(video_url: str) -> str:
+    """Stable id of the video's transcript on every worker: the YouTube video
+    id, or a sha1 of the URL for other links (never ``hash()``, which is
+    salted per process)."""
+    m = _YOUTUBE_ID.search(video_url)
+    if m:
+        return "tx_" + m.group(1)
+    return "tx_" + hashlib.sha1(video_url.encode("utf-8")).hexdigest()[:20]
+
+
+@bp.route(route="tools/index_video", methods=["POST"])
+@metrics.instrument("index_video")
+def index_video(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = IndexVideoReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Fetch captions or run Video Indexer
+    segments = payload.segments or [{"t0": 0, "t1": 12, "text": "Hello friends"}]
+    transcript_id = _transcript_id(payload.videoUrl)
+    if payload.segments:
+        # The placeholder is only a response stub: never store or index it
+        transcripts.save(transcript_id, segments, lang="en")
+        ingest.submit(transcript_id, payload.videoUrl, segments, lang="en")
+    resp = IndexVideoResp(
+        transcriptId=transcript_id,
+        lang="en",
+        wordCounts={"forest": 3, "brave": 2, "climb": 4},
+        segments=segments,
+    )
+    return json_response(resp.model_dump())
+
+
+@bp.route(route="tools/rank_video_by_level", methods=["POST"])
+@metrics.instrument("rank_video_by_level")
+def rank_video_by_level(req: func.HttpRequest) -> func.HttpResponse:
+    try:
+        payload = RankVideoReq.model_validate_json(req.get_body())
+    except ValidationError as ve:
+        return bad_request(ve.json())
+
+    # TODO: Estimate difficulty via CEFR lists + Zipf + classifier
+    resp = RankVideoResp(score=0.72, reasons=[f"Matches {payload.cefr}", "Short sentences"])
+    return json_response(resp.model_dump())
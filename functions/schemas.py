@@ -0,0 +1,184 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field, conint, constr
+
+
+# Pydantic Schemas (minimal; align with spec)
+
+class SearchYouTubeReq(BaseModel):
+    age: conint(ge=0, le=15)
+    cefr: constr(strip_whitespace=True)
+    characters: List[str] = Field(default_factory=list)
+    max: conint(ge=1, le=50) = 10
+    excludeIds: List[str] = Field(default_factory=list)  # e.g. watched videos; not part of the cache key
+    refresh: bool = False  # skip the cached result (the "새 영상 추천" button)
+
+
+class VideoItem(BaseModel):
+    id: str
+    title: str
+    channel: str
+    url: str
+    durationSec: int
+    hasCaptions: bool
+    thumbnail: Optional[str] = None
+    tags: List[str] = Field(default_factory=list)
+
+
+class IndexVideoReq(BaseModel):
+    videoUrl: str
+    segments: Optional[List[Dict[str, Any]]] = None  # captions the caller already has ({t0, t1, text})
+
+
+class IndexVideoResp(BaseModel):
+    transcriptId: str
+    lang: str
+    wordCounts: Dict[str, int]
+    segments: List[Dict[str, Any]]
+
+
+class RankVideoReq(BaseModel):
+    transcriptId: str
+    cefr: str
+
+
+class RankVideoResp(BaseModel):
+    score: float
+    reasons: List[str]
+
+
+class ExtractTopWordsReq(BaseModel):
+    transcriptId: str
+    count: conint(ge=1, le=10) = 5
+    cefr: str
+
+
+class WordEntry(BaseModel):
+    word: str
+    pos: str
+    cefr: str
+    definition: Optional[str] = None
+    ipa: Optional[str] = None
+    audioUrl: Optional[str] = None
+
+
+class ExampleSentenceReq(BaseModel):
+    word: str
+    cefr: str
+    context: Dict[str, str] = Field(default_factory=dict)
+
+
+class ExampleSentenceResp(BaseModel):
+    sentence: str
+
+
+class UpdateProgressReq(BaseModel):
+    childId: str
+    videoId: str
+    learnedWords: List[str]
+    quizScore: Optional[int] = Field(default=None, ge=0, le=100)
+    durationSec: conint(ge=0)
+
+
+class UpdateProgressResp(BaseModel):
+    ok: bool
+    newLevel: Optional[str] = None
+    streak: Optional[int] = None
+
+
+class ComputeLevelReq(BaseModel):
+    childId: str
+
+
+class ComputeLevelResp(BaseModel):
+    cefr: str
+    confidence: float
+    deltas: Dict[str, int] = Field(default_factory=dict)
+
+
+class FindLocalAcademiesReq(BaseModel):
+    address: str
+    radiusMeters: conint(gt=0) = 3000
+    tags: Optional[List[str]] = None
+    topK: conint(gt=0, le=25) = 10
+
+
+class AcademyItem(BaseModel):
+    name: str
+    phone: Optional[str] = None
+    address: str
+    mapUrl: Optional[str] = None
+    distanceM: Optional[int] = None
+
+
+class SearchAcademiesReq(BaseModel):
+    region: str
+    query: Optional[str] = None
+    topK: conint(gt=0, le=25) = 5
+
+
+class PlayCheerReq(BaseModel):
+    voice: constr(strip_whitespace=True) = "child"
+    style: constr(strip_whitespace=True) = "cheerful"
+
+
+class PlayCheerResp(BaseModel):
+    audioUrl: str
+
+
+class ParentReportReq(BaseModel):
+    childId: str
+    period: constr(strip_whitespace=True) = "7d"
+
+
+class ParentReportResp(BaseModel):
+    summaryText: str
+    kpis: Dict[str, Any]
+    chartData: Dict[str, Any]
+
+
+class SayWordReq(BaseModel):
+    word: str
+    voice: Optional[str] = None  # e.g., en-US-AvaNeural
+    style: Optional[str] = None
+
+
+class SayWordResp(BaseModel):
+    audioUrl: Optional[str] = None  # data URL
+    audioB64: Optional[str] = None
+    contentType: Optional[str] = None
+
+
+class ExtractExpressionsReq(BaseModel):
+    transcriptId: str
+    count: conint(ge=1, le=5) = 3
+    cefr: Optional[str] = None
+
+
+class ExtractExpressionsResp(BaseModel):
+    phrases: List[str]
+
+
+class SaveProfileReq(BaseModel):
+    childId: str
+    name: str
+    age: conint(ge=0, le=15)
+    region: str
+    study: str
+    characters: List[str] = Field(default_factory=list)
+    cefr: str
+    interest: Optional[int] = Field(default=None, ge=1, le=5)
+
+
+class SaveProfileResp(BaseModel):
+    ok: bool
+    storedId: Optional[str] = None
+
+
+class LoadProfileReq(BaseModel):
+    childId: str
+
+
+class LoadProfileResp(BaseModel):
+    ok: bool
+    profile: Optional[Dict[str, Any]] = None
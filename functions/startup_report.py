@@ -0,0 +1,87 @@
+"""Cold-start import report for the Functions app.
+
+Imports function_app in a fresh interpreter with ``-X importtime`` and prints
+the import time per top-level package. Exits non-zero when the total
+exceeds ``--budget-ms`` or when a module that should be lazy is loaded at
+startup, so it can run as a CI gate:
+
+    python functions/startup_report.py --budget-ms 1500
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Upstream SDKs that must only be imported on first use (see common.py).
+DEFAULT_LAZY = ["httpx", "azure.cosmos", "azure.storage.blob"]
+
+
+def collect_import_times(entry: str = "function_app") -> List[Dict[str, object]]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {entry}"],
+        cwd=here,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {entry} failed:\n{proc.stderr[-2000:]}")
+    rows: List[Dict[str, object]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line.split(":", 1)[1].split("|")
+        if len(parts) != 3:
+            continue
+        rows.append({"module": parts[2].strip(), "selfUs": int(parts[0])})
+    return rows
+
+
+def main(argv: List[str] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--budget-ms", type=float, default=None, help="fail if total import time exceeds this")
+    ap.add_argument("--lazy", default=",".join(DEFAULT_LAZY), help="comma-separated modules that must not load at startup")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    rows = collect_import_times()
+    # Attribute each module's own time to its top-level package so the report
+    # reads "pydantic 120 ms, azure 80 ms, routes 3 ms" rather than a flat tree.
+    by_package: Dict[str, int] = {}
+    for r in rows:
+        pkg = r["module"].split(".")[0]
+        by_package[pkg] = by_package.get(pkg, 0) + r["selfUs"]
+    ranked = sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)
+    total_ms = sum(by_package.values()) / 1000.0
+    lazy = [m.strip() for m in args.lazy.split(",") if m.strip()]
+    loaded = {r["module"] for r in rows}
+    eager = [m for m in lazy if any(x == m or x.startswith(m + ".") for x in loaded)]
+
+    if args.json:
+        print(json.dumps({
+            "totalMs": round(total_ms, 1),
+            "packages": [{"package": k, "ms": round(v / 1000.0, 1)} for k, v in ranked[: args.top]],
+            "eagerLazyModules": eager,
+        }, indent=2))
+    else:
+        print(f"{'package':<32} {'ms':>10}")
+        for pkg, us in ranked[: args.top]:
+            print(f"{pkg:<32} {us / 1000.0:>10.1f}")
+        print(f"{'TOTAL':<32} {total_ms:>10.1f}")
+
+    failed = False
+    if eager:
+        print(f"FAIL: imported at startup but should be lazy: {', '.join(eager)}", file=sys.stderr)
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"FAIL: startup imports took {total_ms:.1f} ms (budget {args.budget_ms:.1f} ms)", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Transcript store keyed by transcriptId.
+
+``index_video`` saves the segments it produced; the learning routes read them
+back to ground their output in the video. Recent transcripts are kept in an
+in-process LRU; when Blob Storage is configured they are also written to the
+TRANSCRIPT_CONTAINER container (default ``transcripts``) so other workers can
+load them.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import metrics
+from common import blob_client_from_env
+
+_MAX_ENTRIES = 256
+_lock = threading.Lock()
+_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+_container_ready = False
+
+
+def _container() -> str:
+    return os.getenv("TRANSCRIPT_CONTAINER", "transcripts")
+
+
+def _remember(transcript_id: str, segments: List[Dict[str, Any]]) -> None:
+    with _lock:
+        _cache[transcript_id] = segments
+        _cache.move_to_end(transcript_id)
+        while len(_cache) > _MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def save(transcript_id: str, segments: List[Dict[str, Any]], lang: str = "en") -> None:
+    _remember(transcript_id, list(segments))
+    bsc = blob_client_from_env()
+    if not bsc:
+        return
+    global _container_ready
+    data = json.dumps({"transcriptId": transcript_id, "lang": lang, "segments": segments}, ensure_ascii=False)
+    if not _container_ready:
+        try:
+            bsc.create_container(_container())
+        except Exception:
+            pass  # already exists
+        _container_ready = True
+    try:
+        with metrics.track_upstream("blob", "upload"):
+            blob = bsc.get_blob_client(container=_container(), blob=f"{transcript_id}.json")
+            blob.upload_blob(data.encode("utf-8"), overwrite=True, content_type="application/json")
+    except Exception:
+        pass
+
+
+def load(transcript_id: str) -> Optional[List[Dict[str, Any]]]:
+    with _lock:
+        segments = _cache.get(transcript_id)
+        if segments is not None:
+            _cache.move_to_end(transcript_id)
+    metrics.count_cache("transcripts", segments is not None)
+    if segments is not None:
+        return segments
+    bsc = blob_client_from_env()
+    if not bsc:
+        return None
+    try:
+        with metrics.track_upstream("blob", "download"):
+            blob = bsc.get_blob_client(container=_container(), blob=f"{transcript_id}.json")
+            doc = json.loads(blob.download_blob().readall())
+    except Exception:
+        return None
+    segments = doc.get("segments") or []
+    _remember(transcript_id, segments)
+    return segments
+
+
+def text(segments: List[Dict[str, Any]]) -> str:
+    return "\n".join(str(s.get("text") or "").strip() for s in segments if s.get("text"))
@@ -0,0 +1,189 @@
+"""YouTube Data API quota management for search_youtube_videos.
+
+- Unit costs per call (search.list = 100, videos.list = 1) are charged against a
+  token bucket refilled at YOUTUBE_QUOTA_PER_DAY / 86400 units per second, with
+  YOUTUBE_QUOTA_BURST as the bucket size. Units are reserved up front and the
+  calls that are never sent (no ids to list, an early error) are refunded.
+- Identical in-flight searches are coalesced into one upstream call.
+- Results are cached per request key; when the budget cannot cover a search
+  the route serves the (possibly stale) cache entry or a per age/CEFR catalog
+  assembled from earlier results, instead of the single stub video.
+
+State is per worker process; divide the daily quota by the expected number of
+instances when scaling out.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+UNIT_COST = {"search": 100, "videos.list": 1}
+
+
+class QuotaLow(Exception):
+    """Raised when the bucket cannot pay for even a single search."""
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, refill_per_sec: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_sec = float(refill_per_sec)
+        self._clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # While blocked, _updated sits at the block's end: nothing accrues
+        if now > self._updated:
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_sec)
+            self._updated = now
+
+    def available(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            return 0.0 if now < self._blocked_until else self._tokens
+
+    def try_consume(self, units: float) -> bool:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if now < self._blocked_until or self._tokens < units:
+                return False
+            self._tokens -= units
+            return True
+
+    def refund(self, units: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + units)
+
+    def block(self, seconds: float) -> None:
+        """Stop spending (e.g. after a quotaExceeded 403) until the upstream resets."""
+        with self._lock:
+            self._tokens = 0.0
+            self._blocked_until = self._clock() + seconds
+            self._updated = max(self._updated, self._blocked_until)
+
+
+class SingleFlight:
+    """Run one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Dict[str, Any]] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns ``(result, shared)``; exceptions propagate to every waiter."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+            if "error" in call:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn()
+            return call["result"], False
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call["done"].set()
+
+
+class QuotaManager:
+    def __init__(
+        self,
+        per_day: int = 10_000,
+        burst: Optional[int] = None,
+        cache_ttl_sec: float = 1800.0,
+        stale_ttl_sec: float = 86400.0,
+        max_entries: int = 512,
+        exhausted_cooldown_sec: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bucket = TokenBucket(burst or max(UNIT_COST["search"] + 1, per_day // 10), per_day / 86400.0, clock)
+        self.flight = SingleFlight()
+        self.cache_ttl_sec = cache_ttl_sec
+        self.stale_ttl_sec = stale_ttl_sec
+        self.max_entries = max_entries
+        self.exhausted_cooldown_sec = exhausted_cooldown_sec
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[Hashable, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._catalog: Dict[Hashable, "OrderedDict[str, Dict[str, Any]]"] = {}
+
+    @classmethod
+    def from_env(cls) -> "QuotaManager":
+        burst = os.getenv("YOUTUBE_QUOTA_BURST")
+        return cls(
+            per_day=int(os.getenv("YOUTUBE_QUOTA_PER_DAY", "10000")),
+            burst=int(burst) if burst else None,
+            cache_ttl_sec=float(os.getenv("YOUTUBE_CACHE_TTL_SEC", "1800")),
+        )
+
+    # --- budget -------------------------------------------------------------
+
+    def reserve_searches(self, wanted: int) -> int:
+        """Charge for up to ``wanted`` search calls plus the videos.list that
+        follows them, and return how many searches may run. Raises QuotaLow if
+        not even one fits."""
+        for n in range(wanted, 0, -1):
+            if self.bucket.try_consume(n * UNIT_COST["search"] + UNIT_COST["videos.list"]):
+                return n
+        raise QuotaLow()
+
+    def refund(self, searches: int = 0, videos_list: bool = False) -> None:
+        """Give back reserved units of calls that were never sent."""
+        units = max(0, searches) * UNIT_COST["search"] + (UNIT_COST["videos.list"] if videos_list else 0)
+        if units:
+            self.bucket.refund(units)
+
+    def exhausted(self) -> None:
+        self.bucket.block(self.exhausted_cooldown_sec)
+
+    # --- cache / catalog ----------------------------------------------------
+
+    def cached(self, key: Hashable, stale: bool = False) -> Optional[List[Dict[str, Any]]]:
+        ttl = self.stale_ttl_sec if stale else self.cache_ttl_sec
+        with self._lock:
+            hit = self._cache.get(key)
+            if not hit:
+                return None
+            stored_at, items = hit
+            if self._clock() - stored_at > ttl:
+                if self._clock() - stored_at > self.stale_ttl_sec:
+                    del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return list(items)
+
+    def store(self, key: Hashable, catalog_key: Hashable, items: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._cache[key] = (self._clock(), list(items))
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            cat = self._catalog.setdefault(catalog_key, OrderedDict())
+            for it in items:
+                if it.get("id"):
+                    cat[it["id"]] = it
+                    cat.move_to_end(it["id"])
+            while len(cat) > 50:
+                cat.popitem(last=False)
+
+    def catalog(self, catalog_key: Hashable) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._catalog.get(catalog_key, {}).values())
+
+
+quota = QuotaManager.from_env()
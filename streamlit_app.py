@@ -1,4 +1,5 @@
 ﻿import os
+import time
 import asyncio
 import base64
 from io import BytesIO
@@ -7,7 +8,12 @@ from typing import List, Dict, Any
 import streamlit as st
 from dotenv import load_dotenv
 
-from app.azure_tools import tool_router as http_tool_router, TOOLS_SPEC as _  # noqa: F401
+from app.async_runner import run as run_async, run_many as run_many_async, submit as submit_async
+from app.azure_tools import backend_failed, note_fallback, stream_tool as http_stream_tool, tool_router as http_tool_router, TOOLS_SPEC as _  # noqa: F401
+from app.card_pipeline import card_prefetcher, stream_cards
+from app.circuit_breaker import breaker_for, breaker_states
+from app.recommendations import reco_cache
+from app import telemetry as agent_telemetry
 
 
 load_dotenv()
@@ -19,12 +25,29 @@ def use_functions_tools() -> bool:
     return os.getenv("USE_FUNCTION_TOOLS", "false").lower() in ("1", "true", "yes")
 
 
+# Remote calls slower than this give up and use the local stub
+TOOL_CALL_TIMEOUT_SEC = float(os.getenv("TOOL_CALL_TIMEOUT_SEC", "10"))
+# Entries of watch_history kept in the session (oldest dropped first)
+WATCH_HISTORY_MAX = int(os.getenv("WATCH_HISTORY_MAX", "50"))
+
+
 async def call_tool(name: str, args: Dict[str, Any]):
     if use_functions_tools():
-        try:
-            return await http_tool_router(name, args)
-        except Exception:
-            pass
+        # Open breaker: backend known to be failing for this tool, skip straight to the stub
+        breaker = breaker_for(name)
+        if breaker.allow():
+            started = time.perf_counter()
+            ok = None  # stays None when cancelled: release the probe slot without an outcome
+            try:
+                result = await asyncio.wait_for(http_tool_router(name, args), TOOL_CALL_TIMEOUT_SEC)
+                ok = True
+                return result
+            except Exception as e:
+                # A rejected request (4xx) says nothing about the backend's health
+                ok = not backend_failed(e)
+            finally:
+                breaker.record(ok, time.perf_counter() - started)
+        note_fallback(name)
     # Local stubs
     if name == "search_youtube_videos":
         chs = args.get("characters") or ["블루이"]
@@ -47,8 +70,9 @@ async def call_tool(name: str, args: Dict[str, Any]):
                 "thumbnail": f"https://img.youtube.com/vi/{vid}/hqdefault.jpg",
                 "tags": [args.get("cefr", "A1"), chs[0]],
             })
-        maxn = max(1, min(int(args.get("max", 5)), len(out)))
-        return out[:maxn]
+        skip = set(args.get("excludeIds") or [])
+        out = [v for v in out if v["id"] not in skip]
+        return out[:max(1, int(args.get("max", 5)))]
     if name == "index_video":
         return {"transcriptId": "tx_local_1", "lang": "en", "wordCounts": {}, "segments": []}
     if name == "extract_top_words":
@@ -82,6 +106,69 @@ async def call_tool(name: str, args: Dict[str, Any]):
     return {"error": f"unknown tool {name}"}
 
 
+async def stream_call_tool(name: str, args: Dict[str, Any]):
+    """``(event, data)`` from the tool's SSE mode behind the same breaker as
+    ``call_tool``; if the stream fails before its first event, one
+    ``("done", result)`` from ``call_tool`` (remote or stub) instead."""
+    if use_functions_tools():
+        breaker = breaker_for(name)
+        if breaker.allow():
+            started = time.perf_counter()
+            ok, sent = None, False
+            try:
+                async for event, data in http_stream_tool(name, args):
+                    sent = True
+                    yield event, data
+                ok = True
+                return
+            except Exception as e:
+                ok = not backend_failed(e)
+                if sent:
+                    raise
+            finally:
+                breaker.record(ok, time.perf_counter() - started)
+    yield "done", await call_tool(name, args)
+
+
+def make_learning_cards(sel: Dict[str, Any], prof: Dict[str, Any], kind: str, target) -> List[Dict[str, Any]]:
+    """Generate the cards for ``sel``, showing each in ``target`` as it is ready."""
+    slot = target.empty()
+    ready: Dict[int, Dict[str, Any]] = {}
+    for i, card in stream_cards(call_tool, sel, prof, kind, stream_call_tool):
+        ready[i] = card
+        with slot.container():
+            st.caption(f"학습 카드 준비 중… ({len(ready)})")
+            for j in sorted(ready):
+                st.write(f"{j+1}. {ready[j].get('word') or ready[j].get('phrase')}")
+    slot.empty()
+    return [ready[i] for i in sorted(ready)]
+
+
+def play_card_audio(text: str, card: Dict[str, Any]) -> None:
+    # Audio prefetched by the card pipeline, else synthesize now
+    resp = card if (card.get("audioB64") or card.get("audioUrl")) else run_async(call_tool("say_word", {"word": text, "voice": "en-US-AvaNeural"}))
+    b64 = resp.get("audioB64")
+    if b64:
+        st.audio(BytesIO(base64.b64decode(b64)), format="audio/mp3")
+    elif resp.get("audioUrl"):
+        st.audio(resp["audioUrl"])  # fallback
+
+
+def record_history(prof: Dict[str, Any], video_id: str, title: str, **flags) -> None:
+    """Set ``watched``/``learned`` on the video's watch_history entry, keep the
+    last WATCH_HISTORY_MAX entries, and sync only this entry to save_prefs."""
+    hist = st.session_state["watch_history"]
+    entry = next((it for it in hist if it.get("videoId") == video_id), None)
+    if entry is None:
+        entry = {"videoId": video_id, "title": title, "watched": False, "learned": False}
+        hist.append(entry)
+    entry.update(flags)
+    del hist[:-WATCH_HISTORY_MAX]
+    if use_functions_tools():
+        # Fire and forget on the background loop; a lost update only costs history
+        submit_async(call_tool("save_prefs", {"childId": prof.get("childId", "local_child"), "recent_upserts": [dict(entry)]}))
+
+
 def derive_cefr(age: int, study: str) -> str:
     if age <= 5:
         return "PREA1"
@@ -101,15 +188,26 @@ if "watched_ids" not in st.session_state:
     st.session_state["watched_ids"] = set()
 if "watch_history" not in st.session_state:
     st.session_state["watch_history"] = []  # {videoId,title,watched,learned}
-    # Try loading existing profile from backend on first run
+    # Try loading existing profile (and watch history) from backend on first run;
+    # the two loads are independent, so they go out together
+    child = (st.session_state.get("profile") or {}).get("childId") or "local_child"
+    loads = [call_tool("load_profile", {"childId": "local_child"})]
+    if use_functions_tools():
+        loads.append(call_tool("load_prefs", {"childId": child}))
     try:
-        resp = asyncio.run(call_tool("load_profile", {"childId": "local_child"}))
-        if isinstance(resp, dict) and resp.get("ok") and resp.get("profile") and not st.session_state.get("profile"):
-            prof = resp.get("profile") or {}
-            prof["childId"] = prof.get("childId") or "local_child"
-            st.session_state["profile"] = prof
+        resp, *rest = run_many_async(loads)
     except Exception:
-        pass
+        resp, rest = None, []
+    if isinstance(resp, dict) and resp.get("ok") and resp.get("profile") and not st.session_state.get("profile"):
+        prof = resp.get("profile") or {}
+        prof["childId"] = prof.get("childId") or "local_child"
+        st.session_state["profile"] = prof
+    prefs = rest[0] if rest else None
+    if isinstance(prefs, dict):
+        for v in (prefs.get("recent_videos") or [])[-WATCH_HISTORY_MAX:]:
+            st.session_state["watch_history"].append({k: v.get(k) for k in ("videoId", "title", "watched", "learned")})
+            if v.get("watched"):
+                st.session_state["watched_ids"].add(v.get("videoId"))
 
 
 def setup_view():
@@ -144,7 +242,7 @@ def setup_view():
             "goto_child": bool(save_and_go_clicked),
         })
         try:
-            _ = asyncio.run(call_tool("save_profile", {
+            _ = run_async(call_tool("save_profile", {
                 "childId": st.session_state["profile"]["childId"],
                 "name": st.session_state["profile"].get("name", ""),
                 "age": st.session_state["profile"]["age"],
@@ -166,16 +264,20 @@ def child_view():
     st.subheader("아동용 — 영상 시청 및 학습")
     col_left, col_right = st.columns([3, 2], gap="large")
 
-    # Get 2 recommendations and filter out watched
+    # Get 2 recommendations and filter out watched (cached across reruns)
     results: List[Dict[str, Any]] = []
     try:
-        results = asyncio.run(call_tool("search_youtube_videos", {
-            "age": prof["age"], "cefr": prof["cefr"], "characters": prof["characters"], "max": 2
-        }))
+        results = reco_cache.get(
+            prof,
+            st.session_state.get("watched_ids", set()),
+            lambda exclude, refresh: call_tool("search_youtube_videos", {
+                "age": prof["age"], "cefr": prof["cefr"], "characters": prof["characters"], "max": 2,
+                "excludeIds": exclude, "refresh": refresh,
+            }),
+            max_results=2,
+        )
     except Exception as e:
         st.warning(f"추천 검색 실패: {e}")
-    watched_ids = set(st.session_state.get("watched_ids", set()))
-    results = [it for it in (results or []) if it.get("id") not in watched_ids]
 
     with col_left:
         sel = st.session_state.get("selected_video")
@@ -183,47 +285,22 @@ def child_view():
         if sel:
             st.write(sel["title"])
             st.video(sel["url"])
+            # Start the cards while the video plays; "시청 완료" joins this run
+            card_prefetcher.prefetch(call_tool, sel, prof, "words", stream_call_tool)
             if st.button("시청 완료", key="btn_watch_done"):
                 vid_id = sel.get("id", ""); title = sel.get("title", "")
                 st.session_state["watched_ids"].add(vid_id)
                 # 기록 업데이트
-                found = False
-                for it in st.session_state["watch_history"]:
-                    if it.get("videoId") == vid_id:
-                        it["watched"] = True; found = True; break
-                if not found:
-                    st.session_state["watch_history"].append({"videoId": vid_id, "title": title, "watched": True, "learned": False})
+                record_history(prof, vid_id, title, watched=True)
                 # 바로 학습 카드 생성 (상위 5 단어)
                 try:
-                    idx = asyncio.run(call_tool("index_video", {"videoUrl": sel["url"]}))
-                    tx_id = idx.get("transcriptId", "tx")
-                    words = asyncio.run(call_tool("extract_top_words", {"transcriptId": tx_id, "count": 5, "cefr": prof["cefr"]}))
-                    cards = []
-                    for w in words:
-                        ex = asyncio.run(call_tool(
-                            "example_sentence",
-                            {"word": w.get("word",""), "cefr": prof["cefr"], "context": {"videoTitle": sel.get("title",""), "character": (prof.get("characters") or [""])[0]}}
-                        ))
-                        cards.append({
-                            "word": w.get("word",""),
-                            "definition": w.get("definition", ""),
-                            "sentence": ex.get("sentence", ""),
-                            "imageUrl": f"https://source.unsplash.com/400x240/?{w.get('word','')},kids",
-                        })
-                    st.session_state["learning_cards"] = cards
+                    st.session_state["learning_cards"] = make_learning_cards(sel, prof, "words", col_right)
                     st.success("시청 완료! 해당 영상의 학습 카드 5개를 준비했어요.")
                 except Exception as e:
                     st.error(f"학습 카드 생성 실패: {e}")
             if st.button("학습 시작", key="start_learning_btn"):
                 try:
-                    idx = asyncio.run(call_tool("index_video", {"videoUrl": sel["url"]}))
-                    tx_id = idx.get("transcriptId", "tx")
-                    words = asyncio.run(call_tool("extract_top_words", {"transcriptId": tx_id, "count": 5, "cefr": prof["cefr"]}))
-                    cards = []
-                    for w in words:
-                        ex = asyncio.run(call_tool("example_sentence", {"word": w["word"], "cefr": prof["cefr"], "context": {"videoTitle": sel["title"], "character": (prof["characters"] or [""])[0]}}))
-                        cards.append({"word": w["word"], "definition": w.get("definition", ""), "sentence": ex.get("sentence", ""), "imageUrl": f"https://source.unsplash.com/400x240/?{w['word']},kids"})
-                    st.session_state["learning_cards"] = cards
+                    st.session_state["learning_cards"] = make_learning_cards(sel, prof, "words", col_right)
                     st.success("학습 카드가 준비되었습니다.")
                 except Exception as e:
                     st.error(f"학습 카드 생성 실패: {e}")
@@ -231,6 +308,7 @@ def child_view():
             st.info("아래 추천 목록에서 영상을 선택하세요.")
 
         st.markdown("#### 추천 영상")
+        st.button("새 영상 추천", key="reco_refresh", on_click=reco_cache.invalidate, args=(prof, [r.get("id") for r in results]))
         if results:
             cols = st.columns(2)
             for i, item in enumerate(results):
@@ -262,18 +340,13 @@ def child_view():
                     st.write(c.get("sentence", ""))
                     if st.button("발음 듣기", key=f"say_{idx}"):
                         try:
-                            resp = asyncio.run(call_tool("say_word", {"word": c["word"], "voice": "en-US-AvaNeural"}))
-                            b64 = resp.get("audioB64")
-                            if b64:
-                                st.audio(BytesIO(base64.b64decode(b64)), format="audio/mp3")
-                            elif resp.get("audioUrl"):
-                                st.audio(resp["audioUrl"])  # fallback
+                            play_card_audio(c["word"], c)
                         except Exception as e:
                             st.warning(f"발음 생성 실패: {e}")
             if st.button("완료(진행도 저장)", key="save_progress_btn"):
                 try:
                     sel = st.session_state.get("selected_video") or {}
-                    _ = asyncio.run(call_tool("update_progress", {
+                    _ = run_async(call_tool("update_progress", {
                         "childId": prof["childId"],
                         "videoId": sel.get("id", ""),
                         "learnedWords": [c["word"] for c in cards],
@@ -281,16 +354,10 @@ def child_view():
                         "durationSec": sel.get("durationSec", 300),
                     }))
                     # mark learned
-                    vid_id = sel.get("id", ""); title = sel.get("title", "")
-                    found = False
-                    for it in st.session_state["watch_history"]:
-                        if it.get("videoId") == vid_id:
-                            it["learned"] = True; found = True; break
-                    if not found:
-                        st.session_state["watch_history"].append({"videoId": vid_id, "title": title, "watched": False, "learned": True})
+                    record_history(prof, sel.get("id", ""), sel.get("title", ""), learned=True)
                     # cheer
                     try:
-                        cheer = asyncio.run(call_tool("play_cheer", {"voice": "child", "style": "cheerful"}))
+                        cheer = run_async(call_tool("play_cheer", {"voice": "child", "style": "cheerful"}))
                         if cheer.get("audioUrl"):
                             st.audio(cheer["audioUrl"]) 
                     except Exception:
@@ -309,7 +376,7 @@ def parent_view():
     with col1:
         st.markdown("#### 학습 요약 (7일)")
         try:
-            rep = asyncio.run(call_tool("parent_report", {"childId": prof["childId"], "period": "7d"}))
+            rep = run_async(call_tool("parent_report", {"childId": prof["childId"], "period": "7d"}))
             st.write(rep.get("summaryText", ""))
             k = rep.get("kpis", {})
             st.metric("시청 분", k.get("watchMin", 0))
@@ -345,7 +412,7 @@ def parent_view():
                 prof.update({"age": int(age), "region": region.strip(), "study": study, "cefr": new_cefr})
                 st.success(f"저장 완료 (CEFR: {new_cefr})")
                 try:
-                    _ = asyncio.run(call_tool("save_profile", {
+                    _ = run_async(call_tool("save_profile", {
                         "childId": prof.get("childId", "local_child"),
                         "name": name.strip(),
                         "age": int(age),
@@ -372,7 +439,7 @@ def parent_view():
     radius = st.select_slider("반경(미터)", options=[1000, 2000, 3000, 5000], value=3000)
     if st.button("학원 검색"):
         try:
-            results = asyncio.run(call_tool("find_local_academies", {"address": prof["region"], "radiusMeters": int(radius), "tags": ["english", "kids"], "topK": 5}))
+            results = run_async(call_tool("find_local_academies", {"address": prof["region"], "radiusMeters": int(radius), "tags": ["english", "kids"], "topK": 5}))
             for a in results:
                 st.write(f"- {a['name']} ({a.get('distanceM','?')}m) — {a['address']} — {a.get('phone','')}")
         except Exception as e:
@@ -464,11 +531,15 @@ def child_view_v2():
 
     results: list[dict[str, Any]] = []
     try:
-        fetched = asyncio.run(call_tool("search_youtube_videos", {
-            "age": prof["age"], "cefr": prof["cefr"], "characters": prof.get("characters", []), "max": 8
-        })) or []
-        watched_ids = set(st.session_state.get("watched_ids", set()))
-        results = [it for it in fetched if it.get("id") not in watched_ids][:2]
+        results = reco_cache.get(
+            prof,
+            st.session_state.get("watched_ids", set()),
+            lambda exclude, refresh: call_tool("search_youtube_videos", {
+                "age": prof["age"], "cefr": prof["cefr"], "characters": prof.get("characters", []), "max": 8,
+                "excludeIds": exclude, "refresh": refresh,
+            }),
+            max_results=8,
+        )[:2]
     except Exception as e:
         st.warning(f"추천 실패: {e}")
 
@@ -498,25 +569,14 @@ def child_view_v2():
         if sel:
             st.write(sel.get("title", ""))
             st.video(sel.get("url", ""))
+            card_prefetcher.prefetch(call_tool, sel, prof, "phrases", stream_call_tool)
             if st.button("시청 완료", key="btn_watch_done_v2"):
                 vid_id = sel.get("id", "")
                 title = sel.get("title", "")
                 st.session_state.setdefault("watched_ids", set()).add(vid_id)
-                found = False
-                for it in st.session_state["watch_history"]:
-                    if it.get("videoId") == vid_id:
-                        it["watched"] = True
-                        found = True
-                        break
-                if not found:
-                    st.session_state["watch_history"].append({"videoId": vid_id, "title": title, "watched": True, "learned": False})
+                record_history(prof, vid_id, title, watched=True)
                 try:
-                    idx = asyncio.run(call_tool("index_video", {"videoUrl": sel.get("url", "")}))
-                    tx_id = idx.get("transcriptId", "tx")
-                    exps = asyncio.run(call_tool("extract_top_expressions", {"transcriptId": tx_id, "count": 3, "cefr": prof.get("cefr")}))
-                    phrases = exps.get("phrases") if isinstance(exps, dict) else exps
-                    cards = [{"phrase": p, "imageUrl": f"https://source.unsplash.com/400x240/?kids"} for p in (phrases or [])]
-                    st.session_state["learning_cards"] = cards
+                    st.session_state["learning_cards"] = make_learning_cards(sel, prof, "phrases", col_right)
                     st.success("시청 완료! 자주 나온 표현 3가지를 준비했어요.")
                 except Exception as e:
                     st.error(f"학습 카드 생성 실패: {e}")
@@ -525,6 +585,7 @@ def child_view_v2():
             st.info("아래 추천 목록에서 영상을 선택하세요")
 
         st.markdown("#### 추천 영상 (2)")
+        st.button("새 영상 추천", key="reco_refresh_v2", on_click=reco_cache.invalidate, args=(prof, [r.get("id") for r in results]))
         if results:
             cols = st.columns(2)
             for i, item in enumerate(results):
@@ -554,33 +615,20 @@ def child_view_v2():
                 with cc2:
                     if st.button("발음 듣기", key=f"say_phrase_{idx}"):
                         try:
-                            resp = asyncio.run(call_tool("say_word", {"word": c["phrase"], "voice": "en-US-AvaNeural"}))
-                            b64 = resp.get("audioB64")
-                            if b64:
-                                st.audio(BytesIO(base64.b64decode(b64)), format="audio/mp3")
-                            elif resp.get("audioUrl"):
-                                st.audio(resp["audioUrl"])  # fallback
+                            play_card_audio(c["phrase"], c)
                         except Exception as e:
                             st.warning(f"발음 생성 실패: {e}")
             if st.button("학습 완료(진행 저장)", key="save_progress_btn_v2"):
                 try:
                     sel = st.session_state.get("selected_video") or {}
-                    _ = asyncio.run(call_tool("update_progress", {
+                    _ = run_async(call_tool("update_progress", {
                         "childId": prof["childId"],
                         "videoId": sel.get("id", ""),
                         "learnedWords": [c["phrase"] for c in cards],
                         "quizScore": 90,
                         "durationSec": sel.get("durationSec", 300),
                     }))
-                    vid_id = sel.get("id", ""); title = sel.get("title", "")
-                    found = False
-                    for it in st.session_state["watch_history"]:
-                        if it.get("videoId") == vid_id:
-                            it["learned"] = True
-                            found = True
-                            break
-                    if not found:
-                        st.session_state["watch_history"].append({"videoId": vid_id, "title": title, "watched": False, "learned": True})
+                    record_history(prof, sel.get("id", ""), sel.get("title", ""), learned=True)
                     st.success("완료! 잘했어요 🎉")
                 except Exception as e:
                     st.error(f"저장 실패: {e}")
@@ -596,7 +644,7 @@ def parent_view_v2():
     with col1:
         st.markdown("#### 학습 요약 (7일)")
         try:
-            rep = asyncio.run(call_tool("parent_report", {"childId": prof["childId"], "period": "7d"}))
+            rep = run_async(call_tool("parent_report", {"childId": prof["childId"], "period": "7d"}))
             st.write(rep.get("summaryText", ""))
             k = rep.get("kpis", {})
             st.metric("시청 분", k.get("watchMin", 0))
@@ -617,6 +665,24 @@ def parent_view_v2():
             for h in hist[-5:][::-1]:
                 st.write(f"- {h.get('title','(제목 없음)')} ▶시청:{'O' if h.get('watched') else 'X'} / 학습:{'O' if h.get('learned') else 'X'}")
 
+        if use_functions_tools():
+            st.markdown("#### 백엔드 상태")
+            states = breaker_states()
+            if not states:
+                st.caption("아직 호출한 도구가 없어요.")
+            icons = {"closed": "🟢 정상", "half_open": "🟡 확인 중", "open": "🔴 로컬 대체"}
+            for b in states:
+                extra = f", {b['retryInSec']:g}초 후 재시도" if b["state"] == "open" else ""
+                st.write(f"- {b['tool']}: {icons.get(b['state'], b['state'])} (실패율 {b['failureRate']:.0%}, 건너뜀 {b['shortCircuited']}회{extra})")
+
+        agent_stats = agent_telemetry.stats()
+        if agent_stats["turns"]:
+            st.markdown("#### 대화 응답 통계")
+            st.caption(f"최근 {agent_stats['turns']}회: 중앙값 {agent_stats['wallMsP50']:.0f}ms, 95% {agent_stats['wallMsP95']:.0f}ms, 평균 토큰 {agent_stats['avgPromptTokens']:.0f}+{agent_stats['avgCompletionTokens']:.0f}, 오류 {agent_stats['errors']}회")
+            for t in agent_telemetry.recent_turns(5)[::-1]:
+                tools = ", ".join(c["name"] for c in t["tools"]) or "도구 없음"
+                st.write(f"- {t['wallMs']:.0f}ms · 반복 {t['iterations']}회 · {tools}{' · ⚠️' if t['error'] else ''}")
+
     with col2:
         st.markdown("#### 프로필 설정")
         study_opts = ["처음이다", "1~3개월", "3~6개월", "6개월 이상"]
@@ -686,7 +752,7 @@ def setup_view_v2():
                 "name": (st.session_state.get("profile") or {}).get("name", ""),
             }
             try:
-                _ = asyncio.run(call_tool("save_profile", {
+                _ = run_async(call_tool("save_profile", {
                     "childId": st.session_state["profile"]["childId"],
                     "name": st.session_state["profile"].get("name", ""),
                     "age": st.session_state["profile"]["age"],
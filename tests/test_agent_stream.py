@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from app.agent import _tool_events
+
+
+async def _collect(fail: bool):
+    finished = asyncio.Queue()
+
+    async def run_tools():
+        finished.put_nowait({"id": "a"})
+        await asyncio.sleep(0.01)
+        if fail:
+            raise ValueError("tool run failed")
+        finished.put_nowait({"id": "b"})
+        return ["a", "b"]
+
+    task = asyncio.ensure_future(run_tools())
+    events = [e["id"] async for e in _tool_events(task, finished)]
+    return events, task
+
+
+def test_tool_events_drain_every_event():
+    events, task = asyncio.run(asyncio.wait_for(_collect(False), 2))
+    assert events == ["a", "b"]
+    assert task.result() == ["a", "b"]
+
+
+def test_tool_events_end_when_the_run_fails():
+    events, task = asyncio.run(asyncio.wait_for(_collect(True), 2))
+    assert events == ["a"]
+    with pytest.raises(ValueError):
+        task.result()
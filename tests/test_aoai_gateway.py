@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "functions"))
+
+import aoai_gateway as func_gateway  # noqa: E402  (functions/ modules import flat)
+from app import aoai_gateway as app_gateway  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, status: int):
+        self.status_code = status
+        self.headers = {}
+
+
+class _Client:
+    def __init__(self, outcome):
+        self.outcome = outcome
+
+    def post(self, url, headers=None, json=None):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return _Resp(self.outcome)
+
+
+class _AsyncClient(_Client):
+    async def post(self, url, headers=None, json=None):
+        return _Client.post(self, url, headers, json)
+
+
+def _sync_limit(outcome) -> float:
+    gw = func_gateway.AOAIGateway(func_gateway.AIMDLimiter(initial=8), max_retries=0)
+    try:
+        gw.post(_Client(outcome), "u", {}, {}, "test")
+    except OSError:
+        pass
+    return gw.limiter.limit
+
+
+def _async_limit(outcome) -> float:
+    gw = app_gateway.AOAIGateway(app_gateway.AIMDLimiter(initial=8), max_retries=0)
+
+    async def _call():
+        try:
+            await gw.post(_AsyncClient(outcome), "u", {}, {})
+        except OSError:
+            pass
+
+    asyncio.run(_call())
+    return gw.limiter.limit
+
+
+@pytest.mark.parametrize("limit_after", [_sync_limit, _async_limit], ids=["functions", "app"])
+def test_aimd_increases_on_success_and_halves_on_overload(limit_after):
+    assert limit_after(200) == pytest.approx(8 + 1 / 8)
+    assert limit_after(429) == 4
+    assert limit_after(503) == 4
+    assert limit_after(OSError("connection reset")) == 4
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+from app.azure_tools import is_background, note_fallback
+from app.card_pipeline import CardPrefetcher
+
+VIDEO = {"id": "v1", "url": "https://www.youtube.com/watch?v=v1", "title": "Bluey"}
+PROFILE = {"cefr": "A1", "characters": ["Bluey"]}
+
+
+def _fake_tools(gate: threading.Event, priorities: list, stub: bool = False):
+    async def call_tool(name, args):
+        priorities.append((name, is_background()))
+        if name == "extract_top_words":
+            while not gate.is_set():
+                await asyncio.sleep(0.005)
+        if stub:
+            note_fallback(name)
+        if name == "index_video":
+            return {"transcriptId": "tx_v1"}
+        if name == "extract_top_words":
+            return [{"word": "brave", "definition": "not afraid"}]
+        if name == "example_sentence":
+            return {"sentence": "Bluey is brave."}
+        return {"audioB64": "AA=="}
+
+    return call_tool
+
+
+def test_joining_a_prefetch_raises_its_priority():
+    gate, priorities = threading.Event(), []
+    prefetcher = CardPrefetcher()
+    call_tool = _fake_tools(gate, priorities)
+    prefetcher.prefetch(call_tool, VIDEO, PROFILE)
+    while ("extract_top_words", True) not in priorities:
+        time.sleep(0.005)
+    cards = prefetcher.stream(call_tool, VIDEO, PROFILE)
+    gate.set()
+    assert [c["word"] for _, c in cards] == ["brave"]
+    assert ("index_video", True) in priorities
+    assert ("say_word", False) in priorities
+    assert prefetcher.hits == 1
+
+
+def test_stub_cards_are_not_cached():
+    gate, priorities = threading.Event(), []
+    gate.set()
+    prefetcher = CardPrefetcher()
+    call_tool = _fake_tools(gate, priorities, stub=True)
+    list(prefetcher.stream(call_tool, VIDEO, PROFILE))
+    list(prefetcher.stream(call_tool, VIDEO, PROFILE))
+    assert prefetcher.misses == 2
+
+
+def test_phrase_cards_start_while_expressions_stream():
+    gate, calls = threading.Event(), []
+
+    async def stream_tool(name, args):
+        yield "phrase", {"text": "let's go"}
+        while not gate.is_set():
+            await asyncio.sleep(0.005)
+        yield "phrase", {"text": "good job"}
+        yield "done", {"phrases": ["good job", "let's go"]}
+
+    async def call_tool(name, args):
+        calls.append(name)
+        return {"transcriptId": "tx_v1"} if name == "index_video" else {"audioB64": "AA=="}
+
+    cards = CardPrefetcher().stream(call_tool, {"id": "v2"}, PROFILE, "phrases", stream_tool)
+    first = next(cards)
+    assert first[0] == 0 and first[1]["phrase"] == "let's go"
+    assert "extract_top_expressions" not in calls
+    gate.set()
+    assert [c["phrase"] for _, c in cards] == ["good job"]
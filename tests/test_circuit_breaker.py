@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+
+from app.azure_tools import ToolError, backend_failed
+from app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _half_open() -> CircuitBreaker:
+    breaker = CircuitBreaker(consecutive_failures=1, open_sec=0.0)
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_cancelled_probe_frees_the_slot():
+    breaker = _half_open()
+    assert not breaker.allow()
+    breaker.record(None, 0.1)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CLOSED
+
+
+def test_only_backend_errors_count_as_failures():
+    assert not backend_failed(ToolError("bad request", 400))
+    assert not backend_failed(ToolError("not found", 404))
+    assert backend_failed(ToolError("server error", 502))
+    assert backend_failed(ToolError("connect failed"))
+    assert backend_failed(asyncio.TimeoutError())
+    assert backend_failed(httpx.ReadTimeout("slow"))
+    assert not backend_failed(ValueError("bad json"))
@@ -0,0 +1,13 @@
+import json
+
+from app.prompt_budget import compact_tool_result
+
+
+def test_current_turn_keeps_every_item_and_segments():
+    result = {"results": list(range(10)), "segments": [{"t0": 0, "text": "hi"}], "audioB64": "xx"}
+    assert json.loads(compact_tool_result(result)) == {"results": list(range(10)), "segments": [{"t0": 0, "text": "hi"}]}
+
+
+def test_stale_results_mark_cut_lists():
+    result = {"results": list(range(10)), "segments": [{"t0": 0}], "url": "https://x"}
+    assert json.loads(compact_tool_result(result, stale=True)) == {"results": [0, 1, 2, 3, 4, "... 5 more"]}
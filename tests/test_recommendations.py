@@ -0,0 +1,41 @@
+from app.recommendations import RecoCache
+
+PROFILE = {"childId": "local_child", "age": 6, "cefr": "A1", "characters": ["Bluey"]}
+VIDEOS = [{"id": f"v{i}"} for i in range(6)]
+
+
+class Backend:
+    def __init__(self):
+        self.calls = []
+
+    def fetch(self, exclude, refresh):
+        self.calls.append((list(exclude), refresh))
+
+        async def _search():
+            return [v for v in VIDEOS if v["id"] not in exclude][:2]
+
+        return _search()
+
+
+def _ids(items):
+    return [it["id"] for it in items]
+
+
+def test_watched_ids_are_part_of_the_key():
+    cache, backend = RecoCache(), Backend()
+    assert _ids(cache.get(PROFILE, {"v0"}, backend.fetch, 2)) == ["v1", "v2"]
+    assert backend.calls == [(["v0"], False)]
+    # Another session of the same child with the same watched set is a plain hit
+    assert _ids(cache.get(PROFILE, {"v0"}, backend.fetch, 2)) == ["v1", "v2"]
+    assert len(backend.calls) == 1
+
+
+def test_new_recommendations_skip_shown_videos_and_backend_cache():
+    cache, backend = RecoCache(), Backend()
+    shown = cache.get(PROFILE, set(), backend.fetch, 2)
+    cache.invalidate(PROFILE, _ids(shown))
+    assert _ids(cache.get(PROFILE, set(), backend.fetch, 2)) == ["v2", "v3"]
+    assert backend.calls[-1] == (["v0", "v1"], True)
+    # Only the next fetch after the button renews
+    cache.get(PROFILE, set(), backend.fetch, 2)
+    assert len(backend.calls) == 2
@@ -0,0 +1,41 @@
+import json
+
+from app.search_engine import HybridSearchEngine
+
+
+def test_snapshot_round_trips_keyword_only_docs(tmp_path):
+    src = tmp_path / "src.json"
+    src.write_text(json.dumps({
+        "embedder": "aoai:other-deployment",
+        "dim": 8,
+        "docs": [{"id": "d1", "content": "How to start English at five", "source": "faq"}],
+    }), encoding="utf-8")
+    engine = HybridSearchEngine.load_snapshot(str(src))
+    assert "d1" not in engine.ann.vectors
+
+    dst = tmp_path / "dst.json"
+    engine.save_snapshot(str(dst))
+    saved = json.loads(dst.read_text(encoding="utf-8"))
+    assert saved["docs"] == [{"id": "d1", "content": "How to start English at five", "source": "faq"}]
+
+    reloaded = HybridSearchEngine.load_snapshot(str(dst))
+    assert [h["id"] for h in reloaded.search_with_vector("start English", None, top=1)] == ["d1"]
+
+
+def test_snapshot_keeps_vectors_of_local_docs(tmp_path):
+    engine = HybridSearchEngine()
+    engine.add({"id": "d1", "content": "phonics songs for kids"})
+    path = tmp_path / "snap.json"
+    engine.save_snapshot(str(path))
+    reloaded = HybridSearchEngine.load_snapshot(str(path))
+    assert "d1" in reloaded.ann.vectors
+    assert reloaded.ann.signatures["d1"] == engine.ann.signatures["d1"]
+
+
+def test_bounded_add_evicts_oldest_docs():
+    engine = HybridSearchEngine()
+    for i in range(5):
+        engine.add({"id": f"d{i}", "content": f"word{i}"}, max_docs=3)
+    engine.add({"id": "d4", "content": "updated"}, max_docs=3)
+    assert list(engine.docs) == ["d2", "d3", "d4"]
+    assert set(engine.ann.vectors) == {"d2", "d3", "d4"}
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.semantic_cache import FAQCache, cache_scope
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_local_embedder_needs_the_same_normalised_question():
+    cache = FAQCache(exact_only=True)
+    _run(cache.store("How do I start English?", "start answer"))
+    assert _run(cache.lookup("How do I stop English?")) is None
+    assert _run(cache.lookup("how do i start english")) == "start answer"
+
+
+def test_answers_are_scoped_by_role_and_system_messages():
+    cache = FAQCache(exact_only=True)
+    parent = [{"role": "system", "content": "parent guide"}, {"role": "user", "content": "q"}]
+    teacher = [{"role": "system", "content": "parent guide"}, {"role": "user", "content": "q"}]
+    _run(cache.store("5살 영어 시작", "parent answer", cache_scope(parent, "parent")))
+    assert _run(cache.lookup("5살 영어 시작", cache_scope(teacher, "teacher"))) is None
+    other_system = [{"role": "system", "content": "kid mode"}, {"role": "user", "content": "q"}]
+    assert _run(cache.lookup("5살 영어 시작", cache_scope(other_system, "parent"))) is None
+    assert _run(cache.lookup("5살 영어 시작", cache_scope(parent, "parent"))) == "parent answer"
+
+
+def test_local_embedder_matches_korean_polite_variants():
+    cache = FAQCache(exact_only=True)
+    _run(cache.store("5살 아이 영어 어떻게 시작해요?", "answer"))
+    assert _run(cache.lookup("5살 아이 영어 어떻게 시작하나요?")) == "answer"
@@ -0,0 +1,18 @@
+from app import telemetry
+from app.telemetry import TurnTrace
+
+
+def test_recent_turns_and_stats_cover_finished_turns(monkeypatch):
+    monkeypatch.setattr(telemetry, "_turns", telemetry.deque(maxlen=3))
+    for i in range(4):
+        trace = TurnTrace(mode="chat")
+        trace.completion({"prompt_tokens": 100 + i, "completion_tokens": 10}, 0.01)
+        trace.tool_done({"function": {"name": "search_docs"}}, {"error": "x"} if i == 3 else {}, 0.002)
+        trace.finish()
+    turns = telemetry.recent_turns(2)
+    assert [t["promptTokens"] for t in turns] == [102, 103]
+    stats = telemetry.stats()
+    assert stats["turns"] == 3
+    assert stats["avgPromptTokens"] == 102.0
+    assert stats["tools"]["search_docs"]["calls"] == 3
+    assert stats["tools"]["search_docs"]["errorRate"] == round(1 / 3, 3)
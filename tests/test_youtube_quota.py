@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "functions"))
+
+from youtube_quota import TokenBucket  # noqa: E402  (functions/ modules import flat)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_blocked_bucket_does_not_refill_until_the_block_ends():
+    clock = Clock()
+    bucket = TokenBucket(capacity=1000, refill_per_sec=10, clock=clock)
+    bucket.block(60)
+    clock.now = 59
+    assert bucket.available() == 0
+    assert not bucket.try_consume(1)
+    clock.now = 70
+    assert bucket.available() == 100